@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,7 +26,7 @@ SECRET_KEY = config('SECRET_KEY', default='django-insecure-development-key')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=True, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
 
 
 # Application definition
@@ -42,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricasMiddleware',
+    'core.middleware.PresupuestoConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +90,68 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura (ver core/replicas.py): DB_REPLICAS es una lista
+# separada por comas de servidores `host[:puerto]` con la misma base,
+# usuario y clave que el primario (con SQLite, rutas de archivo). Las
+# listas, detalles y reportes leen de una al azar; después de que una
+# sesión escribe, sus lecturas vuelven al primario por REPLICAS_PAUSA
+# segundos, que debería superar el atraso normal de las réplicas.
+# Las pruebas no crean bases en las réplicas: las leen del primario.
+REPLICAS_LECTURA = []
+for numero, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    alias = f'replica{numero}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if 'sqlite' in DATABASES['default']['ENGINE']:
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, puerto = replica.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=puerto or DATABASES['default']['PORT'])
+    REPLICAS_LECTURA.append(alias)
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICAS_PAUSA = config('REPLICAS_PAUSA', default=5, cast=float)
+
+# Búsqueda por trigramas (pg_trgm) en los filtros cuando se usa PostgreSQL
+if 'postgresql' in DATABASES['default']['ENGINE']:
+    INSTALLED_APPS.append('django.contrib.postgres')
+
+
+
+# Cache
+# El catálogo y los motores de disponibilidad guardan sus versiones aquí;
+# con varios procesos conviene un backend compartido (Redis, Memcached).
+# Con el de por defecto, local a cada proceso, hay_conflicto consulta la
+# tabla de reservas: el árbol de intervalos necesita un cache compartido.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='alquiler'),
+    }
+}
+
+CATALOGO_CACHE_TIMEOUT = config('CATALOGO_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+# Tarjetas y filas renderizadas de las listas (ver core/services/fragmentos.py)
+FRAGMENTOS_CACHE_TIMEOUT = config('FRAGMENTOS_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+
+# Presupuesto de consultas por vista (ver core/middleware.py)
+VIGILAR_CONSULTAS = config('VIGILAR_CONSULTAS', default=DEBUG, cast=bool)
+CONSULTAS_ESTRICTO = config('CONSULTAS_ESTRICTO', default=False, cast=bool)
+CONSULTAS_UMBRAL_N1 = config('CONSULTAS_UMBRAL_N1', default=5, cast=int)
+
+# Server-Timing y /metrics (ver core/metricas.py). Con varios procesos,
+# exportar PROMETHEUS_MULTIPROC_DIR a un directorio vacío antes de arrancar.
+METRICAS = config('METRICAS', default=True, cast=bool)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Números de factura que cada proceso reserva de una vez (ver
+# core/services/numeracion.py). Con 1 la serie no tiene huecos.
+FACTURAS_BLOQUE = config('FACTURAS_BLOQUE', default=1, cast=int)
+
+# Lecturas del panel del cliente con vistas asíncronas (ver
+# LecturaAsyncMixin en core/mixins.py). Solo conviene bajo ASGI (uvicorn);
+# bajo WSGI cada vista asíncrona paga un event loop por petición.
+PANEL_CLIENTE_ASYNC = config('PANEL_CLIENTE_ASYNC', default=False, cast=bool)
 
 
 # Password validation
@@ -108,6 +173,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Los de Django, más el de la importación masiva de clientes (ver
+# core/hashers.py). El primero es el preferido: las contraseñas importadas
+# se vuelven a guardar con él en el primer inicio de sesión.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'core.hashers.PBKDF2ImportacionHasher',
+]
+# Algoritmo de las contraseñas que trae el CSV de clientes; 'pbkdf2_sha256'
+# para usar el completo (del orden de medio segundo por fila)
+IMPORTACION_HASHER = config('IMPORTACION_HASHER', default='pbkdf2_importacion')
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -131,6 +212,10 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Miniaturas de vehículos (ver core/services/miniaturas.py)
+MINIATURAS_HILOS = config('MINIATURAS_HILOS', default=2, cast=int)
+MINIATURAS_SINCRONO = config('MINIATURAS_SINCRONO', default=False, cast=bool)
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,33 @@
+"""
+Settings de las pruebas.
+
+    python manage.py test --settings=alquiler.settings_test
+
+(con pytest-django o un IDE, DJANGO_SETTINGS_MODULE=alquiler.settings_test).
+"""
+import atexit
+import shutil
+import tempfile
+
+from alquiler.settings import *  # noqa: F401,F403
+
+# Réplica para las pruebas del router (ReplicasTests): espeja la base de
+# prueba del primario y queda apagada hasta que una prueba la activa con
+# override_settings(REPLICAS_LECTURA=['replica']).
+DATABASES['replica'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})  # noqa: F405
+
+# Cache compartido entre procesos, como el de producción, para que
+# hay_conflicto use los árboles de intervalos y no la consulta SQL.
+_directorio_cache = tempfile.mkdtemp(prefix='alquiler-cache-')
+atexit.register(shutil.rmtree, _directorio_cache, ignore_errors=True)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': _directorio_cache,
+    }
+}
+
+# Presupuestos de consultas estrictos: una vista que los excede o con un
+# N+1 hace fallar la prueba en vez de solo dejar un aviso en el log
+VIGILAR_CONSULTAS = True
+CONSULTAS_ESTRICTO = True
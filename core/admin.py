@@ -1,5 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import CategoriaLicencia, SubcategoriaLicencia, Cliente, Vehiculo, Reserva, Devolucion, Factura
+from .services import facturacion
 
 @admin.register(CategoriaLicencia)
 class CategoriaLicenciaAdmin(admin.ModelAdmin):
@@ -33,6 +34,16 @@ class ReservaAdmin(admin.ModelAdmin):
     list_display = ('id', 'vehiculo', 'cliente', 'fecha_inicio', 'fecha_fin', 'total', 'estado')
     search_fields = ('vehiculo__placa', 'cliente__nombre', 'cliente__apellido')
     list_filter = ('estado',)
+    actions = ['confirmar_y_facturar']
+
+    @admin.action(description='Confirmar y facturar las reservas seleccionadas')
+    def confirmar_y_facturar(self, request, queryset):
+        resultado = facturacion.facturar(queryset)
+        self.message_user(
+            request,
+            f'{resultado.confirmadas} reservas confirmadas y {resultado.facturas} facturas creadas.',
+            messages.SUCCESS,
+        )
 
 @admin.register(Devolucion)
 class DevolucionAdmin(admin.ModelAdmin):
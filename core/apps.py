@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core import consultas, metricas, signals  # noqa: F401
+
+        connection_created.connect(consultas.instalar, dispatch_uid='core.consultas')
+        connection_created.connect(metricas.instalar, dispatch_uid='core.metricas')
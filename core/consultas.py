@@ -0,0 +1,89 @@
+"""
+Registro de las consultas SQL de una petición.
+
+Lo usan `PresupuestoConsultasMiddleware` y las pruebas para contar
+consultas, detectar patrones N+1 (la misma consulta repetida con distintos
+parámetros, típicamente una por fila de una lista) y comparar el total con
+el presupuesto que declara cada vista en `presupuesto_consultas`.
+
+Como en `core/metricas.py`, cada conexión lleva `anotar` como execute
+wrapper desde que se abre y los registros activos van en una variable de
+contexto: bajo ASGI las consultas corren en los hilos de `sync_to_async`,
+con sus propias conexiones, pero heredan el contexto de la petición.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# A partir de cuántas repeticiones una consulta se considera N+1
+UMBRAL_N1 = 5
+
+_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+_registros = ContextVar('registros_consultas', default=())
+
+
+class PresupuestoExcedido(Exception):
+    """Una petición superó su presupuesto de consultas o tiene un N+1"""
+
+
+def forma(sql):
+    """SQL sin parámetros ni literales, para agrupar consultas equivalentes"""
+    return _LITERALES.sub('?', _LISTA_IN.sub('IN (...)', sql))
+
+
+class RegistroConsultas:
+    """Acumula las consultas ejecutadas mientras está activo"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __len__(self):
+        return len(self.consultas)
+
+    def repetidas(self, umbral=None):
+        """Formas de consulta que se repiten al menos `umbral` veces: [(forma, veces)]"""
+        umbral = umbral or getattr(settings, 'CONSULTAS_UMBRAL_N1', UMBRAL_N1)
+        return [(sql, veces) for sql, veces in Counter(map(forma, self.consultas)).most_common() if veces >= umbral]
+
+
+def anotar(execute, sql, params, many, context):
+    for registro in _registros.get():
+        registro.consultas.append(sql)
+    return execute(sql, params, many, context)
+
+
+def instalar(connection, **kwargs):
+    """Agrega `anotar` a la conexión (receptor de `connection_created`)"""
+    if anotar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(anotar)
+
+
+@contextmanager
+def registrar():
+    """Registra las consultas de todas las conexiones dentro del bloque (y de los hilos que lo heredan)"""
+    registro = RegistroConsultas()
+    token = _registros.set(_registros.get() + (registro,))
+    try:
+        yield registro
+    finally:
+        _registros.reset(token)
+
+
+def presupuesto(vista):
+    """Presupuesto de consultas declarado por la vista (clase o función), o None"""
+    return getattr(getattr(vista, 'view_class', vista), 'presupuesto_consultas', None)
+
+
+def problemas(registro, limite):
+    """Mensajes sobre presupuesto excedido y posibles N+1 en `registro`"""
+    mensajes = []
+    if limite is not None and len(registro) > limite:
+        mensajes.append(f'{len(registro)} consultas, presupuesto {limite}')
+    for sql, veces in registro.repetidas():
+        mensajes.append(f'posible N+1 ({veces} veces): {sql[:200]}')
+    return mensajes
@@ -10,6 +10,7 @@ from core.models import (
     Devolucion,
     Factura,
 )
+from core.services import catalogo, disponibilidad, numeracion
 
 # Formulario para CategoriaLicencia
 class CategoriaLicenciaForm(forms.ModelForm):
@@ -63,12 +64,9 @@ class ReservaForm(forms.ModelForm):
             raise ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
 
         if vehiculo and fecha_inicio and fecha_fin:
-            conflicto = Reserva.objects.filter(
-                vehiculo=vehiculo,
-                estado__in=['pendiente', 'confirmada'],
-                fecha_fin__gte=fecha_inicio,
-                fecha_inicio__lte=fecha_fin
-            ).exists()
+            conflicto = disponibilidad.hay_conflicto(
+                vehiculo.pk, fecha_inicio, fecha_fin, excluir=self.instance.pk
+            )
             if conflicto:
                 raise ValidationError("El vehículo está reservado en las fechas seleccionadas.")
 
@@ -98,6 +96,11 @@ class DevolucionForm(forms.ModelForm):
         model = Devolucion
         fields = ['reserva', 'fecha_devolucion', 'estado_devolucion']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Cada opción muestra el cliente de la reserva: traerlo en la misma consulta
+        self.fields['reserva'].queryset = Reserva.objects.select_related('cliente', 'vehiculo')
+
     def clean_fecha_devolucion(self):
         fecha_devolucion = self.cleaned_data.get('fecha_devolucion')
         reserva = self.cleaned_data.get('reserva')
@@ -111,13 +114,21 @@ class FacturaForm(forms.ModelForm):
         model = Factura
         fields = ['reserva', 'numero', 'monto', 'fecha_emision']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['reserva'].queryset = Reserva.objects.select_related('cliente', 'vehiculo')
+        # En una factura nueva el número se toma de la serie si se deja vacío
+        # (la unicidad de un número escrito a mano la valida el modelo)
+        if not self.instance.pk:
+            self.fields['numero'].required = False
+            self.fields['numero'].help_text = 'Vacío para asignar el siguiente número de la serie'
+
     def clean_numero(self):
         numero = self.cleaned_data.get('numero')
-        qs = Factura.objects.filter(numero=numero)
-        if self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise ValidationError("El número de factura ya existe.")
+        # Un número con el formato de la serie chocaría con el que el
+        # contador entregue después; el que ya tenía la factura se conserva
+        if numero and numero != self.instance.numero and numeracion.es_de_serie(numero):
+            raise ValidationError("Los números con el formato de la serie se asignan automáticamente; deje el campo vacío.")
         return numero
 
 # Formulario para Reserva desde el panel de cliente (sin campo cliente)
@@ -132,20 +143,41 @@ class ClienteReservaForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Solo mostrar vehículos disponibles
-        self.fields['vehiculo'].queryset = Vehiculo.objects.filter(disponible=True)
+        # Solo mostrar vehículos disponibles; si ya hay fechas elegidas,
+        # los que estén libres en ese rango
+        rango = self._rango_fechas()
         self.fields['vehiculo'].label = 'Vehículo'
         self.fields['fecha_inicio'].label = 'Fecha de Inicio'
         self.fields['fecha_fin'].label = 'Fecha de Fin'
         self.fields['total'].label = 'Total (COP)'
         
         # Personalizar el texto de las opciones del vehículo para mostrar el precio
-        choices = []
-        for vehiculo in Vehiculo.objects.filter(disponible=True):
-            label = f"{vehiculo.marca} {vehiculo.modelo} - {vehiculo.placa} - ${vehiculo.costo_dia:,.0f}"
-            choices.append((vehiculo.id, label))
+        if rango:
+            vehiculos = disponibilidad.vehiculos_libres(
+                Vehiculo.objects.all(), *rango, excluir=self.instance.pk
+            )
+            choices = [
+                (vehiculo.id, catalogo.etiqueta(vehiculo.marca, vehiculo.modelo, vehiculo.placa, vehiculo.costo_dia))
+                for vehiculo in vehiculos
+            ]
+        else:
+            # Catálogo cacheado: sin consultas con el cache caliente
+            vehiculos = Vehiculo.objects.filter(disponible=True)
+            choices = [(vehiculo['id'], vehiculo['etiqueta']) for vehiculo in catalogo.disponibles()]
+        self.fields['vehiculo'].queryset = vehiculos
         self.fields['vehiculo'].choices = choices
 
+    def _rango_fechas(self):
+        """Rango de fechas enviado o precargado en el formulario, si es válido"""
+        try:
+            fecha_inicio = self.fields['fecha_inicio'].clean(self['fecha_inicio'].value())
+            fecha_fin = self.fields['fecha_fin'].clean(self['fecha_fin'].value())
+        except ValidationError:
+            return None
+        if fecha_inicio and fecha_fin and fecha_inicio <= fecha_fin:
+            return fecha_inicio, fecha_fin
+        return None
+
     def clean(self):
         cleaned_data = super().clean()
         vehiculo = cleaned_data.get('vehiculo')
@@ -156,12 +188,9 @@ class ClienteReservaForm(forms.ModelForm):
             raise ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
 
         if vehiculo and fecha_inicio and fecha_fin:
-            conflicto = Reserva.objects.filter(
-                vehiculo=vehiculo,
-                estado__in=['pendiente', 'confirmada'],
-                fecha_fin__gte=fecha_inicio,
-                fecha_inicio__lte=fecha_fin
-            ).exists()
+            conflicto = disponibilidad.hay_conflicto(
+                vehiculo.pk, fecha_inicio, fecha_fin, excluir=self.instance.pk
+            )
             if conflicto:
                 raise ValidationError("El vehículo está reservado en las fechas seleccionadas.")
 
@@ -235,6 +264,34 @@ class ClientePerfilForm(forms.ModelForm):
         return instance
 
 
+# Formulario para importar vehículos o clientes desde CSV
+class ImportacionForm(forms.Form):
+    TIPOS = [
+        ('vehiculos', 'Vehículos (por placa)'),
+        ('clientes', 'Clientes (por email)'),
+    ]
+
+    tipo = forms.ChoiceField(choices=TIPOS, label='Importar')
+    archivo = forms.FileField(label='Archivo CSV', widget=forms.FileInput(attrs={'accept': '.csv,text/csv'}))
+
+
+class CotizacionForm(forms.Form):
+    """Parámetros de la cotización JSON de la página de nueva reserva"""
+    vehiculo = forms.IntegerField()
+    fecha_inicio = forms.DateField()
+    fecha_fin = forms.DateField()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get('fecha_inicio')
+        fecha_fin = cleaned_data.get('fecha_fin')
+
+        if fecha_inicio and fecha_fin and fecha_fin < fecha_inicio:
+            raise ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
+
+        return cleaned_data
+
+
 # ==================== FORMULARIOS DE FILTRO ====================
 
 # Filtro para Vehículos
@@ -264,6 +321,24 @@ class FiltroVehiculoForm(forms.Form):
             attrs={'class': 'filter-input'}
         )
     )
+    fecha_inicio = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'filter-input'})
+    )
+    fecha_fin = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'filter-input'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get('fecha_inicio')
+        fecha_fin = cleaned_data.get('fecha_fin')
+
+        if fecha_inicio and fecha_fin and fecha_fin < fecha_inicio:
+            raise ValidationError("La fecha de fin debe ser posterior a la fecha de inicio.")
+
+        return cleaned_data
 
 
 # Filtro para Clientes
@@ -0,0 +1,16 @@
+"""
+Hasher de contraseñas para la importación masiva de clientes.
+
+PBKDF2 con las iteraciones de Django 5.2 tarda del orden de medio
+segundo por contraseña, así que un lote de 1000 clientes con contraseña
+tardaría minutos. `importacion.importar_clientes` usa este hasher, con
+muchas menos iteraciones. Como no es el primero de PASSWORD_HASHERS,
+Django vuelve a guardar la contraseña con el hasher preferido la primera
+vez que el cliente inicia sesión.
+"""
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2ImportacionHasher(PBKDF2PasswordHasher):
+    algorithm = 'pbkdf2_importacion'
+    iterations = 20_000
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.models import Reserva
+
+HOST = '127.0.0.1'
+MODOS = ('sync', 'async')
+PERCENTILES = (50, 90, 99)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    return valores[max(0, -(-len(valores) * p // 100) - 1)]
+
+
+async def _leer_respuesta(lector):
+    """(estado, si el servidor cierra la conexión) de una respuesta HTTP/1.1, descartando el cuerpo"""
+    lineas = (await lector.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    estado = int(lineas[0].split()[1])
+    cabeceras = {}
+    for linea in lineas[1:]:
+        nombre, _, valor = linea.partition(':')
+        cabeceras[nombre.strip().lower()] = valor.strip()
+    if 'content-length' in cabeceras:
+        await lector.readexactly(int(cabeceras['content-length']))
+    elif cabeceras.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            tamano = int((await lector.readuntil(b'\r\n')).split(b';')[0], 16)
+            await lector.readexactly(tamano + 2)
+            if not tamano:
+                break
+    return estado, cabeceras.get('connection', '').lower() == 'close'
+
+
+async def _usuario(numero, puerto, peticiones, desde, hasta, latencias, estados):
+    """Un usuario con su conexión keep-alive, pidiendo las rutas en rueda hasta `hasta`"""
+    lector = escritor = None
+    i = numero
+    try:
+        while time.perf_counter() < hasta:
+            if escritor is None:
+                lector, escritor = await asyncio.open_connection(HOST, puerto)
+            inicio = time.perf_counter()
+            escritor.write(peticiones[i % len(peticiones)])
+            i += 1
+            estado, cerrar = await _leer_respuesta(lector)
+            # Las respuestas del calentamiento no cuentan
+            if inicio >= desde:
+                latencias.append(time.perf_counter() - inicio)
+                estados[estado] += 1
+            if cerrar:
+                escritor.close()
+                escritor = None
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+async def _carga(puerto, peticiones, concurrencia, calentamiento, duracion):
+    latencias, estados = [], Counter()
+    desde = time.perf_counter() + calentamiento
+    hasta = desde + duracion
+    await asyncio.gather(*(
+        _usuario(numero, puerto, peticiones, desde, hasta, latencias, estados)
+        for numero in range(concurrencia)
+    ))
+    return latencias, estados
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de las lecturas del panel del cliente bajo uvicorn: '
+        'levanta el servidor con las vistas síncronas y luego con las '
+        'asíncronas (PANEL_CLIENTE_ASYNC), lo satura con N usuarios '
+        'concurrentes con sesión de un cliente y compara peticiones por '
+        'segundo y latencias. Conviene correrlo sobre una base generada con '
+        'seed_fleet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=32, help='Usuarios simultáneos')
+        parser.add_argument('--duracion', type=float, default=10.0, help='Segundos medidos por modo')
+        parser.add_argument('--calentamiento', type=float, default=2.0, help='Segundos sin medir antes de cada modo')
+        parser.add_argument('--workers', type=int, default=1, help='Procesos de uvicorn')
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+        parser.add_argument('--cliente', help='Usuario cliente (por defecto, el de la última reserva facturada y devuelta)')
+        parser.add_argument('--salida', default='bench_asgi.json')
+
+    def handle(self, *args, **options):
+        reserva = self._reserva(options['cliente'])
+        rutas = [reverse(nombre) for nombre in (
+            'cliente_vehiculos', 'cliente_mis_reservas', 'cliente_mis_facturas', 'cliente_mis_devoluciones',
+        )] + [
+            reverse('cliente_reserva_detail', args=[reserva.pk]),
+            reverse('cliente_factura_detail', args=[reserva.factura.pk]),
+            reverse('cliente_devolucion_detail', args=[reserva.devolucion.pk]),
+        ]
+        # La sesión queda en la base de datos, que el servidor comparte
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            cliente = Client()
+            cliente.force_login(reserva.cliente.user)
+        sesion = cliente.cookies[settings.SESSION_COOKIE_NAME].value
+        peticiones = [
+            (
+                f'GET {ruta} HTTP/1.1\r\nHost: {HOST}:{options["puerto"]}\r\n'
+                f'Cookie: {settings.SESSION_COOKIE_NAME}={sesion}\r\n\r\n'
+            ).encode()
+            for ruta in rutas
+        ]
+
+        resultado = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'motor': connection.vendor,
+            'concurrencia': options['concurrencia'],
+            'workers': options['workers'],
+            'duracion': options['duracion'],
+            'rutas': rutas,
+            'modos': {},
+        }
+        for modo in options['modos']:
+            with self._servidor(modo, options['puerto'], options['workers']):
+                latencias, estados = asyncio.run(_carga(
+                    options['puerto'], peticiones, options['concurrencia'],
+                    options['calentamiento'], options['duracion'],
+                ))
+            if not latencias:
+                raise CommandError(f'Ninguna respuesta en modo {modo}')
+            latencias.sort()
+            medicion = resultado['modos'][modo] = {
+                'peticiones': len(latencias),
+                'rps': round(len(latencias) / options['duracion'], 1),
+                **{f'p{p}_ms': round(percentil(latencias, p) * 1000, 2) for p in PERCENTILES},
+                'estados': {str(estado): cantidad for estado, cantidad in sorted(estados.items())},
+            }
+            self.stdout.write(
+                f'{modo:6} {medicion["rps"]:8.1f} pet/s  p50 {medicion["p50_ms"]:8.2f} ms  '
+                f'p99 {medicion["p99_ms"]:8.2f} ms  estados {medicion["estados"]}'
+            )
+            if set(estados) != {200}:
+                self.stdout.write(self.style.WARNING(f'{modo}: hubo respuestas distintas de 200'))
+
+        if len(resultado['modos']) == 2:
+            sync, asincrono = resultado['modos']['sync'], resultado['modos']['async']
+            self.stdout.write(f'async/sync: {asincrono["rps"] / sync["rps"]:.2f}x pet/s')
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Resultados en {options["salida"]}'))
+
+    @staticmethod
+    def _reserva(usuario):
+        reservas = Reserva.objects.filter(factura__isnull=False, devolucion__isnull=False)
+        if usuario:
+            reservas = reservas.filter(cliente__user__username=usuario)
+        reserva = reservas.select_related('cliente__user', 'factura', 'devolucion').order_by('-pk').first()
+        if reserva is None:
+            raise CommandError('Falta un cliente con una reserva facturada y devuelta; genere datos con seed_fleet.')
+        return reserva
+
+    @staticmethod
+    @contextmanager
+    def _servidor(modo, puerto, workers):
+        """uvicorn en un subproceso con las vistas del modo pedido, hasta salir del bloque"""
+        entorno = dict(os.environ, PANEL_CLIENTE_ASYNC=str(modo == 'async'), DEBUG='False', ALLOWED_HOSTS=HOST)
+        proceso = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'alquiler.asgi:application', '--host', HOST,
+             '--port', str(puerto), '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+            cwd=settings.BASE_DIR, env=entorno,
+        )
+        try:
+            limite = time.monotonic() + 30
+            while True:
+                if proceso.poll() is not None:
+                    raise CommandError(f'uvicorn terminó al arrancar (código {proceso.returncode})')
+                try:
+                    socket.create_connection((HOST, puerto), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > limite:
+                        raise CommandError(f'uvicorn no respondió en el puerto {puerto}')
+                    time.sleep(0.2)
+            yield
+        finally:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+                proceso.wait()
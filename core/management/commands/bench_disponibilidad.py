@@ -0,0 +1,130 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import CategoriaLicencia, SubcategoriaLicencia, Cliente, Vehiculo, Reserva
+from core.services.disponibilidad import ArbolIntervalos, ESTADOS_ACTIVOS, usa_arboles
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la verificación de conflictos por consulta SQL contra el '
+        'árbol de intervalos en memoria. Los datos se generan dentro de una '
+        'transacción que se revierte al final. hay_conflicto solo usa el '
+        'árbol con un cache compartido entre procesos; con LocMemCache consulta SQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=1000)
+        parser.add_argument('--reservas', type=int, default=100000)
+        parser.add_argument('--consultas', type=int, default=5000)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        with transaction.atomic():
+            vehiculos = self._generar_datos(rng, options['vehiculos'], options['reservas'])
+            consultas = self._generar_consultas(rng, vehiculos, options['consultas'])
+
+            inicio = time.perf_counter()
+            resultados_sql = [
+                Reserva.objects.filter(
+                    vehiculo_id=vehiculo_id,
+                    estado__in=ESTADOS_ACTIVOS,
+                    fecha_fin__gte=fecha_inicio,
+                    fecha_inicio__lte=fecha_fin,
+                ).exists()
+                for vehiculo_id, fecha_inicio, fecha_fin in consultas
+            ]
+            tiempo_sql = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            arboles = {vehiculo_id: ArbolIntervalos() for vehiculo_id in vehiculos}
+            filas = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS).values_list(
+                'pk', 'vehiculo_id', 'fecha_inicio', 'fecha_fin'
+            )
+            for pk, vehiculo_id, fecha_inicio, fecha_fin in filas.iterator(chunk_size=5000):
+                arboles[vehiculo_id].insertar(pk, fecha_inicio, fecha_fin)
+            tiempo_carga = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            resultados_arbol = [
+                arboles[vehiculo_id].solapa(fecha_inicio, fecha_fin)
+                for vehiculo_id, fecha_inicio, fecha_fin in consultas
+            ]
+            tiempo_arbol = time.perf_counter() - inicio
+
+            transaction.set_rollback(True)
+
+        if resultados_sql != resultados_arbol:
+            self.stderr.write(self.style.ERROR('Los resultados del árbol no coinciden con SQL'))
+            return
+
+        total = len(consultas)
+        conflictos = sum(resultados_sql)
+        self.stdout.write(f'Vehículos: {len(vehiculos)}  Reservas: {options["reservas"]}  Consultas: {total} ({conflictos} con conflicto)')
+        self.stdout.write(f'SQL:    {tiempo_sql:.3f}s  ({tiempo_sql / total * 1e6:.1f} µs/consulta)')
+        self.stdout.write(f'Árbol:  {tiempo_arbol:.3f}s  ({tiempo_arbol / total * 1e6:.1f} µs/consulta)')
+        self.stdout.write(f'Carga en frío de los árboles: {tiempo_carga:.3f}s')
+        if tiempo_arbol:
+            self.stdout.write(self.style.SUCCESS(f'Aceleración: {tiempo_sql / tiempo_arbol:.0f}x'))
+        if not usa_arboles():
+            self.stdout.write(self.style.WARNING(
+                'Con el cache configurado (local a cada proceso) hay_conflicto usa la consulta SQL, '
+                'no el árbol. Configurar un cache compartido (CACHE_BACKEND) para usarlo.'
+            ))
+
+    def _generar_datos(self, rng, num_vehiculos, num_reservas):
+        categoria = CategoriaLicencia.objects.create(codigo='Z', descripcion='Benchmark')
+        subcategoria = SubcategoriaLicencia.objects.create(codigo='Z1', descripcion='Benchmark', categoria=categoria)
+        user = User.objects.create_user(username='bench@alquizera.local', email='bench@alquizera.local')
+        cliente = Cliente.objects.create(user=user, nombre='Bench', apellido='Mark', licencia=subcategoria)
+
+        Vehiculo.objects.bulk_create(
+            Vehiculo(marca='Bench', modelo=f'M{i}', placa=f'BENCH-{i}', costo_dia=Decimal('100000'))
+            for i in range(num_vehiculos)
+        )
+        vehiculos = list(
+            Vehiculo.objects.filter(placa__startswith='BENCH-').values_list('pk', flat=True)
+        )
+
+        # Reservas consecutivas sin solaparse por vehículo, como las deja el formulario
+        por_vehiculo = max(1, num_reservas // len(vehiculos))
+        base = date.today() - timedelta(days=365)
+        lote = []
+        for vehiculo_id in vehiculos:
+            fecha = base
+            for _ in range(por_vehiculo):
+                fecha += timedelta(days=rng.randint(0, 3))
+                dias = rng.randint(1, 7)
+                lote.append(Reserva(
+                    vehiculo_id=vehiculo_id,
+                    cliente=cliente,
+                    fecha_inicio=fecha,
+                    fecha_fin=fecha + timedelta(days=dias - 1),
+                    total=Decimal('100000') * dias,
+                    estado=rng.choice(['pendiente', 'confirmada', 'confirmada', 'cancelada']),
+                ))
+                fecha += timedelta(days=dias)
+            if len(lote) >= 5000:
+                Reserva.objects.bulk_create(lote)
+                lote = []
+        Reserva.objects.bulk_create(lote)
+        return vehiculos
+
+    def _generar_consultas(self, rng, vehiculos, num_consultas):
+        base = date.today() - timedelta(days=365)
+        consultas = []
+        for _ in range(num_consultas):
+            fecha_inicio = base + timedelta(days=rng.randint(0, 2000))
+            consultas.append((
+                rng.choice(vehiculos),
+                fecha_inicio,
+                fecha_inicio + timedelta(days=rng.randint(0, 10)),
+            ))
+        return consultas
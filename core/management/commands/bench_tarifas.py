@@ -0,0 +1,121 @@
+import gc
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.models import Devolucion, Reserva, Vehiculo
+from core.services import tarifas
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el cálculo de totales y penalizaciones objeto por objeto '
+        '(aritmética Decimal y métodos de los modelos) contra el motor por '
+        'lotes de core/services/tarifas.py, y verifica que den lo mismo. '
+        'No toca la base de datos: las filas se generan en memoria.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=1000)
+        parser.add_argument('--reservas', type=int, default=200000)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Como timeit: sin el recolector, que con cientos de miles de
+        # objetos vivos se dispara en medio de cualquier medición
+        gc.disable()
+        try:
+            self._comparar(options)
+        finally:
+            gc.enable()
+
+    def _comparar(self, options):
+        rng = random.Random(options['semilla'])
+        costos = {
+            vehiculo_id: Decimal(rng.randint(20000, 500000)) / 100
+            for vehiculo_id in range(1, options['vehiculos'] + 1)
+        }
+        filas = self._generar_filas(rng, list(costos), options['reservas'])
+        total = len(filas)
+
+        inicio = time.perf_counter()
+        esperados = [self._decimal(costos[fila[0]], *fila[1:]) for fila in filas]
+        tiempo_decimal = time.perf_counter() - inicio
+
+        vehiculos = {vehiculo_id: Vehiculo(pk=vehiculo_id, costo_dia=costo) for vehiculo_id, costo in costos.items()}
+        devoluciones = [
+            Devolucion(
+                reserva=Reserva(vehiculo=vehiculos[vehiculo_id], fecha_inicio=fecha_inicio, fecha_fin=fecha_fin),
+                fecha_devolucion=fecha_devolucion,
+                estado_devolucion=estado,
+            )
+            for vehiculo_id, fecha_inicio, fecha_fin, fecha_devolucion, estado in filas
+        ]
+        inicio = time.perf_counter()
+        por_objeto = []
+        for devolucion in devoluciones:
+            devolucion.reserva.total = devolucion.reserva.calcular_total()
+            por_objeto.append((devolucion.reserva.total, devolucion.calcular_penalizacion()))
+        tiempo_objeto = time.perf_counter() - inicio
+
+        # Las columnas salen de las filas como las devolvería values_list()
+        inicio = time.perf_counter()
+        tabla = tarifas.TablaTarifas(costos)
+        vehiculo_ids, inicios, fines, fechas_devolucion, estados = zip(*filas)
+        vehiculo_ids = np.fromiter(vehiculo_ids, dtype=np.int64, count=total)
+        inicios, fines, fechas_devolucion = map(tarifas.fechas, (inicios, fines, fechas_devolucion))
+        estados = np.array(estados)
+        tiempo_armado = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        totales = tarifas.totales(tabla, vehiculo_ids, inicios, fines)
+        penalizaciones = tarifas.penalizaciones(tabla, vehiculo_ids, totales, fines, fechas_devolucion, estados)
+        tiempo_lote = time.perf_counter() - inicio
+        por_lote = list(zip(tarifas.a_decimales(totales), tarifas.a_decimales(penalizaciones)))
+
+        if not esperados == por_objeto == por_lote:
+            self.stderr.write(self.style.ERROR('Los resultados por lote no coinciden con el cálculo por objeto'))
+            return
+
+        self.stdout.write(f'Vehículos: {len(costos)}  Devoluciones: {total}')
+        self.stdout.write(f'Decimal por fila:    {tiempo_decimal:.3f}s  ({tiempo_decimal / total * 1e6:.2f} µs/devolución)')
+        self.stdout.write(f'Métodos del modelo:  {tiempo_objeto:.3f}s  ({tiempo_objeto / total * 1e6:.2f} µs/devolución)')
+        self.stdout.write(f'Motor por lotes:     {tiempo_lote:.3f}s  ({tiempo_lote / total * 1e6:.2f} µs/devolución)')
+        self.stdout.write(f'Armado de los arreglos: {tiempo_armado:.3f}s')
+        if tiempo_lote:
+            self.stdout.write(self.style.SUCCESS(
+                f'Aceleración sobre Decimal: {tiempo_decimal / tiempo_lote:.0f}x '
+                f'({tiempo_decimal / (tiempo_lote + tiempo_armado):.1f}x contando el armado)'
+            ))
+
+    def _generar_filas(self, rng, vehiculo_ids, num_reservas):
+        base = date.today() - timedelta(days=365)
+        filas = []
+        for _ in range(num_reservas):
+            fecha_inicio = base + timedelta(days=rng.randint(0, 365))
+            fecha_fin = fecha_inicio + timedelta(days=rng.randint(0, 14))
+            filas.append((
+                rng.choice(vehiculo_ids),
+                fecha_inicio,
+                fecha_fin,
+                fecha_fin + timedelta(days=rng.randint(-1, 5)),
+                rng.choice(['entregado', 'atrasado', 'danado']),
+            ))
+        return filas
+
+    @staticmethod
+    def _decimal(costo_dia, fecha_inicio, fecha_fin, fecha_devolucion, estado):
+        """Las reglas de siempre, con aritmética Decimal"""
+        total = costo_dia * ((fecha_fin - fecha_inicio).days + 1)
+        penalizacion = Decimal('0')
+        if estado == 'atrasado':
+            dias_atraso = (fecha_devolucion - fecha_fin).days
+            if dias_atraso > 0:
+                penalizacion = dias_atraso * (costo_dia * Decimal('0.5'))
+        elif estado == 'danado':
+            penalizacion = total * Decimal('0.20')
+        return total, penalizacion
@@ -0,0 +1,239 @@
+import gc
+import json
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+
+from core import consultas
+from core.models import Cliente, Devolucion, Factura, Reserva, Vehiculo
+from core.urls import urlpatterns
+from core.views.panel_views import PanelClienteView
+
+# Vistas que se piden sin sesión
+ANONIMAS = {'home', 'login', 'register', 'logout'}
+
+# Parámetros de las vistas que no responden sin ellos
+PARAMETROS = {
+    'cliente_cotizacion_json': lambda objetos: {
+        'vehiculo': objetos['admin'][Vehiculo],
+        'fecha_inicio': date.today(),
+        'fecha_fin': date.today() + timedelta(days=3),
+    },
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    return valores[max(0, -(-len(valores) * p // 100) - 1)]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Pide con el cliente de pruebas cada URL de core/urls.py (GET, como '
+        'administrador, como cliente o sin sesión según la vista) y guarda '
+        'en JSON los percentiles de latencia, las consultas SQL y el pico de '
+        'memoria de cada una. Con --comparar muestra la diferencia contra '
+        'otra corrida. Conviene correrlo sobre una base generada con '
+        'seed_fleet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('vistas', nargs='*', help='Nombres de URL a medir (todas por defecto)')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--limite', type=float, default=10.0,
+                            help='Segundos por vista: las más lentas se miden con menos repeticiones')
+        parser.add_argument('--excluir', action='append', default=[], help='Nombre de URL a omitir (se puede repetir)')
+        parser.add_argument('--admin', help='Usuario administrador (por defecto, el primero con is_staff)')
+        parser.add_argument('--cliente', help='Usuario cliente (por defecto, el de la última reserva)')
+        parser.add_argument('--salida', default='bench_vistas.json')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior')
+        parser.add_argument('--tolerancia', type=float, default=20.0,
+                            help='Porcentaje de aumento de la mediana que se marca como regresión')
+
+    def handle(self, *args, **options):
+        patrones = {patron.name: patron for patron in urlpatterns if isinstance(patron, URLPattern)}
+        nombres = options['vistas'] or list(patrones)
+        desconocidas = set(nombres) - set(patrones)
+        if desconocidas:
+            raise CommandError(f'URLs desconocidas: {", ".join(sorted(desconocidas))}')
+        nombres = [nombre for nombre in nombres if nombre not in options['excluir']]
+
+        admin, cliente = self._usuarios(options)
+        clientes = {'anonimo': Client(), 'admin': Client(), 'cliente': Client()}
+        clientes['admin'].force_login(admin)
+        clientes['cliente'].force_login(cliente.user)
+        objetos = self._objetos(cliente)
+
+        resultado = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'motor': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'datos': {modelo.__name__: modelo.objects.count() for modelo in (Vehiculo, Cliente, Reserva, Factura, Devolucion)},
+            'vistas': {},
+        }
+        # El cliente de pruebas se presenta como 'testserver'
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for nombre in nombres:
+                rol = self._rol(nombre, patrones[nombre])
+                url = reverse(nombre, kwargs=self._argumentos(patrones[nombre], rol, objetos))
+                if nombre in PARAMETROS:
+                    url = f'{url}?{urlencode(PARAMETROS[nombre](objetos))}'
+                medicion = self._medir(clientes[rol], url, options['repeticiones'], options['limite'])
+                resultado['vistas'][nombre] = {'url': url, 'rol': rol, **medicion}
+                self.stdout.write(
+                    f'{nombre:32} {medicion["estado"]}  p50 {medicion["p50_ms"]:8.2f} ms  '
+                    f'p99 {medicion["p99_ms"]:8.2f} ms  {medicion["consultas"]:3} consultas  '
+                    f'{medicion["memoria_pico_kb"]:8.0f} KiB'
+                )
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Resultados en {options["salida"]}'))
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+            self._comparar(anterior, resultado, options['tolerancia'])
+
+    def _usuarios(self, options):
+        try:
+            if options['admin']:
+                admin = User.objects.get(username=options['admin'], is_staff=True)
+            else:
+                admin = User.objects.filter(is_staff=True).order_by('pk')[:1].get()
+            if options['cliente']:
+                cliente = Cliente.objects.select_related('user').get(user__username=options['cliente'])
+            else:
+                cliente = Cliente.objects.select_related('user').get(
+                    pk=Reserva.objects.order_by('-pk').values('cliente_id')[:1]
+                )
+        except (User.DoesNotExist, Cliente.DoesNotExist):
+            raise CommandError('Faltan un administrador y un cliente con reservas; genere datos con seed_fleet.')
+        return admin, cliente
+
+    def _objetos(self, cliente):
+        """Un objeto de cada modelo para las URLs con pk: cualquiera para el administrador y del cliente para él"""
+        def ultimo(queryset):
+            return queryset.order_by('-pk').values_list('pk', flat=True).first()
+
+        reservas = Reserva.objects.filter(cliente=cliente)
+        return {
+            'admin': {
+                modelo: ultimo(modelo.objects.all())
+                for modelo in {patron.callback.view_class.model for patron in urlpatterns
+                               if getattr(getattr(patron.callback, 'view_class', None), 'model', None)}
+            },
+            'cliente': {
+                # Pendiente si tiene, para que editar y cancelar muestren su formulario
+                Reserva: ultimo(reservas.filter(estado='pendiente')) or ultimo(reservas),
+                Factura: ultimo(Factura.objects.filter(reserva__cliente=cliente)),
+                Devolucion: ultimo(Devolucion.objects.filter(reserva__cliente=cliente)),
+                'reserva_pk': ultimo(reservas.filter(estado='confirmada', devolucion__isnull=True)) or ultimo(reservas),
+            },
+        }
+
+    @staticmethod
+    def _rol(nombre, patron):
+        if nombre in ANONIMAS:
+            return 'anonimo'
+        vista = patron.callback.view_class
+        if vista is PanelClienteView or vista.__module__.endswith('cliente_panel_views'):
+            return 'cliente'
+        return 'admin'
+
+    @staticmethod
+    def _argumentos(patron, rol, objetos):
+        argumentos = {}
+        for argumento in patron.pattern.converters:
+            clave = patron.callback.view_class.model if argumento == 'pk' else argumento
+            valor = objetos[rol].get(clave)
+            if valor is None:
+                raise CommandError(f'No hay datos para {patron.name} ({argumento}); genere datos con seed_fleet.')
+            argumentos[argumento] = valor
+        return argumentos
+
+    @staticmethod
+    def _pedir(cliente, url):
+        with consultas.registrar() as registro:
+            respuesta = cliente.get(url)
+            # Las respuestas en streaming (exportaciones) consultan al iterarlas
+            if respuesta.streaming:
+                b''.join(respuesta.streaming_content)
+        return respuesta, len(registro)
+
+    def _medir(self, cliente, url, repeticiones, limite):
+        # Una petición de calentamiento llena caches y sesión, como en producción
+        respuesta, _ = self._pedir(cliente, url)
+        tiempos = []
+        consultas_por_peticion = []
+        gc.collect()
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta, cantidad = self._pedir(cliente, url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas_por_peticion.append(cantidad)
+            if sum(tiempos) > limite * 1000:
+                break
+
+        # La memoria se mide aparte: tracemalloc hace más lenta cada asignación
+        tracemalloc.start()
+        try:
+            self._pedir(cliente, url)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        tiempos.sort()
+        return {
+            'estado': respuesta.status_code,
+            'muestras': len(tiempos),
+            **{f'p{p}_ms': round(percentil(tiempos, p), 3) for p in PERCENTILES},
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'consultas': max(consultas_por_peticion),
+            'memoria_pico_kb': round(pico / 1024, 1),
+        }
+
+    def _comparar(self, anterior, actual, tolerancia):
+        self.stdout.write(f'\nComparación con {anterior.get("commit") or anterior.get("fecha")}:')
+        regresiones = 0
+        for nombre, medicion in actual['vistas'].items():
+            base = anterior['vistas'].get(nombre)
+            if not base:
+                self.stdout.write(f'{nombre:32} (nueva)')
+                continue
+            cambio = (medicion['p50_ms'] / base['p50_ms'] - 1) * 100 if base['p50_ms'] else 0
+            linea = (
+                f'{nombre:32} p50 {base["p50_ms"]:8.2f} -> {medicion["p50_ms"]:8.2f} ms ({cambio:+.0f}%)  '
+                f'consultas {base["consultas"]} -> {medicion["consultas"]}  '
+                f'memoria {base["memoria_pico_kb"]:.0f} -> {medicion["memoria_pico_kb"]:.0f} KiB'
+            )
+            if cambio > tolerancia or medicion['consultas'] > base['consultas']:
+                regresiones += 1
+                self.stdout.write(self.style.WARNING(linea))
+            else:
+                self.stdout.write(linea)
+        if regresiones:
+            self.stdout.write(self.style.WARNING(f'{regresiones} vistas empeoraron'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin regresiones'))
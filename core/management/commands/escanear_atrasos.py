@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import atrasos
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula la penalización proyectada de las reservas confirmadas vencidas sin devolución '
+        '(pensado para correr cada noche, p. ej. desde cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de corte (AAAA-MM-DD); por defecto, hoy')
+        parser.add_argument('--lote', type=int, default=atrasos.RESERVAS_POR_LOTE,
+                            help='Reservas por lote')
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options['fecha']:
+            try:
+                hoy = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('--fecha debe tener el formato AAAA-MM-DD')
+
+        def progreso(resultado):
+            self.stdout.write(f'Lote {resultado.lotes}: {resultado.atrasadas} atrasadas ({resultado.segundos:.1f} s)')
+
+        resultado = atrasos.escanear(hoy, options['lote'], progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.atrasadas} reservas atrasadas, penalización proyectada '
+            f'${resultado.penalizacion:,.2f}; {resultado.descartadas} ya no atrasadas '
+            f'({resultado.lotes} lotes, {resultado.segundos:.1f} s)'
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Reserva
+from core.services import planes
+
+# Por debajo de esto el planificador puede preferir recorrer la tabla
+FILAS_MINIMAS = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre las consultas frecuentes de las vistas y servicios '
+        '(core/services/planes.py) y falla si alguna recorre una tabla completa en '
+        'vez de usar un índice. Correrlo sobre una base con datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('consultas', nargs='*', help=f'Solo estas (por defecto todas: {", ".join(planes.CONSULTAS)})')
+        parser.add_argument('--sin-analyze', action='store_true', help='No actualizar antes las estadísticas')
+        parser.add_argument('--planes', action='store_true', help='Mostrar el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        desconocidas = set(options['consultas']) - set(planes.CONSULTAS)
+        if desconocidas:
+            raise CommandError(f'Consultas desconocidas: {", ".join(sorted(desconocidas))}')
+
+        reservas = Reserva.objects.count()
+        if reservas < FILAS_MINIMAS:
+            self.stdout.write(self.style.WARNING(
+                f'Solo hay {reservas} reservas: con tan pocas filas el plan puede no ser el de producción '
+                '(genere datos con seed_fleet)'
+            ))
+        if not options['sin_analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        fallidas = []
+        for nombre, (plan, recorridos) in planes.explicar(options['consultas']).items():
+            if recorridos:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'{nombre}: recorrido secuencial de {", ".join(recorridos)}'))
+            else:
+                self.stdout.write(f'{nombre}: OK')
+            if options['planes'] or recorridos:
+                self.stdout.write(str(plan))
+
+        if fallidas:
+            raise CommandError(f'{len(fallidas)} consultas sin índice: {", ".join(fallidas)}')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas usan índices'))
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Reserva
+from core.services import facturacion
+
+
+class Command(BaseCommand):
+    help = 'Confirma las reservas pendientes y factura las confirmadas sin factura, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help='Solo reservas que empiezan hasta esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--lote', type=int, default=facturacion.RESERVAS_POR_LOTE,
+                            help='Reservas por lote')
+
+    def handle(self, *args, **options):
+        reservas = Reserva.objects.all()
+        if options['hasta']:
+            try:
+                reservas = reservas.filter(fecha_inicio__lte=date.fromisoformat(options['hasta']))
+            except ValueError:
+                raise CommandError('--hasta debe tener el formato AAAA-MM-DD')
+
+        def progreso(resultado):
+            self.stdout.write(
+                f'Lote {resultado.lotes}: {resultado.confirmadas} confirmadas, '
+                f'{resultado.facturas} facturas ({resultado.segundos:.1f} s)'
+            )
+
+        resultado = facturacion.facturar(reservas, options['lote'], progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.confirmadas} reservas confirmadas y {resultado.facturas} facturas '
+            f'por ${resultado.monto:,.2f} en {resultado.lotes} lotes ({resultado.segundos:.1f} s)'
+        ))
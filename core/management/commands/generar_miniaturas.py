@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.models import Vehiculo
+from core.services import miniaturas
+
+
+def _iniciar_proceso():
+    # Con 'spawn' el proceso hijo arranca sin Django configurado; con 'fork'
+    # hereda las conexiones del padre, que no se deben reutilizar
+    django.setup()
+    connections.close_all()
+
+
+def _generar(vehiculo_id):
+    try:
+        return vehiculo_id, miniaturas.generar(vehiculo_id), None
+    except Exception as error:
+        return vehiculo_id, [], str(error)
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas de las imágenes de vehículos que no las tengan, en varios procesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help='Procesos en paralelo (por defecto, uno por CPU)')
+        parser.add_argument('--todas', action='store_true',
+                            help='Regenerar también las que ya están al día')
+
+    def handle(self, *args, **options):
+        vehiculos = Vehiculo.objects.exclude(imagen='').exclude(imagen__isnull=True).only('imagen', 'miniaturas')
+        pendientes = [
+            vehiculo.pk for vehiculo in vehiculos.iterator()
+            if options['todas'] or not miniaturas.vigentes(vehiculo)
+        ]
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS('Todas las imágenes tienen miniaturas'))
+            return
+
+        connections.close_all()
+        errores = 0
+        with ProcessPoolExecutor(max_workers=options['procesos'], initializer=_iniciar_proceso) as pool:
+            for futuro in as_completed(pool.submit(_generar, pk) for pk in pendientes):
+                vehiculo_id, anchos, error = futuro.result()
+                if error:
+                    errores += 1
+                    self.stderr.write(f'Vehículo {vehiculo_id}: {error}')
+                elif options['verbosity'] > 1:
+                    self.stdout.write(f'Vehículo {vehiculo_id}: {anchos}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Miniaturas generadas para {len(pendientes) - errores} de {len(pendientes)} vehículos'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import importacion
+
+IMPORTADORES = {
+    'vehiculos': importacion.importar_vehiculos,
+    'clientes': importacion.importar_clientes,
+}
+
+
+class Command(BaseCommand):
+    help = 'Importa (crea o actualiza) vehículos por placa o clientes por email desde un archivo CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES))
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con encabezado)')
+        parser.add_argument('--lote', type=int, default=importacion.FILAS_POR_LOTE,
+                            help='Filas por lote')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = IMPORTADORES[options['tipo']](archivo, options['lote'])
+        except OSError as error:
+            raise CommandError(f'No se pudo leer el archivo: {error}')
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f'Línea {linea}: {mensaje}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.filas} filas en {resultado.segundos:.1f} s '
+            f'({resultado.filas_por_segundo} filas/s): {resultado.creados} creados, '
+            f'{resultado.actualizados} actualizados, {len(resultado.errores)} errores'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.services import indicadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los indicadores del panel de administración desde las reservas, facturas y devoluciones'
+
+    def handle(self, *args, **options):
+        corregidas = indicadores.reconciliar()
+        if corregidas:
+            self.stdout.write(self.style.WARNING(f'Indicadores corregidos: {corregidas} filas'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Los indicadores coinciden con los datos'))
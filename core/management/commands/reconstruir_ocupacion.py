@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.services import ocupacion
+
+
+class Command(BaseCommand):
+    help = 'Regenera desde cero el calendario de ocupación diaria y su conteo por día a partir de las reservas activas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculo', type=int, action='append', dest='vehiculos',
+                            help='Reconstruir solo este vehículo (se puede repetir)')
+
+    def handle(self, *args, **options):
+        filas = ocupacion.reconstruir(options['vehiculos'])
+        self.stdout.write(self.style.SUCCESS(f'Ocupación reconstruida: {filas} filas vehículo/año'))
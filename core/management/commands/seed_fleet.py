@@ -0,0 +1,251 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    CategoriaLicencia, SubcategoriaLicencia, Cliente, Vehiculo, Reserva, Factura, Devolucion
+)
+from core.services import atrasos, catalogo, disponibilidad, indicadores, numeracion, ocupacion, tarifas
+
+CATEGORIAS = {
+    'A': ('Motocicletas', {'A1': 'Motocicletas hasta 125cc', 'A2': 'Motocicletas hasta 600cc'}),
+    'B': ('Automóviles', {'B1': 'Automóviles particulares', 'B2': 'Automóviles comerciales'}),
+    'C': ('Camiones', {'C1': 'Camiones rígidos', 'C2': 'Camiones articulados'}),
+}
+
+# (marca, modelos, rango de costo diario en pesos)
+MODELOS = [
+    ('Toyota', ('Corolla', 'Yaris', 'Hilux', 'RAV4'), (35000, 120000)),
+    ('Chevrolet', ('Spark', 'Onix', 'Tracker', 'D-Max'), (30000, 110000)),
+    ('Renault', ('Logan', 'Sandero', 'Duster', 'Koleos'), (30000, 100000)),
+    ('Mazda', ('2', '3', 'CX-30', 'CX-5'), (45000, 140000)),
+    ('Kia', ('Picanto', 'Rio', 'Sportage', 'Sorento'), (30000, 130000)),
+    ('Nissan', ('March', 'Versa', 'Kicks', 'Frontier'), (30000, 120000)),
+    ('Yamaha', ('FZ', 'MT-03', 'XTZ'), (15000, 45000)),
+    ('Hino', ('Dutro', '300'), (150000, 300000)),
+]
+COLORES = ['Blanco', 'Negro', 'Gris', 'Plata', 'Rojo', 'Azul', 'Verde']
+NOMBRES = ['Ana', 'Luis', 'Carlos', 'María', 'Sofía', 'Jorge', 'Lucía', 'Andrés', 'Paula', 'Diego',
+           'Valentina', 'Camilo', 'Laura', 'Mateo', 'Daniela', 'Santiago']
+APELLIDOS = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez',
+             'Torres', 'Flores', 'Rivera', 'Gómez', 'Díaz', 'Castro', 'Vargas', 'Rojas']
+
+# Estado de las devoluciones de reservas ya terminadas: (estado, peso)
+ESTADOS_DEVOLUCION = (('entregado', 85), ('atrasado', 10), ('danado', 5))
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera una flota sintética (licencias, clientes con su usuario, '
+        'vehículos, reservas, facturas y devoluciones) con bulk_create y una '
+        'semilla fija, para medir las vistas con volúmenes reales. Las '
+        'reservas de cada vehículo no se solapan y su estado sigue a sus '
+        'fechas. Al final reconstruye la ocupación, los indicadores y los '
+        'atrasos, que bulk_create no actualiza.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=1000)
+        parser.add_argument('--clientes', type=int, default=500)
+        parser.add_argument('--reservas', type=int, default=50000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--prefijo', default='flota',
+                            help='Prefijo de usuarios y placas, para generar más de una flota')
+        parser.add_argument('--password', default='flota1234',
+                            help='Contraseña de todos los usuarios generados')
+        parser.add_argument('--lote', type=int, default=5000, help='Reservas por transacción')
+
+    def handle(self, *args, **options):
+        if min(options['vehiculos'], options['clientes']) < 1 or options['reservas'] < 0:
+            raise CommandError('Se necesita al menos un vehículo y un cliente.')
+        prefijo = options['prefijo']
+        if User.objects.filter(username__startswith=f'{prefijo}-').exists():
+            raise CommandError(f'Ya hay una flota con el prefijo "{prefijo}"; use otro --prefijo.')
+
+        rng = random.Random(options['semilla'])
+        self.hoy = date.today()
+        self.verbosity = options['verbosity']
+        inicio = time.perf_counter()
+
+        with transaction.atomic():
+            subcategorias = self._generar_licencias()
+            clientes = self._generar_clientes(rng, prefijo, options['password'], subcategorias, options['clientes'])
+            vehiculos = self._generar_vehiculos(rng, prefijo, options['vehiculos'])
+        self.costos = dict(vehiculos)
+        totales = self._generar_reservas(rng, vehiculos, clientes, options['reservas'], options['lote'])
+        tiempo_datos = time.perf_counter() - inicio
+
+        # bulk_create no dispara señales: lo derivado se recalcula de una vez
+        ocupacion.reconstruir()
+        indicadores.reconciliar()
+        atrasos.escanear(self.hoy)
+        catalogo.invalidar()
+        disponibilidad.invalidar()
+
+        self.stdout.write(
+            f'Clientes: {len(clientes)}  Vehículos: {len(vehiculos)}  Reservas: {totales["reservas"]}  '
+            f'Facturas: {totales["facturas"]}  Devoluciones: {totales["devoluciones"]}'
+        )
+        self.stdout.write(f'Datos: {tiempo_datos:.1f}s  Derivados: {time.perf_counter() - inicio - tiempo_datos:.1f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'Flota "{prefijo}" generada. Administrador: {prefijo}-admin@alquizera.local  '
+            f'Cliente: {prefijo}-000000@alquizera.local'
+        ))
+
+    def _generar_licencias(self):
+        for codigo, (descripcion, _) in CATEGORIAS.items():
+            CategoriaLicencia.objects.get_or_create(codigo=codigo, defaults={'descripcion': descripcion})
+        categorias = dict(CategoriaLicencia.objects.filter(codigo__in=CATEGORIAS).values_list('codigo', 'pk'))
+        SubcategoriaLicencia.objects.bulk_create(
+            [
+                SubcategoriaLicencia(codigo=codigo, descripcion=descripcion, categoria_id=categorias[categoria])
+                for categoria, (_, subcategorias) in CATEGORIAS.items()
+                for codigo, descripcion in subcategorias.items()
+            ],
+            ignore_conflicts=True,
+        )
+        return list(SubcategoriaLicencia.objects.values_list('pk', flat=True))
+
+    def _generar_clientes(self, rng, prefijo, password, subcategorias, num_clientes):
+        # Un solo hash para todos: calcularlo por usuario tomaría minutos
+        clave = make_password(password)
+        User.objects.create(
+            username=f'{prefijo}-admin@alquizera.local', email=f'{prefijo}-admin@alquizera.local',
+            password=clave, is_staff=True,
+        )
+        usuarios = User.objects.bulk_create(
+            [
+                User(
+                    username=f'{prefijo}-{i:06d}@alquizera.local', email=f'{prefijo}-{i:06d}@alquizera.local',
+                    password=clave, first_name=rng.choice(NOMBRES), last_name=rng.choice(APELLIDOS),
+                )
+                for i in range(num_clientes)
+            ],
+            batch_size=1000,
+        )
+        clientes = Cliente.objects.bulk_create(
+            [
+                Cliente(
+                    user=usuario, nombre=usuario.first_name, apellido=usuario.last_name,
+                    licencia_id=rng.choice(subcategorias), telefono=f'3{rng.randint(100000000, 199999999)}',
+                )
+                for usuario in usuarios
+            ],
+            batch_size=1000,
+        )
+        return [cliente.pk for cliente in clientes]
+
+    def _generar_vehiculos(self, rng, prefijo, num_vehiculos):
+        vehiculos = []
+        for i in range(num_vehiculos):
+            marca, modelos, (minimo, maximo) = rng.choice(MODELOS)
+            vehiculos.append(Vehiculo(
+                marca=marca,
+                modelo=rng.choice(modelos),
+                placa=f'{prefijo[:8].upper()}-{i:06d}',
+                costo_dia=Decimal(rng.randrange(minimo, maximo, 500)),
+                color=rng.choice(COLORES),
+            ))
+        vehiculos = Vehiculo.objects.bulk_create(vehiculos, batch_size=1000)
+        return [(vehiculo.pk, vehiculo.costo_dia) for vehiculo in vehiculos]
+
+    def _generar_reservas(self, rng, vehiculos, clientes, num_reservas, tamano_lote):
+        totales = {'reservas': 0, 'facturas': 0, 'devoluciones': 0}
+        por_vehiculo, sobrantes = divmod(num_reservas, len(vehiculos))
+        lote = []
+        for indice, (vehiculo_id, costo_dia) in enumerate(vehiculos):
+            cantidad = por_vehiculo + (indice < sobrantes)
+            lote.extend(self._reservas_del_vehiculo(rng, vehiculo_id, costo_dia, clientes, cantidad))
+            if len(lote) >= tamano_lote:
+                self._guardar_lote(rng, lote, totales)
+                lote = []
+        if lote:
+            self._guardar_lote(rng, lote, totales)
+        return totales
+
+    def _reservas_del_vehiculo(self, rng, vehiculo_id, costo_dia, clientes, cantidad):
+        """
+        Reservas consecutivas sin solaparse, como las deja el formulario, y
+        la última terminando alrededor de hoy: una parte de la flota queda
+        con reservas en curso o futuras y el resto libre.
+        """
+        tramos = [(rng.randint(0, 4), rng.randint(1, 7)) for _ in range(cantidad)]
+        fecha = self.hoy + timedelta(days=rng.randint(-30, 30) - sum(espera + dias for espera, dias in tramos))
+        reservas = []
+        for espera, dias in tramos:
+            fecha_inicio = fecha + timedelta(days=espera)
+            fecha_fin = fecha_inicio + timedelta(days=dias - 1)
+            fecha = fecha_fin + timedelta(days=1)
+            reservas.append(Reserva(
+                vehiculo_id=vehiculo_id,
+                # Unos pocos clientes concentran la mayoría de las reservas
+                cliente_id=clientes[int(len(clientes) * rng.random() ** 2)],
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                total=tarifas.total(costo_dia, fecha_inicio, fecha_fin),
+                estado=self._estado(rng, fecha_inicio),
+            ))
+        return reservas
+
+    def _estado(self, rng, fecha_inicio):
+        if fecha_inicio > self.hoy:
+            return rng.choices(('pendiente', 'confirmada', 'cancelada'), (60, 30, 10))[0]
+        return rng.choices(('confirmada', 'cancelada'), (90, 10))[0]
+
+    def _guardar_lote(self, rng, lote, totales):
+        with transaction.atomic():
+            Reserva.objects.bulk_create(lote)
+            confirmadas = [reserva for reserva in lote if reserva.estado == 'confirmada']
+
+            devoluciones = []
+            penalizaciones = {}
+            estados, pesos = zip(*ESTADOS_DEVOLUCION)
+            for reserva in confirmadas:
+                # Casi todas las terminadas se devolvieron; el resto queda atrasado
+                if reserva.fecha_fin >= self.hoy or rng.random() < 0.03:
+                    continue
+                estado = rng.choices(estados, pesos)[0]
+                fecha_devolucion = reserva.fecha_fin
+                if estado == 'atrasado':
+                    fecha_devolucion = min(self.hoy, reserva.fecha_fin + timedelta(days=rng.randint(1, 5)))
+                penalizacion = tarifas.penalizacion(
+                    estado, self.costos[reserva.vehiculo_id], reserva.total, reserva.fecha_fin, fecha_devolucion
+                )
+                penalizaciones[reserva.pk] = penalizacion
+                devoluciones.append(Devolucion(
+                    reserva_id=reserva.pk, fecha_devolucion=fecha_devolucion,
+                    estado_devolucion=estado, penalizacion=penalizacion,
+                ))
+            Devolucion.objects.bulk_create(devoluciones)
+
+            # La factura se emite al confirmar y suma la penalización de la devolución
+            numeros = numeracion.reservar(len(confirmadas)) if confirmadas else []
+            Factura.objects.bulk_create(
+                Factura(
+                    reserva_id=reserva.pk,
+                    numero=numero,
+                    monto=reserva.total + penalizaciones.get(reserva.pk, 0),
+                    fecha_emision=min(reserva.fecha_inicio, self.hoy),
+                )
+                for reserva, numero in zip(confirmadas, numeros)
+            )
+
+            # Como _sincronizar_disponible: ocupado mientras tenga reservas activas sin devolver
+            ocupados = {
+                reserva.vehiculo_id for reserva in lote
+                if reserva.estado in disponibilidad.ESTADOS_ACTIVOS and reserva.pk not in penalizaciones
+            }
+            Vehiculo.objects.filter(pk__in=ocupados).update(disponible=False, updated_at=timezone.now())
+
+        totales['reservas'] += len(lote)
+        totales['facturas'] += len(confirmadas)
+        totales['devoluciones'] += len(devoluciones)
+        if self.verbosity > 1:
+            self.stdout.write(f'  {totales["reservas"]} reservas')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import ocupacion
+
+
+class Command(BaseCommand):
+    help = 'Compara el calendario de ocupación y el conteo diario de vehículos ocupados con la tabla de reservas'
+
+    def handle(self, *args, **options):
+        diferencias = ocupacion.verificar()
+        conteos = ocupacion.verificar_conteo()
+        if not diferencias and not conteos:
+            self.stdout.write(self.style.SUCCESS('La ocupación coincide con las reservas'))
+            return
+        for vehiculo_id, anio, de_mas, de_menos in diferencias:
+            self.stdout.write(
+                f'Vehículo {vehiculo_id}, {anio}: {de_mas} días marcados de más, {de_menos} sin marcar'
+            )
+        for fecha, guardados, esperados in conteos:
+            self.stdout.write(f'{fecha}: {guardados} vehículos ocupados guardados, {esperados} según las reservas')
+        raise CommandError(
+            f'{len(diferencias)} filas y {len(conteos)} días inconsistentes; ejecuta reconstruir_ocupacion'
+        )
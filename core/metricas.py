@@ -0,0 +1,134 @@
+"""
+Tiempos de cada petición: cabecera Server-Timing e histogramas Prometheus.
+
+`MetricasMiddleware` abre una `Medicion` por petición y la deja en una
+variable de contexto. Cada conexión a la base de datos lleva instalado
+`medir_sql` como execute wrapper desde que se abre (señal
+`connection_created`), así que las consultas se miden en el hilo que
+sea: el del servidor WSGI o los que usa `sync_to_async` bajo ASGI, que
+heredan el contexto de la petición. Sin medición activa (comandos,
+migraciones) el wrapper solo lee la variable de contexto.
+
+El tiempo se reparte en:
+
+- `sql`: ejecución de las consultas.
+- `plantilla`: render de las `TemplateResponse` (todas las vistas
+  basadas en clases), sin las consultas que dispara el render.
+- `app`: el resto de la petición (vista, formularios, middleware).
+
+Los histogramas van etiquetados por nombre de URL. Con varios procesos
+(gunicorn, uvicorn --workers) hay que exportar `PROMETHEUS_MULTIPROC_DIR`
+a un directorio vacío antes de arrancar: cada proceso escribe sus
+valores ahí y `/metrics` los suma (modo multiproceso de prometheus_client).
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+SIN_RUTA = '(sin_ruta)'
+
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250, 1000, float('inf'))
+
+PETICION = Histogram('alquiler_peticion_segundos', 'Duración total de la petición', ['vista'])
+SQL = Histogram('alquiler_sql_segundos', 'Tiempo en consultas SQL por petición', ['vista'])
+PLANTILLA = Histogram('alquiler_plantilla_segundos', 'Tiempo de render de plantillas por petición', ['vista'])
+CONSULTAS = Histogram('alquiler_sql_consultas', 'Consultas SQL por petición', ['vista'], buckets=BUCKETS_CONSULTAS)
+RESPUESTAS = Counter('alquiler_respuestas', 'Respuestas por vista y clase de estado', ['vista', 'estado'])
+
+_medicion = ContextVar('medicion', default=None)
+_series_por_vista = {}
+
+
+class Medicion:
+    """Tiempos acumulados de una petición, en segundos"""
+
+    __slots__ = ('inicio', 'total', 'sql', 'consultas', 'plantilla')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.total = 0.0
+        self.sql = 0.0
+        self.consultas = 0
+        self.plantilla = 0.0
+
+    def server_timing(self):
+        app = max(self.total - self.sql - self.plantilla, 0.0)
+        return (
+            f'sql;dur={self.sql * 1000:.2f};desc="{self.consultas} consultas", '
+            f'plantilla;dur={self.plantilla * 1000:.2f}, '
+            f'app;dur={app * 1000:.2f}, '
+            f'total;dur={self.total * 1000:.2f}'
+        )
+
+
+def medir_sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.sql += time.perf_counter() - inicio
+        medicion.consultas += 1
+
+
+def instalar(connection, **kwargs):
+    """Agrega `medir_sql` a la conexión (receptor de `connection_created`)"""
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_sql)
+
+
+def iniciar():
+    """Abre la medición de la petición en curso"""
+    medicion = Medicion()
+    return medicion, _medicion.set(medicion)
+
+
+def _series(vista):
+    # labels() toma un lock y arma la clave en cada llamada; las series de
+    # cada vista se resuelven una vez por proceso
+    series = _series_por_vista.get(vista)
+    if series is None:
+        series = _series_por_vista[vista] = (
+            PETICION.labels(vista), SQL.labels(vista), PLANTILLA.labels(vista), CONSULTAS.labels(vista),
+        )
+    return series
+
+
+def terminar(medicion, token, vista, response):
+    """Cierra la medición y la registra en los histogramas de `vista`"""
+    _medicion.reset(token)
+    estado = response.status_code if response is not None else 500
+    medicion.total = time.perf_counter() - medicion.inicio
+    peticion, sql, plantilla, consultas = _series(vista)
+    peticion.observe(medicion.total)
+    sql.observe(medicion.sql)
+    plantilla.observe(medicion.plantilla)
+    consultas.observe(medicion.consultas)
+    RESPUESTAS.labels(vista, f'{estado // 100}xx').inc()
+
+
+def renderizar(medicion, response):
+    """Renderiza una TemplateResponse midiendo el tiempo de plantilla sin su SQL"""
+    inicio, sql = time.perf_counter(), medicion.sql
+    response.render()
+    medicion.plantilla += time.perf_counter() - inicio - (medicion.sql - sql)
+
+
+def nombre_vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.view_name if coincidencia and coincidencia.view_name else SIN_RUTA
+
+
+def exportar():
+    """(contenido, content type) de las métricas, sumando todos los procesos si corresponde"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
@@ -0,0 +1,170 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import consultas, metricas, replicas
+
+logger = logging.getLogger('core.consultas')
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Cuenta las consultas SQL de cada petición y avisa en el log
+    `core.consultas` cuando una lectura (GET) supera el
+    `presupuesto_consultas` de su vista o cualquier petición repite la
+    misma consulta muchas veces (N+1). Agrega el total en la cabecera
+    `X-Consultas`.
+
+    Se activa con `VIGILAR_CONSULTAS` (por defecto, igual a DEBUG). Con
+    `CONSULTAS_ESTRICTO` los problemas lanzan una excepción en vez de
+    solo registrarse. Como `MetricasMiddleware`, sirve bajo WSGI y ASGI
+    sin pasar las vistas asíncronas a un hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'VIGILAR_CONSULTAS', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with consultas.registrar() as registro:
+            response = self.get_response(request)
+        return self._revisar(request, response, registro)
+
+    async def __acall__(self, request):
+        with consultas.registrar() as registro:
+            response = await self.get_response(request)
+        return self._revisar(request, response, registro)
+
+    def _revisar(self, request, response, registro):
+        response['X-Consultas'] = str(len(registro))
+        mensajes = consultas.problemas(registro, getattr(request, '_presupuesto_consultas', None))
+        if mensajes:
+            detalle = f"{request.method} {request.path}: " + '; '.join(mensajes)
+            if getattr(settings, 'CONSULTAS_ESTRICTO', False):
+                raise consultas.PresupuestoExcedido(detalle)
+            logger.warning(detalle)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # El presupuesto es de lectura; las escrituras solo se vigilan por N+1
+        if request.method in ('GET', 'HEAD'):
+            request._presupuesto_consultas = consultas.presupuesto(view_func)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición (tiempo total, SQL y plantillas, ver
+    `core/metricas.py`), lo informa en la cabecera `Server-Timing` y lo
+    acumula en los histogramas que expone `/metrics`.
+
+    Sirve tanto bajo WSGI como bajo ASGI: no obliga a Django a adaptar
+    las vistas asíncronas a un hilo. Va primero en MIDDLEWARE para que el
+    total incluya a los demás. Se desactiva con `METRICAS = False`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion, token = metricas.iniciar()
+        request._medicion = medicion
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.terminar(medicion, token, metricas.nombre_vista(request), response)
+        response['Server-Timing'] = medicion.server_timing()
+        return response
+
+    async def __acall__(self, request):
+        medicion, token = metricas.iniciar()
+        request._medicion = medicion
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.terminar(medicion, token, metricas.nombre_vista(request), response)
+        response['Server-Timing'] = medicion.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # Al ser el último en procesarla, renderizarla aquí no le quita
+        # nada a los demás y permite medir el render aparte
+        metricas.renderizar(request._medicion, response)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Manda a una réplica las lecturas de las vistas de lista, detalle y
+    reportes, y las devuelve al primario por unos segundos cuando la
+    sesión escribe (ver `core/replicas.py`).
+
+    Va después de SessionMiddleware, que guarda la marca de la pausa, y
+    sirve bajo WSGI y ASGI como `MetricasMiddleware`. Sin réplicas en
+    `REPLICAS_LECTURA` no se instala.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas.activas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        peticion, token = replicas.iniciar()
+        request._replica = peticion
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.terminar(token)
+        if peticion.escribio:
+            replicas.pausar(request)
+        return self._transmitir(response, peticion)
+
+    async def __acall__(self, request):
+        peticion, token = replicas.iniciar()
+        request._replica = peticion
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.terminar(token)
+        if peticion.escribio:
+            # Puede tener que cargar la sesión de la base de datos
+            await sync_to_async(replicas.pausar)(request)
+        return self._transmitir(response, peticion)
+
+    def _transmitir(self, response, peticion):
+        if response.streaming:
+            transmitir = replicas.atransmitir if response.is_async else replicas.transmitir
+            response.streaming_content = transmitir(peticion, response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if replicas.usa_replica(request, view_func) and not replicas.en_pausa(request):
+            replicas.elegir(request._replica)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_refactor_auth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['vehiculo', 'estado', 'fecha_inicio', 'fecha_fin'], name='reserva_disponibilidad_idx'),
+        ),
+    ]
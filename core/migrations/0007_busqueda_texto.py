@@ -0,0 +1,90 @@
+# Índices de búsqueda de texto para los filtros de las vistas de lista.
+# PostgreSQL: extensión pg_trgm e índices GIN de trigramas.
+# SQLite: tablas FTS5 (tokenizador trigram) sincronizadas por triggers.
+
+from django.db import migrations
+
+# Tablas y columnas que se buscan desde los formularios de filtro
+COLUMNAS = {
+    'core_cliente': ('nombre', 'apellido'),
+    'core_vehiculo': ('marca', 'modelo'),
+    'core_factura': ('numero',),
+}
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _crear_postgresql(schema_editor)
+    elif vendor == 'sqlite':
+        _crear_sqlite(schema_editor)
+
+
+def eliminar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, columnas in COLUMNAS.items():
+        if vendor == 'postgresql':
+            for columna in columnas:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_{columna}_trgm')
+                schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_{columna}_upper_trgm')
+        elif vendor == 'sqlite':
+            for accion in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_fts_{accion}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {tabla}_fts')
+
+
+def _crear_postgresql(schema_editor):
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, columnas in COLUMNAS.items():
+        for columna in columnas:
+            # Similitud de palabra (operador <%)
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {tabla}_{columna}_trgm '
+                f'ON {tabla} USING gin ({columna} gin_trgm_ops)'
+            )
+            # icontains: Django compara UPPER(columna) LIKE UPPER(%texto%)
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {tabla}_{columna}_upper_trgm '
+                f'ON {tabla} USING gin (UPPER({columna}) gin_trgm_ops)'
+            )
+
+
+def _crear_sqlite(schema_editor):
+    # El tokenizador trigram existe desde SQLite 3.34
+    if schema_editor.connection.Database.sqlite_version_info < (3, 34, 0):
+        return
+    for tabla, columnas in COLUMNAS.items():
+        tabla_fts = f'{tabla}_fts'
+        lista = ', '.join(columnas)
+        nuevos = ', '.join(f'new.{columna}' for columna in columnas)
+        viejos = ', '.join(f'old.{columna}' for columna in columnas)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla_fts} USING fts5("
+            f"{lista}, content='{tabla}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_ai AFTER INSERT ON {tabla} BEGIN '
+            f'INSERT INTO {tabla_fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_ad AFTER DELETE ON {tabla} BEGIN '
+            f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_au AFTER UPDATE ON {tabla} BEGIN '
+            f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+            f'INSERT INTO {tabla_fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END'
+        )
+        # Indexar las filas que ya existían
+        schema_editor.execute(f"INSERT INTO {tabla_fts}({tabla_fts}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reserva_disponibilidad_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:46
+
+from collections import defaultdict
+from datetime import date
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_ocupacion(apps, schema_editor):
+    """Construir el calendario de ocupación con las reservas activas existentes"""
+    Reserva = apps.get_model('core', 'Reserva')
+    OcupacionVehiculo = apps.get_model('core', 'OcupacionVehiculo')
+
+    bits = defaultdict(int)
+    reservas = Reserva.objects.filter(estado__in=['pendiente', 'confirmada'])
+    for vehiculo_id, inicio, fin in reservas.values_list('vehiculo_id', 'fecha_inicio', 'fecha_fin').iterator():
+        for anio in range(inicio.year, fin.year + 1):
+            base = date(anio, 1, 1).toordinal()
+            primero = max(inicio, date(anio, 1, 1)).toordinal() - base
+            ultimo = min(fin, date(anio, 12, 31)).toordinal() - base
+            bits[(vehiculo_id, anio)] |= ((1 << (ultimo - primero + 1)) - 1) << primero
+
+    OcupacionVehiculo.objects.bulk_create(
+        (
+            OcupacionVehiculo(vehiculo_id=vehiculo_id, anio=anio, dias=valor.to_bytes(46, 'little'))
+            for (vehiculo_id, anio), valor in bits.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionVehiculo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('dias', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00')),
+                ('vehiculo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupaciones', to='core.vehiculo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vehiculo', 'anio'), name='ocupacion_vehiculo_anio_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_ocupacion, migrations.RunPython.noop),
+    ]
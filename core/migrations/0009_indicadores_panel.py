@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:49
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def poblar_indicadores(apps, schema_editor):
+    """Calcular los indicadores del panel con los datos existentes"""
+    Reserva = apps.get_model('core', 'Reserva')
+    Factura = apps.get_model('core', 'Factura')
+    ResumenEstadoReserva = apps.get_model('core', 'ResumenEstadoReserva')
+    ResumenIngresoMensual = apps.get_model('core', 'ResumenIngresoMensual')
+    ResumenDevolucionPendiente = apps.get_model('core', 'ResumenDevolucionPendiente')
+
+    ResumenEstadoReserva.objects.bulk_create(
+        ResumenEstadoReserva(**fila)
+        for fila in Reserva.objects.order_by().values('estado').annotate(cantidad=Count('pk'))
+    )
+    ResumenIngresoMensual.objects.bulk_create(
+        ResumenIngresoMensual(**fila)
+        for fila in Factura.objects.order_by()
+        .annotate(mes=TruncMonth('fecha_emision'))
+        .values('mes')
+        .annotate(facturas=Count('pk'), monto=Sum('monto'))
+    )
+    ResumenDevolucionPendiente.objects.bulk_create(
+        ResumenDevolucionPendiente(**fila)
+        for fila in Reserva.objects.filter(estado='confirmada', devolucion__isnull=True)
+        .order_by()
+        .values('fecha_fin')
+        .annotate(reservas=Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_ocupacionvehiculo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDevolucionPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_fin', models.DateField(unique=True)),
+                ('reservas', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenEstadoReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(max_length=15, unique=True)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenIngresoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', unique=True)),
+                ('facturas', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RunPython(poblar_indicadores, migrations.RunPython.noop),
+    ]
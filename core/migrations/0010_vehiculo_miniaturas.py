@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indicadores_panel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='miniaturas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+def crear_serie(apps, schema_editor):
+    # Las facturas anteriores conservan su número; la serie empieza en 1
+    SerieFactura = apps.get_model('core', 'SerieFactura')
+    SerieFactura.objects.using(schema_editor.connection.alias).get_or_create(serie='FCT')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_vehiculo_miniaturas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieFactura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=10, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0, help_text='Último número reservado')),
+            ],
+        ),
+        migrations.RunPython(crear_serie, migrations.RunPython.noop),
+    ]
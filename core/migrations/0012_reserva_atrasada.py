@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_serie_factura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaAtrasada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_fin', models.DateField()),
+                ('dias_atraso', models.PositiveIntegerField()),
+                ('penalizacion_proyectada', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('escaneo', models.DateTimeField(help_text='Corrida del escaneo que la calculó')),
+                ('reserva', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='atraso', to='core.reserva')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-penalizacion_proyectada'], name='atraso_penalizacion_idx'), models.Index(fields=['escaneo'], name='atraso_escaneo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='reserva_disponibilidad_idx',
+        ),
+        migrations.AddIndex(
+            model_name='devolucion',
+            index=models.Index(fields=['-fecha_devolucion', '-id'], name='devolucion_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['-fecha_emision', '-id'], name='factura_emision_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'confirmada'])), fields=['vehiculo', 'fecha_fin', 'fecha_inicio'], name='reserva_activa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cliente', '-fecha_inicio', '-id'], name='reserva_cliente_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['-fecha_inicio', '-id'], name='reserva_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'confirmada')), fields=['fecha_fin'], name='reserva_en_curso_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['-disponible', 'marca', 'id'], name='vehiculo_catalogo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['id'], name='vehiculo_disponible_idx'),
+        ),
+    ]
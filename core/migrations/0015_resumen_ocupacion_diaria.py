@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:48
+
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import migrations, models
+
+
+def poblar_ocupacion_diaria(apps, schema_editor):
+    """Contar los vehículos ocupados de cada día con los mapas de bits existentes"""
+    OcupacionVehiculo = apps.get_model('core', 'OcupacionVehiculo')
+    ResumenOcupacionDiaria = apps.get_model('core', 'ResumenOcupacionDiaria')
+
+    conteo = Counter()
+    for anio, dias in OcupacionVehiculo.objects.values_list('anio', 'dias').iterator():
+        bits = int.from_bytes(bytes(dias), 'little')
+        base = date(anio, 1, 1)
+        while bits:
+            bajo = bits & -bits
+            conteo[base + timedelta(days=bajo.bit_length() - 1)] += 1
+            bits ^= bajo
+    ResumenOcupacionDiaria.objects.bulk_create(
+        (ResumenOcupacionDiaria(fecha=fecha, vehiculos=vehiculos) for fecha, vehiculos in conteo.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenOcupacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('vehiculos', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(poblar_ocupacion_diaria, migrations.RunPython.noop),
+    ]
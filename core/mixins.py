@@ -1,5 +1,20 @@
+import csv
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.shortcuts import redirect
+from django.contrib.messages import get_messages
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.generic.list import MultipleObjectMixin
+from core.services.busqueda import CAMPO_RELEVANCIA
 
 
 class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -14,3 +29,306 @@ class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
             # Si está autenticado pero no es admin, redirigir al panel de cliente
             return redirect('panel_cliente')
         return super().handle_no_permission()
+
+
+class PaginaCursor:
+    """Página de resultados obtenida con paginación por cursor"""
+
+    def __init__(self, object_list, url_anterior=None, url_siguiente=None):
+        self.object_list = object_list
+        self.url_anterior = url_anterior
+        self.url_siguiente = url_siguiente
+
+    @property
+    def has_previous(self):
+        return self.url_anterior is not None
+
+    @property
+    def has_next(self):
+        return self.url_siguiente is not None
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    Paginación por cursor (keyset) para ListView.
+
+    En lugar de OFFSET, cada página filtra a partir de los valores de orden
+    de la última fila mostrada, por lo que una página profunda cuesta lo
+    mismo que la primera. `orden_paginacion` debe terminar en una clave
+    única (normalmente `pk`) que desempate filas con el mismo valor, y sus
+    campos no deben admitir NULL.
+    """
+    paginate_by = 25
+    orden_paginacion = ('-pk',)
+    parametro_siguiente = 'despues'
+    parametro_anterior = 'antes'
+
+    def get_orden_paginacion(self, queryset):
+        # Con una búsqueda de texto activa se ordena por relevancia
+        if CAMPO_RELEVANCIA in queryset.query.annotations:
+            return ('-' + CAMPO_RELEVANCIA, '-pk')
+        return self.orden_paginacion
+
+    def paginate_queryset(self, queryset, page_size):
+        consulta, orden, cursor = self._consulta_pagina(queryset, page_size)
+        return self._armar_pagina(list(consulta), page_size, orden, cursor)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """Como paginate_queryset, leyendo la página con el ORM asíncrono"""
+        consulta, orden, cursor = self._consulta_pagina(queryset, page_size)
+        return self._armar_pagina([fila async for fila in consulta], page_size, orden, cursor)
+
+    def _consulta_pagina(self, queryset, page_size):
+        """(consulta de la página más una fila, orden, parámetro del cursor recibido o None)"""
+        orden = [
+            (campo.lstrip('-'), campo.startswith('-'))
+            for campo in self.get_orden_paginacion(queryset)
+        ]
+        despues = self._leer_cursor(queryset, orden, self.parametro_siguiente)
+        antes = self._leer_cursor(queryset, orden, self.parametro_anterior)
+
+        if antes is not None:
+            # Página anterior: recorrer en orden inverso y voltear el resultado
+            invertido = [(campo, not desc) for campo, desc in orden]
+            consulta = self._ordenar(queryset, invertido).filter(self._condicion(invertido, antes))
+            return consulta[:page_size + 1], orden, self.parametro_anterior
+        consulta = self._ordenar(queryset, orden)
+        if despues is not None:
+            consulta = consulta.filter(self._condicion(orden, despues))
+        return consulta[:page_size + 1], orden, self.parametro_siguiente if despues is not None else None
+
+    def _armar_pagina(self, filas, page_size, orden, cursor):
+        if cursor == self.parametro_anterior:
+            hay_anterior = len(filas) > page_size
+            filas = filas[:page_size][::-1]
+            hay_siguiente = True
+        else:
+            hay_siguiente = len(filas) > page_size
+            filas = filas[:page_size]
+            hay_anterior = cursor is not None
+
+        pagina = PaginaCursor(filas)
+        if filas and hay_anterior:
+            pagina.url_anterior = self._url_cursor(self.parametro_anterior, filas[0], orden)
+        if filas and hay_siguiente:
+            pagina.url_siguiente = self._url_cursor(self.parametro_siguiente, filas[-1], orden)
+        return None, pagina, filas, pagina.has_other_pages()
+
+    def _ordenar(self, queryset, orden):
+        return queryset.order_by(*[f'-{campo}' if desc else campo for campo, desc in orden])
+
+    def _condicion(self, orden, valores):
+        """(a, b, pk) > (va, vb, vpk) respetando la dirección de cada campo"""
+        condicion = Q()
+        iguales = {}
+        for (campo, desc), valor in zip(orden, valores):
+            lookup = 'lt' if desc else 'gt'
+            condicion |= Q(**iguales, **{f'{campo}__{lookup}': valor})
+            iguales[campo] = valor
+        return condicion
+
+    def _leer_cursor(self, queryset, orden, parametro):
+        cursor = self.request.GET.get(parametro)
+        if not cursor:
+            return None
+        try:
+            valores = json.loads(urlsafe_b64decode(cursor.encode() + b'=' * (-len(cursor) % 4)))
+            if len(valores) != len(orden):
+                return None
+            return [
+                self._campo(queryset, campo).to_python(valor)
+                for (campo, _desc), valor in zip(orden, valores)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            # Cursor manipulado o de otra vista: volver a la primera página
+            return None
+
+    def _url_cursor(self, parametro, fila, orden):
+        valores = [getattr(fila, campo) for campo, _desc in orden]
+        cursor = urlsafe_b64encode(json.dumps(valores, cls=DjangoJSONEncoder).encode()).decode().rstrip('=')
+        params = self.request.GET.copy()
+        params.pop(self.parametro_siguiente, None)
+        params.pop(self.parametro_anterior, None)
+        params[parametro] = cursor
+        return f'?{params.urlencode()}'
+
+    @staticmethod
+    def _campo(queryset, nombre):
+        if nombre == 'pk':
+            return queryset.model._meta.pk
+        if nombre in queryset.query.annotations:
+            return queryset.query.annotations[nombre].output_field
+        return queryset.model._meta.get_field(nombre)
+
+
+class RespuestaCondicionalMixin:
+    """
+    GET condicional (ETag y Last-Modified) para vistas de lista y detalle.
+
+    Antes de armar la respuesta se leen, en una sola consulta agregada, la
+    cantidad de filas y el `updated_at` más reciente de `campos_version`
+    sobre el queryset de la vista (en el detalle, solo la fila pedida). Si
+    el navegador ya tiene esa versión se responde 304 sin correr la
+    consulta principal ni renderizar la plantilla. El ETag también depende
+    del usuario y de la URL completa (filtros y cursor), y de
+    `get_claves_version()` para lo que no se refleja en esas columnas.
+    """
+    campos_version = ('updated_at',)
+
+    def get_queryset_version(self):
+        queryset = self.get_queryset()
+        pk = self.kwargs.get(getattr(self, 'pk_url_kwarg', 'pk'))
+        return queryset.filter(pk=pk) if pk is not None else queryset
+
+    def get_claves_version(self):
+        return ()
+
+    def _agregados_version(self):
+        return {'filas': Count('pk')} | {f'version_{i}': Max(campo) for i, campo in enumerate(self.campos_version)}
+
+    def get_version(self):
+        """(ETag, última modificación como timestamp), o None si no hay filas"""
+        return self._version(self.get_queryset_version().order_by().aggregate(**self._agregados_version()))
+
+    async def aget_version(self):
+        """Como get_version, con el ORM asíncrono"""
+        return self._version(await self.get_queryset_version().order_by().aaggregate(**self._agregados_version()))
+
+    def _version(self, datos):
+        maximos = [clave for clave in datos if clave != 'filas']
+        fechas = [datos[clave] for clave in maximos if datos[clave] is not None]
+        if not fechas:
+            return None
+        partes = [
+            self.request.user.pk, self.request.get_full_path(), datos['filas'],
+            *(datos[clave] and datos[clave].isoformat() for clave in maximos),
+            *self.get_claves_version(),
+        ]
+        resumen = hashlib.sha1(repr(partes).encode(), usedforsecurity=False).hexdigest()
+        return f'"{resumen}"', int(max(fechas).timestamp())
+
+    def get(self, request, *args, **kwargs):
+        # Con mensajes pendientes la página no es la que el navegador guardó
+        version = None if len(get_messages(request)) else self.get_version()
+        respuesta = self.respuesta_no_modificada(request, version)
+        if respuesta is None:
+            respuesta = super().get(request, *args, **kwargs)
+        return self.marcar_version(respuesta, version)
+
+    @staticmethod
+    def respuesta_no_modificada(request, version):
+        """304 si el navegador ya tiene `version`, o None"""
+        if not version:
+            return None
+        etag, modificado = version
+        return get_conditional_response(request, etag=etag, last_modified=modificado)
+
+    @staticmethod
+    def marcar_version(respuesta, version):
+        if version and respuesta.status_code in (200, 304):
+            etag, modificado = version
+            respuesta['ETag'] = etag
+            respuesta['Last-Modified'] = http_date(modificado)
+        patch_cache_control(respuesta, private=True, no_cache=True)
+        return respuesta
+
+
+class LecturaAsyncMixin:
+    """
+    GET de una vista de lista (con KeysetPaginationMixin) o de detalle como
+    corrutina, para servirla bajo ASGI sin ocupar un hilo toda la petición:
+    las consultas van por el ORM asíncrono y solo ellas pasan por el hilo de
+    la base de datos.
+
+    Se antepone a la vista síncrona y reutiliza su get_queryset() y
+    get_context_data(), que por eso no deben consultar por su cuenta: solo
+    armar querysets y leer lo ya cargado. Con RespuestaCondicionalMixin la
+    versión también se lee con el ORM asíncrono.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        condicional = isinstance(self, RespuestaCondicionalMixin)
+        version = None
+        if condicional and not len(get_messages(request)):
+            version = await self.aget_version()
+        respuesta = RespuestaCondicionalMixin.respuesta_no_modificada(request, version)
+        if respuesta is None:
+            respuesta = await self.aresponder()
+        return RespuestaCondicionalMixin.marcar_version(respuesta, version) if condicional else respuesta
+
+    async def aresponder(self):
+        if isinstance(self, MultipleObjectMixin):
+            self.object_list = self.get_queryset()
+            self.pagina_leida = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+            contexto = self.get_context_data()
+        else:
+            self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg])
+            contexto = self.get_context_data(object=self.object)
+        return self.render_to_response(contexto)
+
+    def paginate_queryset(self, queryset, page_size):
+        # La página ya se leyó en aresponder()
+        return self.pagina_leida
+
+
+class _Eco:
+    """Buffer de escritura que devuelve lo escrito, para csv.writer en streaming"""
+
+    def write(self, valor):
+        return valor
+
+
+# Inicios de celda que Excel y LibreOffice leen como fórmula
+PREFIJOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celda(valor):
+    """Texto que parece fórmula precedido de una comilla, para que la hoja lo muestre tal cual"""
+    if isinstance(valor, str) and valor.startswith(PREFIJOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+class ExportarCSVMixin:
+    """
+    Exporta a CSV el queryset filtrado de una ListView.
+
+    Se combina con la vista de lista para reutilizar su `get_queryset()` y
+    sus filtros. Las filas se leen con `.values()` (los campos relacionados
+    salen del JOIN) e `.iterator()`, y se envían a medida que llegan, así
+    que la memoria no crece con la cantidad de filas exportadas.
+    `columnas_exportacion` es una lista de pares (ruta del ORM, encabezado).
+
+    Los clientes se registran solos, así que los textos que empiezan como
+    una fórmula (`=`, `+`, `-`, `@`) se exportan con una comilla delante:
+    si no, la hoja de cálculo del admin los ejecutaría.
+    """
+    columnas_exportacion = ()
+    nombre_exportacion = 'exportacion'
+    filas_por_lote = 2000
+
+    def get(self, request, *args, **kwargs):
+        campos = [campo for campo, _encabezado in self.columnas_exportacion]
+        filas = self.get_queryset().values_list(*campos).iterator(chunk_size=self.filas_por_lote)
+        nombre = f'{self.nombre_exportacion}-{timezone.localdate():%Y%m%d}.csv'
+        return StreamingHttpResponse(
+            self._lineas(filas),
+            content_type='text/csv; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename="{nombre}"'},
+        )
+
+    def _lineas(self, filas):
+        escritor = csv.writer(_Eco())
+        # BOM para que Excel reconozca el UTF-8 (tildes y ñ)
+        yield '\ufeff' + escritor.writerow([encabezado for _campo, encabezado in self.columnas_exportacion])
+        for fila in filas:
+            yield escritor.writerow([_celda(valor) for valor in fila])
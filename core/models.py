@@ -34,6 +34,20 @@ class Vehiculo(models.Model):
     color = models.CharField(max_length=30, blank=True, null=True)
     disponible = models.BooleanField(default=True)
     imagen = models.ImageField(upload_to='vehiculos/', blank=True, null=True, help_text='Imagen del vehículo')
+    # Variantes redimensionadas de `imagen` (ver core/services/miniaturas.py):
+    # {'origen': nombre de la imagen, 'anchos': [anchos generados]}
+    miniaturas = models.JSONField(default=dict, blank=True, editable=False)
+    # Versión de la fila para las respuestas condicionales (core/mixins.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Catálogo del cliente: disponibles primero, por marca (orden de
+            # su paginación); también sirve al filtro por disponibilidad
+            models.Index(fields=['-disponible', 'marca', 'id'], name='vehiculo_catalogo_idx'),
+            # Catálogo cacheado de la página de nueva reserva (solo disponibles, por id)
+            models.Index(fields=['id'], name='vehiculo_disponible_idx', condition=models.Q(disponible=True)),
+        ]
 
     def __str__(self):
         return f"{self.marca} {self.modelo} - {self.placa}"
@@ -51,33 +65,66 @@ class Reserva(models.Model):
     fecha_fin = models.DateField()
     total = models.DecimalField(max_digits=10, decimal_places=2)
     estado = models.CharField(max_length=15, choices=ESTADOS, default='pendiente')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Disponibilidad, solapamientos y vehículo ocupado: solo cuentan
+            # las reservas activas, y las que terminaron hace tiempo quedan
+            # fuera del rango de fecha_fin
+            models.Index(
+                fields=['vehiculo', 'fecha_fin', 'fecha_inicio'],
+                name='reserva_activa_idx',
+                condition=models.Q(estado__in=['pendiente', 'confirmada']),
+            ),
+            # "Mis reservas" y el resumen del panel del cliente, en el orden de su paginación
+            models.Index(fields=['cliente', '-fecha_inicio', '-id'], name='reserva_cliente_inicio_idx'),
+            # Lista de reservas del administrador
+            models.Index(fields=['-fecha_inicio', '-id'], name='reserva_inicio_idx'),
+            # Reservas en curso por fecha de fin: atrasos y devoluciones próximas
+            models.Index(fields=['fecha_fin'], name='reserva_en_curso_fin_idx', condition=models.Q(estado='confirmada')),
+        ]
 
     def __str__(self):
         return f"Reserva {self.pk} - {self.cliente}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar el estado leído para actualizar la ocupación al guardar
+        instance._ocupacion_original = instance.estado_ocupacion()
+        # y el cliente, cuyo resumen del panel cambia si la reserva cambia de dueño
+        instance._cliente_original = instance.__dict__.get('cliente_id')
+        return instance
+
+    def estado_ocupacion(self):
+        """(vehiculo_id, fecha_inicio, fecha_fin, estado), o None si hay campos diferidos"""
+        campos = ('vehiculo_id', 'fecha_inicio', 'fecha_fin', 'estado')
+        if any(campo not in self.__dict__ for campo in campos):
+            return None
+        return tuple(self.__dict__[campo] for campo in campos)
     
     def calcular_total(self):
         """Calcula el total basado en días de alquiler"""
+        from core.services import tarifas
+
         if self.fecha_inicio and self.fecha_fin and self.vehiculo:
-            dias = (self.fecha_fin - self.fecha_inicio).days + 1
-            return self.vehiculo.costo_dia * dias
+            return tarifas.total(self.vehiculo.costo_dia, self.fecha_inicio, self.fecha_fin)
         return self.total
     
     def crear_factura_automatica(self):
         """Crea una factura automáticamente al confirmar la reserva"""
         from django.utils import timezone
-        from uuid import uuid4
+        from core.services import numeracion
         
         # Verificar si ya existe factura
         if hasattr(self, 'factura'):
             return self.factura
         
-        # Generar número único de factura
-        numero_factura = f"FCT-{self.pk}-{uuid4().hex[:8].upper()}"
-        
-        # Crear factura
+        # Crear factura con el siguiente número de la serie
         factura = Factura.objects.create(
             reserva=self,
-            numero=numero_factura,
+            numero=numeracion.siguiente(),
             monto=self.total,
             fecha_emision=timezone.now().date()
         )
@@ -94,31 +141,45 @@ class Devolucion(models.Model):
     fecha_devolucion = models.DateField()
     estado_devolucion = models.CharField(max_length=20, choices=ESTADOS_DEVOLUCION)
     penalizacion = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listas de devoluciones (administrador y cliente), en el orden de su paginación
+            models.Index(fields=['-fecha_devolucion', '-id'], name='devolucion_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Devolución {self.pk} - Reserva {self.reserva.pk}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar la reserva leída para actualizar los indicadores al guardar
+        instance._resumen_original = instance.__dict__.get('reserva_id')
+        return instance
     
+    @staticmethod
+    def penalizacion_atraso(dias_atraso, costo_dia):
+        """Penalización por días de atraso: un 50% del costo diario por cada día"""
+        from core.services import tarifas
+        return tarifas.penalizacion_atraso(dias_atraso, costo_dia)
+
     def calcular_penalizacion(self):
-        """Calcula la penalización basada en el estado de la devolución"""
-        from decimal import Decimal
-        from datetime import timedelta
-        
-        penalizacion = Decimal('0')
-        
-        # Penalización por atraso
-        if self.estado_devolucion == 'atrasado':
-            dias_atraso = (self.fecha_devolucion - self.reserva.fecha_fin).days
-            if dias_atraso > 0:
-                # Cobrar un 50% del costo diario por cada día de atraso
-                penalizacion = dias_atraso * (self.reserva.vehiculo.costo_dia * Decimal('0.5'))
-        
-        # Penalización por daño
-        elif self.estado_devolucion == 'danado':
-            # Cobrar un 20% del valor total de la reserva
-            penalizacion = self.reserva.total * Decimal('0.20')
-        
-        self.penalizacion = penalizacion
-        return penalizacion
+        """
+        Calcula la penalización basada en el estado de la devolución: un 50%
+        del costo diario por día de atraso, o un 20% del total de la reserva
+        si el vehículo vuelve dañado (ver core/services/tarifas.py)
+        """
+        from core.services import tarifas
+
+        # El costo diario solo hace falta (y solo se consulta) para el atraso
+        costo_dia = self.reserva.vehiculo.costo_dia if self.estado_devolucion == 'atrasado' else 0
+        self.penalizacion = tarifas.penalizacion(
+            self.estado_devolucion, costo_dia, self.reserva.total,
+            self.reserva.fecha_fin, self.fecha_devolucion,
+        )
+        return self.penalizacion
     
     def actualizar_factura_con_penalizacion(self):
         """Actualiza la factura con la penalización"""
@@ -127,7 +188,7 @@ class Devolucion(models.Model):
         if hasattr(self.reserva, 'factura'):
             factura = self.reserva.factura
             factura.monto = self.reserva.total + Decimal(str(self.penalizacion))
-            factura.save()
+            factura.save(update_fields=['monto', 'updated_at'])
             return factura
         return None
 
@@ -136,6 +197,109 @@ class Factura(models.Model):
     numero = models.CharField(max_length=30, unique=True)
     monto = models.DecimalField(max_digits=10, decimal_places=2)
     fecha_emision = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listas de facturas (administrador y cliente), en el orden de su paginación
+            models.Index(fields=['-fecha_emision', '-id'], name='factura_emision_idx'),
+        ]
 
     def __str__(self):
         return self.numero
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar lo leído para actualizar los indicadores al guardar
+        instance._resumen_original = instance.estado_resumen()
+        return instance
+
+    def estado_resumen(self):
+        """(fecha_emision, monto), o None si hay campos diferidos"""
+        campos = ('fecha_emision', 'monto')
+        if any(campo not in self.__dict__ for campo in campos):
+            return None
+        return tuple(self.__dict__[campo] for campo in campos)
+
+
+class ReservaAtrasada(models.Model):
+    """Reserva confirmada vencida y sin devolución, con su penalización proyectada"""
+    reserva = models.OneToOneField(Reserva, on_delete=models.CASCADE, related_name='atraso')
+    fecha_fin = models.DateField()
+    dias_atraso = models.PositiveIntegerField()
+    penalizacion_proyectada = models.DecimalField(max_digits=12, decimal_places=2)
+    escaneo = models.DateTimeField(help_text='Corrida del escaneo que la calculó')
+
+    class Meta:
+        indexes = [
+            # Las más costosas primero en el panel
+            models.Index(fields=['-penalizacion_proyectada'], name='atraso_penalizacion_idx'),
+            # Borrado de las que no aparecieron en la última corrida
+            models.Index(fields=['escaneo'], name='atraso_escaneo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.reserva_id} - {self.dias_atraso} días de atraso"
+
+
+class SerieFactura(models.Model):
+    """Contador de la numeración secuencial de una serie de facturas"""
+    serie = models.CharField(max_length=10, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0, help_text='Último número reservado')
+
+    def __str__(self):
+        return f"{self.serie}: {self.ultimo}"
+
+
+class OcupacionVehiculo(models.Model):
+    """Mapa de bits de los días reservados de un vehículo en un año"""
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE, related_name='ocupaciones')
+    anio = models.PositiveSmallIntegerField()
+    # Bit n (little-endian) = día n del año, contando desde el 1 de enero
+    dias = models.BinaryField(default=bytes(46))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vehiculo', 'anio'], name='ocupacion_vehiculo_anio_unica'),
+        ]
+
+    def __str__(self):
+        return f"Ocupación {self.vehiculo_id} - {self.anio}"
+
+
+class ResumenOcupacionDiaria(models.Model):
+    """Vehículos con alguna reserva activa en un día, para el panel de administración"""
+    fecha = models.DateField(unique=True)
+    vehiculos = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.vehiculos}"
+
+
+class ResumenEstadoReserva(models.Model):
+    """Cantidad de reservas por estado, para el panel de administración"""
+    estado = models.CharField(max_length=15, unique=True)
+    cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.estado}: {self.cantidad}"
+
+
+class ResumenIngresoMensual(models.Model):
+    """Facturación acumulada de un mes, para el panel de administración"""
+    mes = models.DateField(unique=True, help_text='Primer día del mes')
+    facturas = models.IntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m}: {self.monto}"
+
+
+class ResumenDevolucionPendiente(models.Model):
+    """Reservas confirmadas sin devolución, agrupadas por fecha de fin"""
+    fecha_fin = models.DateField(unique=True)
+    reservas = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha_fin}: {self.reservas}"
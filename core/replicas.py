@@ -0,0 +1,166 @@
+"""
+Lecturas desde réplicas de la base de datos.
+
+`ReplicaMiddleware` decide al resolver la URL si la petición puede leer de
+una réplica: solo lecturas (GET/HEAD) de vistas de lista o detalle
+(`BaseListView`, `BaseDetailView`, lo que incluye las exportaciones) o de
+las que declaran `usar_replica = True` (los reportes del panel). Una vista
+puede excluirse con `usar_replica = False`. Si es así elige una réplica al
+azar de `REPLICAS_LECTURA` y la deja en una variable de contexto que
+`ReplicaRouter` consulta en cada lectura; sin petición en curso (comandos,
+tareas, shell) todo va al primario.
+
+La réplica se abandona y la petición vuelve al primario:
+
+- desde la primera escritura de la petición en adelante;
+- dentro de un `transaction.atomic()` abierto en el primario;
+- por `REPLICAS_PAUSA` segundos después de que la misma sesión escribió,
+  para que quien acaba de crear una reserva la vea en la lista aunque la
+  réplica venga atrasada. La marca se guarda en la sesión.
+
+Las respuestas en streaming (las exportaciones CSV) leen mientras se
+envían, así que el middleware envuelve su contenido para que esas
+lecturas usen la réplica que eligió la petición.
+
+Las sesiones se leen siempre del primario: una réplica atrasada haría
+perder el login recién hecho. Tampoco leen de réplicas las vistas que
+llenan caches sin versión por fila (el resumen del panel del cliente, el
+catálogo JSON), para no dejar guardada una foto atrasada.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.views.generic.detail import BaseDetailView
+from django.views.generic.list import BaseListView
+
+CLAVE_SESION = '_replica_pausa_hasta'
+SIEMPRE_PRIMARIO = {'sessions'}
+
+_peticion = ContextVar('replica', default=None)
+
+
+class Peticion:
+    """Réplica elegida para la petición en curso y si la petición ya escribió"""
+
+    __slots__ = ('alias', 'escribio')
+
+    def __init__(self):
+        self.alias = None
+        self.escribio = False
+
+
+def activas():
+    """Alias de las réplicas configuradas"""
+    return getattr(settings, 'REPLICAS_LECTURA', [])
+
+
+def iniciar():
+    """Abre el estado de la petición en curso; todavía sin réplica"""
+    peticion = Peticion()
+    return peticion, _peticion.set(peticion)
+
+
+def terminar(token):
+    _peticion.reset(token)
+
+
+def transmitir(peticion, contenido):
+    """
+    Itera el contenido de una respuesta en streaming con la réplica de la
+    petición: sus consultas corren después de que el middleware terminó.
+    """
+    iterador = iter(contenido)
+    while True:
+        token = _peticion.set(peticion)
+        try:
+            parte = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _peticion.reset(token)
+        yield parte
+
+
+async def atransmitir(peticion, contenido):
+    """`transmitir` para el contenido asíncrono de las respuestas bajo ASGI"""
+    iterador = aiter(contenido)
+    while True:
+        token = _peticion.set(peticion)
+        try:
+            parte = await anext(iterador)
+        except StopAsyncIteration:
+            return
+        finally:
+            _peticion.reset(token)
+        yield parte
+
+
+def usa_replica(request, vista):
+    """Si la vista (clase o función) puede leer de una réplica en esta petición"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    clase = getattr(vista, 'view_class', None)
+    usar = getattr(clase or vista, 'usar_replica', None)
+    if usar is None:
+        usar = clase is not None and issubclass(clase, (BaseListView, BaseDetailView))
+    return usar
+
+
+def en_pausa(request):
+    """Si la sesión escribió hace menos de `REPLICAS_PAUSA` segundos"""
+    return request.session.get(CLAVE_SESION, 0) > time.time()
+
+
+def pausar(request):
+    request.session[CLAVE_SESION] = time.time() + getattr(settings, 'REPLICAS_PAUSA', 5)
+
+
+def elegir(peticion):
+    """Fija una réplica al azar para el resto de la petición"""
+    peticion.alias = random.choice(activas())
+
+
+def alias_lectura(model):
+    """Alias del que leer `model` en la petición en curso, o None para el primario"""
+    peticion = _peticion.get()
+    if peticion is None or peticion.alias is None or peticion.escribio:
+        return None
+    if model._meta.app_label in SIEMPRE_PRIMARIO:
+        return None
+    # Lo leído dentro de una transacción tiene que ver lo escrito en ella
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return peticion.alias
+
+
+def registrar_escritura(model):
+    """Marca la petición en curso para que sus lecturas siguientes vayan al primario"""
+    peticion = _peticion.get()
+    if peticion is not None and model._meta.app_label not in SIEMPRE_PRIMARIO:
+        peticion.escribio = True
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: lecturas a la réplica de la petición, escrituras al primario"""
+
+    def db_for_read(self, model, **hints):
+        return alias_lectura(model)
+
+    def db_for_write(self, model, **hints):
+        registrar_escritura(model)
+        # Sin router, Django guardaría la instancia en la base de la que se
+        # leyó; lo leído de una réplica se guarda en el primario
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db in activas():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas tienen los mismos datos
+        bases = {DEFAULT_DB_ALIAS, *activas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
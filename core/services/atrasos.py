@@ -0,0 +1,114 @@
+"""
+Escaneo nocturno de devoluciones atrasadas.
+
+Recorre las reservas confirmadas cuya fecha de fin ya pasó y que no
+tienen devolución, y guarda en `ReservaAtrasada` los días de atraso y la
+penalización que se cobraría si se devolvieran hoy (la misma regla de
+`Devolucion.penalizacion_atraso`, calculada para todo el lote de una vez
+con `tarifas.penalizaciones_atraso`). El panel de administración lee esa
+tabla en vez de calcular el atraso reserva por reserva.
+
+La tabla de reservas se recorre por lotes en orden de clave primaria
+(`pk > último visto`), así que cada lote es una consulta indexada de
+tamaño fijo aunque haya millones de filas, y cada lote se guarda con un
+único `bulk_create(update_conflicts=True)`. Al terminar se borran las
+filas que esta corrida no volvió a ver: reservas ya devueltas,
+canceladas o con la fecha de fin corrida.
+"""
+import time
+from datetime import date
+
+import numpy as np
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.models import Reserva, ReservaAtrasada
+from core.services import tarifas
+
+RESERVAS_POR_LOTE = 5000
+
+
+class ResultadoEscaneo:
+    """Resumen de una corrida del escaneo"""
+
+    def __init__(self):
+        self.lotes = 0
+        self.atrasadas = 0
+        self.penalizacion = 0
+        self.descartadas = 0
+        self.segundos = 0.0
+
+
+def _lote(hoy, ultimo, tamano_lote):
+    return list(
+        Reserva.objects.filter(
+            pk__gt=ultimo, estado='confirmada', fecha_fin__lt=hoy, devolucion__isnull=True
+        )
+        .order_by('pk')
+        .values_list('pk', 'fecha_fin', 'vehiculo_id')[:tamano_lote]
+    )
+
+
+def escanear(hoy=None, tamano_lote=RESERVAS_POR_LOTE, progreso=None):
+    """
+    Actualiza `ReservaAtrasada` a la fecha `hoy`. `progreso`, si se da, se
+    llama con el resultado acumulado después de cada lote.
+    """
+    hoy = hoy or date.today()
+    resultado = ResultadoEscaneo()
+    inicio = time.perf_counter()
+    escaneo = timezone.now()
+    tabla = tarifas.TablaTarifas.cargar()
+    ultimo = 0
+    while filas := _lote(hoy, ultimo, tamano_lote):
+        pks, fechas_fin, vehiculo_ids = zip(*filas)
+        dias_atraso = (np.datetime64(hoy, 'D') - tarifas.fechas(fechas_fin)).astype(np.int64)
+        try:
+            penalizaciones = tarifas.penalizaciones_atraso(tabla, vehiculo_ids, dias_atraso)
+        except KeyError:
+            # Vehículo dado de alta después de leer la tabla
+            tabla = tarifas.TablaTarifas.cargar()
+            penalizaciones = tarifas.penalizaciones_atraso(tabla, vehiculo_ids, dias_atraso)
+        atrasadas = [
+            ReservaAtrasada(
+                reserva_id=pk,
+                fecha_fin=fecha_fin,
+                dias_atraso=dias,
+                penalizacion_proyectada=tarifas.a_decimal(penalizacion),
+                escaneo=escaneo,
+            )
+            for pk, fecha_fin, dias, penalizacion in zip(
+                pks, fechas_fin, dias_atraso.tolist(), penalizaciones.tolist()
+            )
+        ]
+        ReservaAtrasada.objects.bulk_create(
+            atrasadas,
+            update_conflicts=True,
+            unique_fields=['reserva'],
+            update_fields=['fecha_fin', 'dias_atraso', 'penalizacion_proyectada', 'escaneo'],
+        )
+        ultimo = filas[-1][0]
+        resultado.lotes += 1
+        resultado.atrasadas += len(atrasadas)
+        resultado.penalizacion += sum(atrasada.penalizacion_proyectada for atrasada in atrasadas)
+        resultado.segundos = time.perf_counter() - inicio
+        if progreso:
+            progreso(resultado)
+
+    resultado.descartadas, _ = ReservaAtrasada.objects.filter(escaneo__lt=escaneo).delete()
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def resumen(limite=10):
+    """Totales de la última corrida y las `limite` reservas con mayor penalización proyectada"""
+    totales = ReservaAtrasada.objects.aggregate(cantidad=Count('pk'), penalizacion=Sum('penalizacion_proyectada'))
+    mayores = ReservaAtrasada.objects.select_related('reserva__cliente', 'reserva__vehiculo').order_by(
+        '-penalizacion_proyectada'
+    )[:limite]
+    return {
+        'cantidad': totales['cantidad'],
+        'penalizacion': totales['penalizacion'] or 0,
+        'mayores': list(mayores),
+    }
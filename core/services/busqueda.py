@@ -0,0 +1,159 @@
+"""
+Búsqueda de texto para los filtros de las vistas de lista.
+
+En PostgreSQL usa pg_trgm: los índices GIN de trigramas creados en la
+migración 0007 atienden tanto `icontains` como la similitud de palabra,
+que además tolera errores de tipeo, y los resultados se ordenan por
+similitud. En SQLite filtra contra las tablas FTS5 (tokenizador trigram)
+que mantiene la misma migración y ordena coincidencia exacta > prefijo >
+subcadena. En cualquier otro motor se recurre a `icontains`.
+"""
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+CAMPO_RELEVANCIA = 'relevancia'
+
+# Tablas FTS5 de SQLite (ver migración 0007) y columnas que indexan
+TABLAS_FTS = {
+    'core.cliente': ('core_cliente_fts', ('nombre', 'apellido')),
+    'core.vehiculo': ('core_vehiculo_fts', ('marca', 'modelo')),
+    'core.factura': ('core_factura_fts', ('numero',)),
+}
+
+# El tokenizador trigram solo encuentra textos de al menos 3 caracteres
+LONGITUD_MINIMA_FTS = 3
+
+_fts_por_alias = {}
+
+
+def buscar(queryset, criterios):
+    """
+    Filtra `queryset` según `criterios` y lo anota con `relevancia`.
+
+    `criterios` es una lista de pares (texto, campos): cada texto debe
+    aparecer en alguno de sus campos, dados como rutas del ORM
+    (p. ej. 'cliente__nombre'). Los textos vacíos se ignoran; si no queda
+    ninguno el queryset se devuelve sin cambios.
+    """
+    criterios = [(texto.strip(), campos) for texto, campos in criterios if texto and texto.strip()]
+    if not criterios:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    puntajes = []
+    for texto, campos in criterios:
+        condicion = Q()
+        for campo in campos:
+            if vendor == 'postgresql':
+                condicion |= _condicion_postgresql(campo, texto)
+            elif vendor == 'sqlite':
+                condicion |= _condicion_sqlite(queryset, campo, texto)
+            else:
+                condicion |= Q(**{f'{campo}__icontains': texto})
+            puntajes.append(_relevancia(vendor, campo, texto))
+        queryset = queryset.filter(condicion)
+
+    relevancia = puntajes[0]
+    for puntaje in puntajes[1:]:
+        relevancia = relevancia + puntaje
+    return queryset.annotate(**{CAMPO_RELEVANCIA: relevancia})
+
+
+def _condicion_postgresql(campo, texto):
+    return Q(**{f'{campo}__icontains': texto}) | Q(**{f'{campo}__trigram_word_similar': texto})
+
+
+def _condicion_sqlite(queryset, campo, texto):
+    *relacion, columna = campo.split('__')
+    modelo = queryset.model
+    for nombre in relacion:
+        modelo = modelo._meta.get_field(nombre).related_model
+
+    tabla, columnas = TABLAS_FTS.get(modelo._meta.label_lower, (None, ()))
+    if (
+        columna not in columnas
+        or len(texto) < LONGITUD_MINIMA_FTS
+        or not _fts_disponible(queryset.db)
+    ):
+        return Q(**{f'{campo}__icontains': texto})
+
+    frase = texto.replace('"', '""')
+    coincidencias = RawSQL(
+        f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s',
+        (f'{columna} : "{frase}"',),
+    )
+    destino = '__'.join(relacion) if relacion else 'pk'
+    return Q(**{f'{destino}__in': coincidencias})
+
+
+def _relevancia(vendor, campo, texto):
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return TrigramWordSimilarity(texto, campo)
+    return Case(
+        When(**{f'{campo}__iexact': texto}, then=Value(3.0)),
+        When(**{f'{campo}__istartswith': texto}, then=Value(2.0)),
+        When(**{f'{campo}__icontains': texto}, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def _fts_disponible(alias):
+    """Indica si existen las tablas FTS5 en esta base SQLite"""
+    if alias not in _fts_por_alias:
+        tablas = [tabla for tabla, _columnas in TABLAS_FTS.values()]
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s)"
+                % ', '.join(['%s'] * len(tablas)),
+                tablas,
+            )
+            _fts_por_alias[alias] = cursor.fetchone()[0] == len(tablas)
+    return _fts_por_alias[alias]
+
+
+def instalar_fts(connection):
+    """
+    Crea (si faltan) las tablas FTS5 y los triggers que las sincronizan con
+    sus tablas de origen, y las reconstruye cuando hubo que recrear algo.
+
+    La migración 0007 crea lo mismo con su propia copia del DDL; esto se
+    llama tras cada `migrate` porque en SQLite Django reconstruye la tabla
+    al alterar columnas y eso descarta sus triggers.
+    """
+    if connection.vendor != 'sqlite' or connection.Database.sqlite_version_info < (3, 34, 0):
+        # El tokenizador trigram existe desde SQLite 3.34
+        return
+    with connection.cursor() as cursor:
+        for tabla_fts, columnas in TABLAS_FTS.values():
+            tabla = tabla_fts.removesuffix('_fts')
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                (f'{tabla_fts}_a_',),
+            )
+            if cursor.fetchone()[0] == 3:
+                continue
+            lista = ', '.join(columnas)
+            nuevos = ', '.join(f'new.{columna}' for columna in columnas)
+            viejos = ', '.join(f'old.{columna}' for columna in columnas)
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla_fts} USING fts5("
+                f"{lista}, content='{tabla}', content_rowid='id', tokenize='trigram')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_ai AFTER INSERT ON {tabla} BEGIN '
+                f'INSERT INTO {tabla_fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_ad AFTER DELETE ON {tabla} BEGIN '
+                f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {tabla_fts}_au AFTER UPDATE ON {tabla} BEGIN '
+                f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+                f'INSERT INTO {tabla_fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END'
+            )
+            cursor.execute(f"INSERT INTO {tabla_fts}({tabla_fts}) VALUES ('rebuild')")
+    _fts_por_alias.pop(connection.alias, None)
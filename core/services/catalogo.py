@@ -0,0 +1,75 @@
+"""
+Catálogo cacheado de vehículos disponibles.
+
+La página de nueva reserva necesita la flota disponible con etiquetas y
+precios. Se guarda en el cache de Django bajo una versión que las señales
+de `Vehiculo` y `Reserva` incrementan en cada escritura (ver
+`core/signals.py`), así que con el cache caliente la página no consulta
+la tabla de vehículos.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Vehiculo
+from core.services import versiones
+
+CLAVE_VERSION = 'catalogo:version'
+
+
+def _clave(version):
+    return f'catalogo:{version}:disponibles'
+
+
+def etiqueta(marca, modelo, placa, costo_dia):
+    return f"{marca} {modelo} - {placa} - ${costo_dia:,.0f}"
+
+
+def version():
+    return versiones.obtener(CLAVE_VERSION)
+
+
+def etag(prefijo='catalogo'):
+    """
+    ETag fuerte de lo que se derive solo del catálogo: cambia con cada
+    escritura de vehículos o reservas, así que un 304 nunca sirve precios
+    viejos.
+    """
+    return f'"{prefijo}-{version()}"'
+
+
+def disponibles():
+    """
+    Lista de vehículos disponibles como diccionarios con id, marca, modelo,
+    placa, costo_dia y etiqueta.
+    """
+    clave = _clave(version())
+    vehiculos = cache.get(clave)
+    if vehiculos is None:
+        vehiculos = [
+            dict(fila, etiqueta=etiqueta(fila['marca'], fila['modelo'], fila['placa'], fila['costo_dia']))
+            for fila in Vehiculo.objects.filter(disponible=True)
+            .order_by('pk')
+            .values('id', 'marca', 'modelo', 'placa', 'costo_dia')
+        ]
+        cache.set(clave, vehiculos, getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60 * 60 * 24))
+    return vehiculos
+
+
+def buscar(vehiculo_id):
+    """Vehículo disponible del catálogo por id, o None"""
+    try:
+        vehiculo_id = int(vehiculo_id)
+    except (TypeError, ValueError):
+        return None
+    return next((v for v in disponibles() if v['id'] == vehiculo_id), None)
+
+
+def invalidar():
+    """
+    Avanza la versión del catálogo. Se repite al confirmar la transacción
+    para descartar lo que otro proceso haya cacheado antes del commit.
+    """
+    versiones.incrementar(CLAVE_VERSION)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: versiones.incrementar(CLAVE_VERSION))
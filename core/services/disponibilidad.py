@@ -0,0 +1,304 @@
+"""
+Motor de disponibilidad en memoria.
+
+Mantiene, por vehículo, un árbol de intervalos con las reservas activas
+(pendiente/confirmada) para responder las verificaciones de conflicto de
+fechas sin consultar la tabla de reservas en cada intento de reserva.
+
+Cada árbol se construye de forma perezosa la primera vez que se consulta
+un vehículo y se mantiene sincronizado con las señales de `Reserva`
+(ver `core/signals.py`). Como los árboles viven en la memoria de cada
+proceso, cada vehículo lleva además un número de versión en el cache de
+Django: si otro proceso modifica sus reservas, la versión cambia y el
+árbol local se reconstruye en la siguiente consulta.
+
+Eso solo funciona con un cache compartido entre procesos (Redis,
+Memcached, archivos). Con un cache local a cada proceso (LocMemCache, el
+de por defecto) la versión que sube un worker no la ven los demás, así
+que `hay_conflicto` no usa los árboles y consulta la tabla de reservas.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from core.models import Reserva
+from core.services import versiones
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_arboles = {}
+_ubicacion = {}
+_lock = threading.RLock()
+
+
+class _Nodo:
+    __slots__ = ('inicio', 'fin', 'pk', 'prioridad', 'max_fin', 'izq', 'der')
+
+    def __init__(self, inicio, fin, pk):
+        self.inicio = inicio
+        self.fin = fin
+        self.pk = pk
+        self.prioridad = random.random()
+        self.max_fin = fin
+        self.izq = None
+        self.der = None
+
+    @property
+    def clave(self):
+        return (self.inicio, self.pk)
+
+
+def _actualizar(nodo):
+    max_fin = nodo.fin
+    if nodo.izq is not None and nodo.izq.max_fin > max_fin:
+        max_fin = nodo.izq.max_fin
+    if nodo.der is not None and nodo.der.max_fin > max_fin:
+        max_fin = nodo.der.max_fin
+    nodo.max_fin = max_fin
+
+
+def _dividir(nodo, clave):
+    """Divide el treap en (claves < clave, claves >= clave)"""
+    if nodo is None:
+        return None, None
+    if nodo.clave < clave:
+        menor, mayor = _dividir(nodo.der, clave)
+        nodo.der = menor
+        _actualizar(nodo)
+        return nodo, mayor
+    menor, mayor = _dividir(nodo.izq, clave)
+    nodo.izq = mayor
+    _actualizar(nodo)
+    return menor, nodo
+
+
+def _unir(a, b):
+    """Une dos treaps donde todas las claves de `a` son menores que las de `b`"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prioridad > b.prioridad:
+        a.der = _unir(a.der, b)
+        _actualizar(a)
+        return a
+    b.izq = _unir(a, b.izq)
+    _actualizar(b)
+    return b
+
+
+def _eliminar(nodo, clave):
+    if nodo is None:
+        return None
+    if clave == nodo.clave:
+        return _unir(nodo.izq, nodo.der)
+    if clave < nodo.clave:
+        nodo.izq = _eliminar(nodo.izq, clave)
+    else:
+        nodo.der = _eliminar(nodo.der, clave)
+    _actualizar(nodo)
+    return nodo
+
+
+class ArbolIntervalos:
+    """
+    Árbol de intervalos cerrados [inicio, fin] sobre un treap ordenado por
+    (inicio, pk) y aumentado con el `fin` máximo de cada subárbol.
+    Inserción, eliminación y búsqueda de solapamientos en O(log n).
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.raiz = None
+        self.intervalos = {}
+
+    def __len__(self):
+        return len(self.intervalos)
+
+    def __contains__(self, pk):
+        return pk in self.intervalos
+
+    def insertar(self, pk, inicio, fin):
+        if pk in self.intervalos:
+            self.eliminar(pk)
+        self.intervalos[pk] = (inicio, fin)
+        nodo = _Nodo(inicio, fin, pk)
+        menor, mayor = _dividir(self.raiz, nodo.clave)
+        self.raiz = _unir(_unir(menor, nodo), mayor)
+
+    def eliminar(self, pk):
+        intervalo = self.intervalos.pop(pk, None)
+        if intervalo is not None:
+            self.raiz = _eliminar(self.raiz, (intervalo[0], pk))
+
+    def solapa(self, inicio, fin, excluir=None):
+        """Indica si algún intervalo (distinto de `excluir`) se cruza con [inicio, fin]"""
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            if nodo is None or nodo.max_fin < inicio:
+                continue
+            if nodo.inicio <= fin and nodo.fin >= inicio and nodo.pk != excluir:
+                return True
+            if nodo.inicio <= fin:
+                pendientes.append(nodo.der)
+            pendientes.append(nodo.izq)
+        return False
+
+
+def _clave_version(vehiculo_id):
+    return f'disponibilidad:vehiculo:{vehiculo_id}'
+
+
+def _incrementar_version(vehiculo_id):
+    return versiones.incrementar(_clave_version(vehiculo_id))
+
+
+def _cargar(vehiculo_id, version):
+    """Construye el árbol de un vehículo a partir de sus reservas activas"""
+    arbol = ArbolIntervalos(version)
+    filas = Reserva.objects.filter(
+        vehiculo_id=vehiculo_id,
+        estado__in=ESTADOS_ACTIVOS,
+    ).values_list('pk', 'fecha_inicio', 'fecha_fin')
+    for pk, inicio, fin in filas:
+        arbol.insertar(pk, inicio, fin)
+    return arbol
+
+
+def _descartar_arbol(vehiculo_id):
+    arbol = _arboles.pop(vehiculo_id, None)
+    if arbol is not None:
+        for pk in arbol.intervalos:
+            _ubicacion.pop(pk, None)
+
+
+def _arbol(vehiculo_id):
+    """Devuelve el árbol vigente del vehículo, reconstruyéndolo si hace falta"""
+    version = versiones.obtener(_clave_version(vehiculo_id))
+    with _lock:
+        arbol = _arboles.get(vehiculo_id)
+        if arbol is not None and arbol.version == version:
+            return arbol
+        _descartar_arbol(vehiculo_id)
+        arbol = _cargar(vehiculo_id, version)
+        # Un árbol leído dentro de una transacción puede incluir filas que
+        # luego se reviertan: se usa para esta consulta pero no se guarda.
+        if not transaction.get_connection().in_atomic_block:
+            _arboles[vehiculo_id] = arbol
+            for pk in arbol.intervalos:
+                _ubicacion[pk] = vehiculo_id
+        return arbol
+
+
+def usa_arboles():
+    """Si las versiones de los árboles llegan a todos los procesos (cache compartido)"""
+    return settings.CACHES['default']['BACKEND'] not in CACHES_LOCALES
+
+
+def _reservas_solapadas(vehiculo_id, fecha_inicio, fecha_fin, excluir=None):
+    reservas = Reserva.objects.filter(
+        vehiculo_id=vehiculo_id,
+        estado__in=ESTADOS_ACTIVOS,
+        fecha_inicio__lte=fecha_fin,
+        fecha_fin__gte=fecha_inicio,
+    )
+    if excluir is not None:
+        reservas = reservas.exclude(pk=excluir)
+    return reservas
+
+
+def hay_conflicto(vehiculo_id, fecha_inicio, fecha_fin, excluir=None):
+    """
+    Indica si el vehículo tiene una reserva activa que se cruce con el rango
+    [fecha_inicio, fecha_fin]. `excluir` permite ignorar la propia reserva
+    cuando se está editando.
+    """
+    if not usa_arboles():
+        return _reservas_solapadas(vehiculo_id, fecha_inicio, fecha_fin, excluir).exists()
+    return _arbol(vehiculo_id).solapa(fecha_inicio, fecha_fin, excluir=excluir)
+
+
+def _aplicar(vehiculo_id, cambio):
+    """
+    Aplica `cambio` al árbol cargado del vehículo y avanza su versión.
+    Dentro de una transacción el árbol se descarta y la versión se avanza
+    al confirmar, para no conservar cambios que podrían revertirse.
+    """
+    if transaction.get_connection().in_atomic_block:
+        _descartar_arbol(vehiculo_id)
+        transaction.on_commit(lambda: invalidar([vehiculo_id]))
+        return
+    version = _incrementar_version(vehiculo_id)
+    arbol = _arboles.get(vehiculo_id)
+    if arbol is None:
+        return
+    if arbol.version != version - 1:
+        # Otro proceso modificó el vehículo: reconstruir en la próxima consulta
+        _descartar_arbol(vehiculo_id)
+        return
+    cambio(arbol)
+    arbol.version = version
+
+
+def registrar(reserva):
+    """Refleja en el árbol el estado actual de una reserva guardada"""
+    inicio = Reserva._meta.get_field('fecha_inicio').to_python(reserva.fecha_inicio)
+    fin = Reserva._meta.get_field('fecha_fin').to_python(reserva.fecha_fin)
+
+    def cambio(arbol):
+        if reserva.estado in ESTADOS_ACTIVOS:
+            arbol.insertar(reserva.pk, inicio, fin)
+            _ubicacion[reserva.pk] = reserva.vehiculo_id
+        else:
+            arbol.eliminar(reserva.pk)
+            _ubicacion.pop(reserva.pk, None)
+
+    with _lock:
+        anterior = _ubicacion.get(reserva.pk)
+        if anterior is not None and anterior != reserva.vehiculo_id:
+            # La reserva cambió de vehículo
+            _ubicacion.pop(reserva.pk)
+            _aplicar(anterior, lambda arbol: arbol.eliminar(reserva.pk))
+        _aplicar(reserva.vehiculo_id, cambio)
+
+
+def descartar(reserva):
+    """Quita del árbol una reserva eliminada"""
+    def cambio(arbol):
+        arbol.eliminar(reserva.pk)
+        _ubicacion.pop(reserva.pk, None)
+
+    with _lock:
+        _aplicar(reserva.vehiculo_id, cambio)
+
+
+def invalidar(vehiculo_ids=None):
+    """
+    Fuerza la reconstrucción de los árboles indicados (o de todos los
+    cargados en este proceso). Necesario tras escrituras que no disparan
+    señales, como `QuerySet.update()`.
+    """
+    with _lock:
+        if vehiculo_ids is None:
+            vehiculo_ids = list(_arboles)
+        for vehiculo_id in vehiculo_ids:
+            _incrementar_version(vehiculo_id)
+            _descartar_arbol(vehiculo_id)
+
+
+def vehiculos_libres(queryset, fecha_inicio, fecha_fin, excluir=None):
+    """
+    Filtra `queryset` dejando solo los vehículos sin reservas activas que se
+    crucen con [fecha_inicio, fecha_fin], en una sola consulta (anti-join
+    con NOT EXISTS, apoyado en el índice parcial reserva_activa_idx).
+    """
+    ocupadas = _reservas_solapadas(OuterRef('pk'), fecha_inicio, fecha_fin, excluir)
+    return queryset.filter(~Exists(ocupadas))
@@ -0,0 +1,117 @@
+"""
+Facturación por lotes.
+
+Confirma las reservas pendientes y factura las confirmadas que aún no
+tienen factura, por lotes de `RESERVAS_POR_LOTE`. Cada lote es una
+transacción cuyas escrituras no crecen con la cantidad de reservas: una
+lectura con bloqueo, un `UPDATE` de estado, un `UPDATE ... RETURNING`
+para reservar los números de factura, un `bulk_create` de facturas y un
+`UPDATE` de disponibilidad de vehículos, más el ajuste de los indicadores
+(uno por fecha de fin distinta).
+
+Esas escrituras no disparan señales, así que los indicadores del panel,
+el catálogo y el resumen del panel de cada cliente se ajustan a mano (la ocupación no cambia: pendiente y
+confirmada ocupan los mismos días). Volver a correrla es seguro: solo
+toma reservas pendientes o confirmadas sin factura.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.models import Devolucion, Factura, Reserva, Vehiculo
+from core.services import catalogo, indicadores, numeracion, resumen_cliente
+
+RESERVAS_POR_LOTE = 500
+
+
+class ResultadoFacturacion:
+    """Resumen de una facturación por lotes"""
+
+    def __init__(self):
+        self.lotes = 0
+        self.confirmadas = 0
+        self.facturas = 0
+        self.monto = 0
+        self.segundos = 0.0
+
+
+def elegibles(reservas=None):
+    """Reservas pendientes, o confirmadas sin factura, de `reservas` (todas por defecto)"""
+    reservas = Reserva.objects.all() if reservas is None else reservas
+    return reservas.filter(
+        Q(estado='pendiente') | Q(estado='confirmada', factura__isnull=True)
+    )
+
+
+def _facturar_lote(candidatas, tamano_lote, fecha_emision, resultado):
+    """Procesa un lote; devuelve el último pk visto o None si no quedaban"""
+    with transaction.atomic():
+        # skip_locked: las reservas que alguien está confirmando a mano se
+        # dejan para la próxima corrida en vez de esperar su bloqueo
+        filas = list(
+            candidatas.select_for_update(skip_locked=True, of=('self',))
+            .annotate(
+                tiene_factura=Exists(Factura.objects.filter(reserva=OuterRef('pk'))),
+                devuelta=Exists(Devolucion.objects.filter(reserva=OuterRef('pk'))),
+            )
+            .order_by('pk')
+            .values_list(
+                'pk', 'estado', 'total', 'fecha_fin', 'vehiculo_id', 'cliente_id', 'tiene_factura', 'devuelta',
+                named=True,
+            )[:tamano_lote]
+        )
+        if not filas:
+            return None
+
+        # update() no toca los campos auto_now
+        ahora = timezone.now()
+        pendientes = [fila for fila in filas if fila.estado == 'pendiente']
+        if pendientes:
+            Reserva.objects.filter(pk__in=[fila.pk for fila in pendientes], estado='pendiente').update(
+                estado='confirmada', updated_at=ahora
+            )
+        por_facturar = [fila for fila in filas if not fila.tiene_factura]
+        facturas = []
+        if por_facturar:
+            numeros = numeracion.reservar(len(por_facturar))
+            facturas = Factura.objects.bulk_create(
+                Factura(reserva_id=fila.pk, numero=numero, monto=fila.total, fecha_emision=fecha_emision)
+                for fila, numero in zip(por_facturar, numeros)
+            )
+        ocupados = Vehiculo.objects.filter(
+            pk__in={fila.vehiculo_id for fila in pendientes}, disponible=True
+        ).update(disponible=False, updated_at=ahora)
+
+        indicadores.registrar_facturacion(
+            len(pendientes), [fila.fecha_fin for fila in pendientes if not fila.devuelta], facturas
+        )
+        if ocupados:
+            catalogo.invalidar()
+        resumen_cliente.invalidar(*{fila.cliente_id for fila in pendientes + por_facturar})
+
+    resultado.lotes += 1
+    resultado.confirmadas += len(pendientes)
+    resultado.facturas += len(facturas)
+    resultado.monto += sum(factura.monto for factura in facturas)
+    return filas[-1].pk
+
+
+def facturar(reservas=None, tamano_lote=RESERVAS_POR_LOTE, progreso=None):
+    """
+    Confirma las reservas pendientes de `reservas` (un queryset; todas por
+    defecto) y factura las que no tengan factura. `progreso`, si se da, se
+    llama con el resultado acumulado después de cada lote.
+    """
+    resultado = ResultadoFacturacion()
+    inicio = time.perf_counter()
+    fecha_emision = timezone.now().date()
+    candidatas = elegibles(reservas)
+    ultimo = 0
+    while (ultimo := _facturar_lote(candidatas.filter(pk__gt=ultimo), tamano_lote, fecha_emision, resultado)):
+        resultado.segundos = time.perf_counter() - inicio
+        if progreso:
+            progreso(resultado)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,66 @@
+"""
+Cache de fragmentos de listas: tarjetas de vehículos y filas de reservas.
+
+Cada fila se guarda renderizada bajo una clave con el id del objeto y su
+`updated_at` (más el de los relacionados que muestra), así que una fila
+cambiada cae en una clave nueva y las demás se siguen sirviendo del cache;
+no hace falta invalidar nada. Las claves de la página se piden juntas con
+`get_many` y las que faltan se guardan juntas con `set_many`: dos idas al
+cache por página, no dos por fila.
+
+La clave incluye además un hash del código de la plantilla, para que un
+despliegue que la cambie no sirva fragmentos viejos.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+_plantillas = {}
+
+
+def _version_plantilla(nombre):
+    plantilla = get_template(nombre)
+    # Con el loader cacheado el objeto es el mismo en cada petición; con
+    # DEBUG se recarga del disco y el hash sigue al archivo
+    version = _plantillas.get(nombre)
+    if version is None or version[0] is not plantilla:
+        version = _plantillas[nombre] = (plantilla, huella(plantilla.template.source))
+    return plantilla, version[1]
+
+
+def huella(texto):
+    """Hash corto de un texto, para llevarlo a una clave de cache"""
+    return hashlib.md5(texto.encode(), usedforsecurity=False).hexdigest()[:8]
+
+
+def version(*objetos):
+    """Versión de una fila: `updated_at` de los objetos que muestra, en microsegundos"""
+    return '.'.join(f'{objeto.updated_at.timestamp() * 1_000_000:.0f}' for objeto in objetos)
+
+
+def renderizar(nombre, objetos, variable, version_fila, contexto=None, variante=''):
+    """
+    HTML de cada objeto renderizado con la plantilla `nombre`, en el orden
+    de `objetos`. `version_fila(objeto)` da la parte de la clave que cambia
+    con el objeto y `variante` lo que cambia con la petición (filtros que la
+    plantilla muestra), que también va en `contexto`.
+    """
+    plantilla, version_plantilla = _version_plantilla(nombre)
+    claves = [
+        f'fragmento:{nombre}:{version_plantilla}:{variante}:{objeto.pk}:{version_fila(objeto)}'
+        for objeto in objetos
+    ]
+    guardados = cache.get_many(claves)
+    nuevos = {}
+    fragmentos = []
+    for clave, objeto in zip(claves, objetos):
+        html = guardados.get(clave)
+        if html is None:
+            html = nuevos[clave] = plantilla.render({**(contexto or {}), variable: objeto})
+        fragmentos.append(mark_safe(html))
+    if nuevos:
+        cache.set_many(nuevos, getattr(settings, 'FRAGMENTOS_CACHE_TIMEOUT', 60 * 60 * 24))
+    return fragmentos
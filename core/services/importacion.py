@@ -0,0 +1,234 @@
+"""
+Importación masiva de vehículos y clientes desde CSV.
+
+El archivo se lee en streaming y se procesa por lotes: cada lote se
+valida fila por fila y se guarda con `bulk_create(update_conflicts=True)`,
+que inserta las filas nuevas y actualiza las existentes en una sola
+consulta. Los vehículos se identifican por `placa` y los clientes por el
+email de su usuario. Las filas inválidas no detienen la importación: se
+informan en el resultado con su número de línea.
+
+El costo por fila que queda es el hash de las contraseñas de clientes:
+con el hasher completo de Django son del orden de medio segundo cada una.
+Se calculan con `IMPORTACION_HASHER` (por defecto el PBKDF2 rebajado de
+`core/hashers.py`), que Django reemplaza por el preferido en el primer
+inicio de sesión. Las filas sin contraseña no se hashean.
+"""
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+
+from core.models import Cliente, SubcategoriaLicencia, Vehiculo
+from core.services import catalogo
+
+FILAS_POR_LOTE = 1000
+
+# Columnas obligatorias de cada archivo
+COLUMNAS_VEHICULOS = ('placa', 'marca', 'modelo', 'costo_dia')
+COLUMNAS_CLIENTES = ('email', 'nombre', 'apellido', 'licencia')
+
+VERDADEROS = {'1', 'si', 'sí', 's', 'true', 'verdadero', 'x'}
+FALSOS = {'0', 'no', 'n', 'false', 'falso', ''}
+
+
+class ResultadoImportacion:
+    """Resumen de una importación: conteos, errores por línea y velocidad"""
+
+    def __init__(self):
+        self.filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+        self.segundos = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return round(self.filas / self.segundos) if self.segundos else 0
+
+    def error(self, linea, mensaje):
+        self.errores.append((linea, mensaje))
+
+
+def _lotes(lector, tamano):
+    # La línea 1 es el encabezado
+    filas = enumerate(lector, start=2)
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+def _importar(archivo, columnas_requeridas, guardar_lote, tamano_lote):
+    resultado = ResultadoImportacion()
+    inicio = time.perf_counter()
+    lector = csv.DictReader(archivo)
+    faltantes = set(columnas_requeridas) - set(lector.fieldnames or ())
+    if faltantes:
+        resultado.error(1, f"Faltan columnas: {', '.join(sorted(faltantes))}")
+        return resultado
+    for lote in _lotes(lector, tamano_lote):
+        resultado.filas += len(lote)
+        guardar_lote(lote, resultado)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def _texto(fila, columna, requerido=True, max_length=None):
+    valor = (fila.get(columna) or '').strip()
+    if requerido and not valor:
+        raise ValidationError(f"'{columna}' es obligatorio")
+    if max_length and len(valor) > max_length:
+        raise ValidationError(f"'{columna}' admite hasta {max_length} caracteres")
+    return valor
+
+
+def _fallo_lote(resultado, lineas, error):
+    for linea in lineas:
+        resultado.error(linea, f'No se pudo guardar el lote: {error}')
+
+
+def _validar_vehiculo(fila):
+    placa = _texto(fila, 'placa', max_length=20)
+    try:
+        costo_dia = Decimal(_texto(fila, 'costo_dia').replace(',', '.'))
+    except InvalidOperation:
+        raise ValidationError("'costo_dia' no es un número")
+    if costo_dia < 0 or costo_dia.as_tuple().exponent < -2:
+        raise ValidationError("'costo_dia' debe ser positivo y con hasta 2 decimales")
+    disponible = _texto(fila, 'disponible', requerido=False).lower()
+    if disponible not in VERDADEROS | FALSOS:
+        raise ValidationError("'disponible' debe ser sí o no")
+    return Vehiculo(
+        placa=placa,
+        marca=_texto(fila, 'marca', max_length=50),
+        modelo=_texto(fila, 'modelo', max_length=50),
+        costo_dia=costo_dia,
+        color=_texto(fila, 'color', requerido=False, max_length=30) or None,
+        # Sin valor, el vehículo queda disponible como en el formulario
+        disponible=disponible in VERDADEROS or not disponible,
+    )
+
+
+def _guardar_vehiculos(lote, resultado):
+    vehiculos = {}
+    lineas = {}
+    for linea, fila in lote:
+        try:
+            vehiculo = _validar_vehiculo(fila)
+        except ValidationError as error:
+            resultado.error(linea, error.messages[0])
+            continue
+        # Si la placa se repite en el lote, vale la última fila
+        vehiculos[vehiculo.placa] = vehiculo
+        lineas[vehiculo.placa] = linea
+    if not vehiculos:
+        return
+    existentes = set(Vehiculo.objects.filter(placa__in=vehiculos).values_list('placa', flat=True))
+    try:
+        with transaction.atomic():
+            Vehiculo.objects.bulk_create(
+                vehiculos.values(),
+                update_conflicts=True,
+                unique_fields=['placa'],
+                update_fields=['marca', 'modelo', 'costo_dia', 'color', 'disponible', 'updated_at'],
+            )
+    except DatabaseError as error:
+        _fallo_lote(resultado, lineas.values(), error)
+        return
+    resultado.actualizados += len(existentes)
+    resultado.creados += len(vehiculos) - len(existentes)
+
+
+def importar_vehiculos(archivo, tamano_lote=FILAS_POR_LOTE):
+    """
+    Importa vehículos desde un CSV abierto en modo texto, con columnas
+    placa, marca, modelo, costo_dia y opcionalmente color y disponible.
+    """
+    resultado = _importar(archivo, COLUMNAS_VEHICULOS, _guardar_vehiculos, tamano_lote)
+    if resultado.creados or resultado.actualizados:
+        # bulk_create no envía señales
+        catalogo.invalidar()
+    return resultado
+
+
+def _validar_cliente(fila, licencias):
+    email = _texto(fila, 'email', max_length=150)
+    validate_email(email)
+    codigo = _texto(fila, 'licencia').upper()
+    if codigo not in licencias:
+        raise ValidationError(f"Licencia '{codigo}' inexistente")
+    cliente = Cliente(
+        nombre=_texto(fila, 'nombre', max_length=50),
+        apellido=_texto(fila, 'apellido', max_length=50),
+        licencia_id=licencias[codigo],
+        telefono=_texto(fila, 'telefono', requerido=False, max_length=20) or None,
+    )
+    return email, cliente, _texto(fila, 'password', requerido=False)
+
+
+def _guardar_clientes(lote, resultado, licencias):
+    clientes = {}
+    for linea, fila in lote:
+        try:
+            email, cliente, password = _validar_cliente(fila, licencias)
+        except ValidationError as error:
+            resultado.error(linea, error.messages[0])
+            continue
+        clientes[email] = (linea, cliente, password)
+    if not clientes:
+        return
+
+    existentes = set(User.objects.filter(username__in=clientes).values_list('username', flat=True))
+    # Las contraseñas solo se reemplazan si la fila trae una; los usuarios
+    # nuevos sin contraseña quedan con una inutilizable hasta que la definan
+    con_password, sin_password = [], []
+    for email, (_linea, _cliente, password) in clientes.items():
+        usuario = User(
+            username=email,
+            email=email,
+            password=make_password(password or None, hasher=settings.IMPORTACION_HASHER),
+        )
+        (con_password if password else sin_password).append(usuario)
+    try:
+        with transaction.atomic():
+            for usuarios, campos in ((con_password, ['email', 'password']), (sin_password, ['email'])):
+                User.objects.bulk_create(
+                    usuarios, update_conflicts=True, unique_fields=['username'], update_fields=campos
+                )
+            ids = dict(User.objects.filter(username__in=clientes).values_list('username', 'pk'))
+            for email, (_linea, cliente, _password) in clientes.items():
+                cliente.user_id = ids[email]
+            Cliente.objects.bulk_create(
+                [cliente for _linea, cliente, _password in clientes.values()],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['nombre', 'apellido', 'licencia', 'telefono'],
+            )
+    except DatabaseError as error:
+        _fallo_lote(resultado, [linea for linea, _cliente, _password in clientes.values()], error)
+        return
+    resultado.actualizados += len(existentes)
+    resultado.creados += len(clientes) - len(existentes)
+
+
+def importar_clientes(archivo, tamano_lote=FILAS_POR_LOTE):
+    """
+    Importa clientes desde un CSV abierto en modo texto, con columnas
+    email, nombre, apellido, licencia (código de subcategoría) y
+    opcionalmente telefono y password. Crea o actualiza su usuario.
+    """
+    licencias = {
+        codigo.upper(): pk for codigo, pk in SubcategoriaLicencia.objects.values_list('codigo', 'pk')
+    }
+    return _importar(
+        archivo,
+        COLUMNAS_CLIENTES,
+        lambda lote, resultado: _guardar_clientes(lote, resultado, licencias),
+        tamano_lote,
+    )
@@ -0,0 +1,253 @@
+"""
+Indicadores del panel de administración.
+
+Los totales que muestra el panel (reservas por estado, facturación del
+mes, devoluciones atrasadas) se guardan ya agregados en las tablas
+`Resumen*`. Las señales de `Reserva`, `Factura` y `Devolucion` los ajustan
+en cada escritura con la diferencia entre el estado anterior y el nuevo
+(ver `core/signals.py`), así que leerlos cuesta un número fijo de
+consultas sin importar cuánto historial haya.
+
+`reconciliar()` los recalcula desde las tablas de origen y corrige lo que
+no coincida; está expuesto como el comando `reconciliar_indicadores`.
+"""
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from core.models import (
+    Devolucion,
+    Factura,
+    Reserva,
+    ResumenDevolucionPendiente,
+    ResumenEstadoReserva,
+    ResumenIngresoMensual,
+    Vehiculo,
+)
+from core.services import ocupacion
+
+# Estado de las reservas que quedan pendientes de devolución
+ESTADO_EN_CURSO = 'confirmada'
+
+
+def obtener(hoy=None):
+    """Diccionario con los indicadores del panel a la fecha `hoy`"""
+    hoy = hoy or date.today()
+    estados = dict(ResumenEstadoReserva.objects.values_list('estado', 'cantidad'))
+    mes = ResumenIngresoMensual.objects.filter(mes=hoy.replace(day=1)).values('facturas', 'monto').first()
+    atrasadas = ResumenDevolucionPendiente.objects.filter(fecha_fin__lt=hoy).aggregate(
+        total=Sum('reservas')
+    )['total']
+    vehiculos = Vehiculo.objects.count()
+    ocupados = ocupacion.vehiculos_ocupados(hoy)
+    return {
+        'reservas_pendientes': estados.get('pendiente', 0),
+        'reservas_confirmadas': estados.get('confirmada', 0),
+        'reservas_canceladas': estados.get('cancelada', 0),
+        'facturas_mes': mes['facturas'] if mes else 0,
+        'ingresos_mes': mes['monto'] if mes else 0,
+        'devoluciones_atrasadas': atrasadas or 0,
+        'vehiculos': vehiculos,
+        'vehiculos_ocupados': ocupados,
+        'utilizacion': round(100 * ocupados / vehiculos) if vehiculos else 0,
+    }
+
+
+def _sumar(modelo, clave, **deltas):
+    filas = modelo.objects.filter(**clave)
+    incrementos = {campo: F(campo) + delta for campo, delta in deltas.items()}
+    # Lo común es que la fila exista: un solo UPDATE
+    if not filas.update(**incrementos):
+        try:
+            with transaction.atomic():
+                modelo.objects.create(**clave, **deltas)
+            return
+        except IntegrityError:
+            # Otra transacción la creó entre el UPDATE y el INSERT
+            filas.update(**incrementos)
+    if any(delta < 0 for delta in deltas.values()):
+        # Las filas en cero se borran, como si nunca hubieran existido
+        filas.filter(**{campo: 0 for campo in deltas}).delete()
+
+
+def _sumar_estado(estado, delta):
+    _sumar(ResumenEstadoReserva, {'estado': estado}, cantidad=delta)
+
+
+def _sumar_ingreso(fecha_emision, monto, delta):
+    _sumar(ResumenIngresoMensual, {'mes': fecha_emision.replace(day=1)}, facturas=delta, monto=monto * delta)
+
+
+def _sumar_pendiente(fecha_fin, delta):
+    _sumar(ResumenDevolucionPendiente, {'fecha_fin': fecha_fin}, reservas=delta)
+
+
+def _valor(modelo, campo, valor):
+    return modelo._meta.get_field(campo).to_python(valor)
+
+
+def registrar_reserva(reserva, anterior):
+    """
+    Ajusta los indicadores tras guardar `reserva`. `anterior` es su
+    `estado_ocupacion()` antes del cambio, None si es nueva.
+    """
+    if reserva.estado_ocupacion() == anterior:
+        return
+    estado_anterior = anterior[3] if anterior else None
+    fin_anterior = _valor(Reserva, 'fecha_fin', anterior[2]) if anterior else None
+    fin_actual = _valor(Reserva, 'fecha_fin', reserva.fecha_fin)
+    en_curso_antes = estado_anterior == ESTADO_EN_CURSO
+    en_curso_ahora = reserva.estado == ESTADO_EN_CURSO
+    with transaction.atomic(savepoint=False):
+        if estado_anterior != reserva.estado:
+            if estado_anterior:
+                _sumar_estado(estado_anterior, -1)
+            _sumar_estado(reserva.estado, 1)
+        if (en_curso_antes, fin_anterior) == (en_curso_ahora, fin_actual):
+            return
+        if anterior and Devolucion.objects.filter(reserva_id=reserva.pk).exists():
+            # Ya devuelta: no cuenta como pendiente ni antes ni ahora
+            return
+        if en_curso_antes:
+            _sumar_pendiente(fin_anterior, -1)
+        if en_curso_ahora:
+            _sumar_pendiente(fin_actual, 1)
+
+
+def descartar_reserva(reserva):
+    """Ajusta los indicadores tras eliminar `reserva`"""
+    with transaction.atomic(savepoint=False):
+        _sumar_estado(reserva.estado, -1)
+        if reserva.estado == ESTADO_EN_CURSO and not Devolucion.objects.filter(reserva_id=reserva.pk).exists():
+            _sumar_pendiente(reserva.fecha_fin, -1)
+
+
+def registrar_factura(factura, anterior):
+    """
+    Ajusta los indicadores tras guardar `factura`. `anterior` es su
+    `estado_resumen()` antes del cambio, None si es nueva.
+    """
+    actual = (
+        _valor(Factura, 'fecha_emision', factura.fecha_emision),
+        _valor(Factura, 'monto', factura.monto),
+    )
+    if actual == anterior:
+        return
+    if anterior and anterior[0].replace(day=1) == actual[0].replace(day=1):
+        # Mismo mes (p. ej. una penalización): solo cambia el monto
+        _sumar(ResumenIngresoMensual, {'mes': actual[0].replace(day=1)}, facturas=0, monto=actual[1] - anterior[1])
+        return
+    with transaction.atomic(savepoint=False):
+        if anterior:
+            _sumar_ingreso(*anterior, -1)
+        _sumar_ingreso(*actual, 1)
+
+
+def descartar_factura(factura):
+    """Ajusta los indicadores tras eliminar `factura`"""
+    _sumar_ingreso(factura.fecha_emision, factura.monto, -1)
+
+
+def registrar_facturacion(confirmadas, sin_devolver, facturas):
+    """
+    Ajusta los indicadores tras una facturación por lotes, que escribe con
+    `update()` y `bulk_create()` sin señales. `confirmadas` es la cantidad
+    de reservas que pasaron de pendiente a confirmada, `sin_devolver` las
+    fechas de fin de las que no tienen devolución y `facturas` las
+    facturas creadas.
+    """
+    ingresos = defaultdict(lambda: [0, 0])
+    for factura in facturas:
+        mes = ingresos[factura.fecha_emision.replace(day=1)]
+        mes[0] += 1
+        mes[1] += factura.monto
+    with transaction.atomic(savepoint=False):
+        if confirmadas:
+            _sumar_estado('pendiente', -confirmadas)
+            _sumar_estado(ESTADO_EN_CURSO, confirmadas)
+        for fecha_fin, cantidad in Counter(sin_devolver).items():
+            _sumar_pendiente(fecha_fin, cantidad)
+        for mes, (cantidad, monto) in ingresos.items():
+            _sumar(ResumenIngresoMensual, {'mes': mes}, facturas=cantidad, monto=monto)
+
+
+def _devolucion_de(reserva_id, delta):
+    """Resta (-1) o devuelve (+1) la reserva a las devoluciones pendientes"""
+    fecha_fin = (
+        Reserva.objects.filter(pk=reserva_id, estado=ESTADO_EN_CURSO)
+        .values_list('fecha_fin', flat=True)
+        .first()
+    )
+    if fecha_fin:
+        _sumar_pendiente(fecha_fin, delta)
+
+
+def registrar_devolucion(devolucion, reserva_anterior):
+    """
+    Ajusta los indicadores tras guardar `devolucion`. `reserva_anterior`
+    es la reserva a la que pertenecía antes del cambio, None si es nueva.
+    """
+    if devolucion.reserva_id == reserva_anterior:
+        return
+    with transaction.atomic(savepoint=False):
+        if reserva_anterior:
+            _devolucion_de(reserva_anterior, 1)
+        _devolucion_de(devolucion.reserva_id, -1)
+
+
+def descartar_devolucion(devolucion):
+    """Ajusta los indicadores tras eliminar `devolucion`"""
+    _devolucion_de(devolucion.reserva_id, 1)
+
+
+def _esperado():
+    """Valores de cada tabla resumen calculados desde las tablas de origen"""
+    estados = {
+        fila['estado']: {'cantidad': fila['cantidad']}
+        for fila in Reserva.objects.order_by().values('estado').annotate(cantidad=Count('pk'))
+    }
+    ingresos = {
+        fila['mes']: {'facturas': fila['facturas'], 'monto': fila['monto']}
+        for fila in Factura.objects.order_by()
+        .annotate(mes=TruncMonth('fecha_emision'))
+        .values('mes')
+        .annotate(facturas=Count('pk'), monto=Sum('monto'))
+    }
+    pendientes = {
+        fila['fecha_fin']: {'reservas': fila['reservas']}
+        for fila in Reserva.objects.filter(estado=ESTADO_EN_CURSO, devolucion__isnull=True)
+        .order_by()
+        .values('fecha_fin')
+        .annotate(reservas=Count('pk'))
+    }
+    return [
+        (ResumenEstadoReserva, 'estado', estados),
+        (ResumenIngresoMensual, 'mes', ingresos),
+        (ResumenDevolucionPendiente, 'fecha_fin', pendientes),
+    ]
+
+
+def _sincronizar(modelo, clave, esperado):
+    campos = [campo.name for campo in modelo._meta.concrete_fields if campo.name not in ('id', clave)]
+    guardado = {fila.pop(clave): fila for fila in modelo.objects.values(clave, *campos)}
+    sobrantes = guardado.keys() - esperado.keys()
+    if sobrantes:
+        modelo.objects.filter(**{f'{clave}__in': sobrantes}).delete()
+    corregidas = len(sobrantes)
+    for valor, valores in esperado.items():
+        if guardado.get(valor) != valores:
+            modelo.objects.update_or_create(**{clave: valor}, defaults=valores)
+            corregidas += 1
+    return corregidas
+
+
+def reconciliar():
+    """
+    Recalcula los indicadores desde las tablas de origen y corrige las
+    filas que no coincidan. Devuelve la cantidad de filas corregidas.
+    """
+    with transaction.atomic():
+        return sum(_sincronizar(modelo, clave, esperado) for modelo, clave, esperado in _esperado())
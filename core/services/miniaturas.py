@@ -0,0 +1,121 @@
+"""
+Miniaturas responsivas de `Vehiculo.imagen`.
+
+Al guardar un vehículo con una imagen nueva se generan variantes de
+varios anchos en WebP y JPEG (`vehiculos/miniaturas/<nombre>-<ancho>.<ext>`)
+y se anotan en `Vehiculo.miniaturas`. El trabajo corre en un pool de hilos
+después del commit, fuera del hilo de la petición; con
+`MINIATURAS_SINCRONO` se hace en línea (pruebas, comandos). Mientras no
+existan las variantes, las plantillas siguen mostrando la imagen original.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import Vehiculo
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = (320, 640, 1024)
+# Formato: (extensión, opciones de Pillow)
+FORMATOS = {
+    'WEBP': ('webp', {'quality': 80, 'method': 6}),
+    'JPEG': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+CARPETA = 'vehiculos/miniaturas'
+
+_pool = None
+_lock = threading.Lock()
+
+
+def nombre(origen, ancho, formato):
+    extension = FORMATOS[formato][0]
+    return f'{CARPETA}/{PurePosixPath(origen).stem}-{ancho}.{extension}'
+
+
+def vigentes(vehiculo):
+    """Anchos generados para la imagen actual del vehículo ([] si faltan o son de otra imagen)"""
+    miniaturas = vehiculo.miniaturas or {}
+    if not vehiculo.imagen or miniaturas.get('origen') != vehiculo.imagen.name:
+        return []
+    return miniaturas.get('anchos', [])
+
+
+def url(origen, ancho, formato):
+    return default_storage.url(nombre(origen, ancho, formato))
+
+
+def _borrar(origen, anchos):
+    for ancho in anchos:
+        for formato in FORMATOS:
+            default_storage.delete(nombre(origen, ancho, formato))
+
+
+def generar(vehiculo_id):
+    """Genera las variantes de la imagen actual del vehículo. Devuelve los anchos"""
+    vehiculo = Vehiculo.objects.filter(pk=vehiculo_id).only('imagen', 'miniaturas').first()
+    if vehiculo is None or not vehiculo.imagen:
+        return []
+    origen = vehiculo.imagen.name
+    with vehiculo.imagen.open('rb') as archivo, Image.open(archivo) as imagen:
+        imagen = ImageOps.exif_transpose(imagen).convert('RGB')
+        # No se amplía: si la foto es más angosta, su propio ancho es la mayor variante
+        anchos = [ancho for ancho in ANCHOS if ancho < imagen.width] or [imagen.width]
+        for ancho in anchos:
+            alto = round(imagen.height * ancho / imagen.width)
+            variante = imagen.resize((ancho, alto), Image.LANCZOS)
+            for formato, (_extension, opciones) in FORMATOS.items():
+                contenido = BytesIO()
+                variante.save(contenido, formato, **opciones)
+                destino = nombre(origen, ancho, formato)
+                default_storage.delete(destino)
+                default_storage.save(destino, ContentFile(contenido.getvalue()))
+
+    anterior = vehiculo.miniaturas or {}
+    if anterior.get('origen') and anterior['origen'] != origen:
+        _borrar(anterior['origen'], anterior.get('anchos', []))
+    # update() en vez de save(): solo si la imagen no cambió mientras tanto, y sin señales
+    Vehiculo.objects.filter(pk=vehiculo_id, imagen=origen).update(
+        miniaturas={'origen': origen, 'anchos': anchos}, updated_at=timezone.now()
+    )
+    return anchos
+
+
+def _generar_en_segundo_plano(vehiculo_id):
+    try:
+        generar(vehiculo_id)
+    except Exception:
+        logger.exception('No se pudieron generar las miniaturas del vehículo %s', vehiculo_id)
+    finally:
+        # La conexión del hilo del pool no la cierra nadie más
+        connections.close_all()
+
+
+def programar(vehiculo):
+    """Agenda la generación de variantes si la imagen del vehículo no las tiene"""
+    if not vehiculo.imagen or vigentes(vehiculo):
+        return
+    vehiculo_id = vehiculo.pk
+    if getattr(settings, 'MINIATURAS_SINCRONO', False):
+        transaction.on_commit(lambda: generar(vehiculo_id))
+        return
+    transaction.on_commit(lambda: _obtener_pool().submit(_generar_en_segundo_plano, vehiculo_id))
+
+
+def _obtener_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'MINIATURAS_HILOS', 2), thread_name_prefix='miniaturas'
+            )
+    return _pool
@@ -0,0 +1,104 @@
+"""
+Numeración secuencial de facturas.
+
+Cada serie lleva su contador en `SerieFactura`. Un bloque de números se
+reserva con un único `UPDATE ... RETURNING` que incrementa el contador y
+devuelve el último número, sin leer y escribir la fila por separado
+(PostgreSQL y SQLite ≥ 3.35). Los números se forman como `FCT-00000042`,
+así que ordenan igual como texto que como número.
+
+`siguiente()` entrega los números de a uno desde un bloque en memoria del
+proceso de `FACTURAS_BLOQUE` números:
+
+- Con bloque 1 (por defecto) cada número se reserva dentro de la
+  transacción que crea la factura: si esta se revierte, el contador
+  también, y la serie queda sin huecos.
+- Con bloques mayores el contador se toca una vez cada N facturas y los
+  procesos casi no compiten por su fila, a cambio de que los números que
+  un proceso no alcanzó a usar queden como huecos y de que el orden
+  entre procesos no sea estrictamente cronológico.
+
+`reservar(n)` toma n números consecutivos de una vez, para facturación
+por lotes.
+
+Un número escrito a mano no puede tener la forma de los de una serie:
+el contador no lo vería y lo entregaría de nuevo más adelante.
+"""
+import re
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+
+from core.models import SerieFactura
+
+SERIE = 'FCT'
+DIGITOS = 8
+
+_FORMATO = re.compile(rf'[A-Z]+-\d{{{DIGITOS}}}')
+
+_bloques = defaultdict(deque)
+_lock = threading.Lock()
+
+
+def formatear(numero, serie=SERIE):
+    return f'{serie}-{numero:0{DIGITOS}d}'
+
+
+def es_de_serie(numero):
+    """Si `numero` tiene la forma de los que entrega una serie (`FCT-00000042`)"""
+    return _FORMATO.fullmatch(numero) is not None
+
+
+def _incrementar(alias, serie, cantidad):
+    """Suma `cantidad` al contador y devuelve el nuevo último número, o None si la serie no existe"""
+    conexion = connections[alias]
+    nombre = conexion.ops.quote_name
+    sql = (
+        f'UPDATE {nombre(SerieFactura._meta.db_table)} SET {nombre("ultimo")} = {nombre("ultimo")} + %s '
+        f'WHERE {nombre("serie")} = %s RETURNING {nombre("ultimo")}'
+    )
+    with conexion.cursor() as cursor:
+        cursor.execute(sql, [cantidad, serie])
+        fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+
+def reservar(cantidad=1, serie=SERIE):
+    """Reserva `cantidad` números consecutivos de la serie y los devuelve formateados"""
+    alias = router.db_for_write(SerieFactura)
+    ultimo = _incrementar(alias, serie, cantidad)
+    if ultimo is None:
+        try:
+            with transaction.atomic(using=alias):
+                SerieFactura.objects.using(alias).create(serie=serie)
+        except IntegrityError:
+            # Otro proceso creó la serie al mismo tiempo
+            pass
+        ultimo = _incrementar(alias, serie, cantidad)
+    return [formatear(numero, serie) for numero in range(ultimo - cantidad + 1, ultimo + 1)]
+
+
+def _guardar(serie, numeros):
+    with _lock:
+        _bloques[serie].extend(numeros)
+
+
+def siguiente(serie=SERIE):
+    """Siguiente número disponible de la serie para una factura nueva"""
+    with _lock:
+        if _bloques[serie]:
+            return _bloques[serie].popleft()
+    primero, *resto = reservar(getattr(settings, 'FACTURAS_BLOQUE', 1), serie)
+    if resto:
+        # Los sobrantes se comparten recién cuando el bloque quedó
+        # confirmado: si la transacción se revierte, el contador también
+        transaction.on_commit(lambda: _guardar(serie, resto), using=router.db_for_write(SerieFactura))
+    return primero
+
+
+def descartar_bloques():
+    """Olvida los números reservados en memoria (quedan como huecos)"""
+    with _lock:
+        _bloques.clear()
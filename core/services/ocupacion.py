@@ -0,0 +1,310 @@
+"""
+Calendario de ocupación diaria por vehículo.
+
+Cada fila de `OcupacionVehiculo` guarda un mapa de bits de los días de un
+año en que el vehículo tiene una reserva activa (pendiente/confirmada).
+Las señales de `Reserva` lo mantienen al día en cada alta, edición,
+cancelación o borrado (ver `core/signals.py`), y las preguntas de
+ocupación (días ocupados de un rango, si está libre, próxima fecha libre)
+se responden con máscaras y búsqueda de bits sobre una fila por año en
+lugar de recorrer la tabla de reservas.
+
+Cada cambio de bits ajusta además `ResumenOcupacionDiaria`, la cantidad
+de vehículos ocupados por día, así que la ocupación del día que muestra
+el panel (`vehiculos_ocupados`) es una sola fila sin importar el tamaño
+de la flota.
+
+`reconstruir()` regenera ambos desde cero y `verificar()` /
+`verificar_conteo()` los comparan con la tabla de reservas; están
+expuestos como comandos de gestión.
+"""
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.models import OcupacionVehiculo, Reserva, ResumenOcupacionDiaria
+from core.services.disponibilidad import ESTADOS_ACTIVOS
+
+BYTES_POR_ANIO = 46  # 366 días caben en 46 bytes
+MAX_ANIOS_BUSQUEDA = 10
+FECHAS_POR_CONSULTA = 500
+
+
+def _a_entero(dias):
+    return int.from_bytes(bytes(dias), 'little')
+
+
+def _a_bytes(bits):
+    return bits.to_bytes(BYTES_POR_ANIO, 'little')
+
+
+def _dias_del_anio(anio):
+    return (date(anio + 1, 1, 1) - date(anio, 1, 1)).days
+
+
+def _tramos(fecha_inicio, fecha_fin):
+    """Divide [fecha_inicio, fecha_fin] por año: (anio, primer_dia, ultimo_dia)"""
+    for anio in range(fecha_inicio.year, fecha_fin.year + 1):
+        desde = max(fecha_inicio, date(anio, 1, 1))
+        hasta = min(fecha_fin, date(anio, 12, 31))
+        base = date(anio, 1, 1).toordinal()
+        yield anio, desde.toordinal() - base, hasta.toordinal() - base
+
+
+def _mascara(primero, ultimo):
+    return ((1 << (ultimo - primero + 1)) - 1) << primero
+
+
+def _fechas(anio, bits):
+    """Fechas de los bits encendidos de un año"""
+    base = date(anio, 1, 1)
+    while bits:
+        bajo = bits & -bits
+        yield base + timedelta(days=bajo.bit_length() - 1)
+        bits ^= bajo
+
+
+def _contar(fechas, delta):
+    """Suma `delta` a los vehículos ocupados de cada una de `fechas`"""
+    fechas = list(fechas)
+    for i in range(0, len(fechas), FECHAS_POR_CONSULTA):
+        tramo = fechas[i:i + FECHAS_POR_CONSULTA]
+        if delta > 0:
+            # Las fechas que faltan se crean en cero antes de sumar
+            ResumenOcupacionDiaria.objects.bulk_create(
+                (ResumenOcupacionDiaria(fecha=fecha) for fecha in tramo), ignore_conflicts=True,
+            )
+        filas = ResumenOcupacionDiaria.objects.filter(fecha__in=tramo)
+        filas.update(vehiculos=F('vehiculos') + delta)
+        if delta < 0:
+            # Los días sin vehículos se borran, como si nunca hubieran existido
+            filas.filter(vehiculos__lte=0).delete()
+
+
+def _cambiar(vehiculo_id, fecha_inicio, fecha_fin, ocupar):
+    filas = OcupacionVehiculo.objects.select_for_update()
+    cambiadas = []
+    with transaction.atomic(savepoint=False):
+        for anio, primero, ultimo in _tramos(fecha_inicio, fecha_fin):
+            mascara = _mascara(primero, ultimo)
+            fila = filas.filter(vehiculo_id=vehiculo_id, anio=anio).first()
+            if fila is None:
+                # Sin fila no hay nada que liberar (y el vehículo puede estar borrándose)
+                if not ocupar:
+                    continue
+                try:
+                    with transaction.atomic():
+                        OcupacionVehiculo.objects.create(vehiculo_id=vehiculo_id, anio=anio, dias=_a_bytes(mascara))
+                    cambiadas.extend(_fechas(anio, mascara))
+                    continue
+                except IntegrityError:
+                    # Otra transacción creó la fila del año
+                    fila = filas.get(vehiculo_id=vehiculo_id, anio=anio)
+            bits = _a_entero(fila.dias)
+            nuevos = bits | mascara if ocupar else bits & ~mascara
+            if nuevos != bits:
+                fila.dias = _a_bytes(nuevos)
+                fila.save(update_fields=['dias'])
+                cambiadas.extend(_fechas(anio, bits ^ nuevos))
+        # El vehículo pasa a estar (o deja de estar) ocupado solo en los días que cambiaron
+        _contar(cambiadas, 1 if ocupar else -1)
+
+
+def marcar(vehiculo_id, fecha_inicio, fecha_fin):
+    """Marca como ocupados los días del rango"""
+    _cambiar(vehiculo_id, fecha_inicio, fecha_fin, ocupar=True)
+
+
+def liberar(vehiculo_id, fecha_inicio, fecha_fin, excluir=None):
+    """
+    Libera los días del rango, salvo los que siga ocupando otra reserva
+    activa del vehículo (las reservas creadas por el admin pueden solaparse).
+    """
+    with transaction.atomic(savepoint=False):
+        _cambiar(vehiculo_id, fecha_inicio, fecha_fin, ocupar=False)
+        otras = Reserva.objects.filter(
+            vehiculo_id=vehiculo_id,
+            estado__in=ESTADOS_ACTIVOS,
+            fecha_inicio__lte=fecha_fin,
+            fecha_fin__gte=fecha_inicio,
+        ).exclude(pk=excluir).values_list('fecha_inicio', 'fecha_fin')
+        for otra_inicio, otra_fin in otras:
+            marcar(vehiculo_id, max(otra_inicio, fecha_inicio), min(otra_fin, fecha_fin))
+
+
+def _dias_activos(estado):
+    """Vehículo y rango que ocupa un `estado_ocupacion()`, o None si no ocupa días"""
+    if estado is None or estado[3] not in ESTADOS_ACTIVOS:
+        return None
+    vehiculo_id, fecha_inicio, fecha_fin, _estado = estado
+    return (
+        vehiculo_id,
+        Reserva._meta.get_field('fecha_inicio').to_python(fecha_inicio),
+        Reserva._meta.get_field('fecha_fin').to_python(fecha_fin),
+    )
+
+
+def registrar(reserva, anterior):
+    """
+    Actualiza la ocupación tras guardar `reserva`. `anterior` es su
+    `estado_ocupacion()` antes del cambio, None si es nueva.
+    """
+    # Pendiente y confirmada ocupan los mismos días
+    if _dias_activos(reserva.estado_ocupacion()) == _dias_activos(anterior):
+        return
+    campo_inicio = Reserva._meta.get_field('fecha_inicio')
+    campo_fin = Reserva._meta.get_field('fecha_fin')
+    with transaction.atomic(savepoint=False):
+        if anterior is not None and anterior[3] in ESTADOS_ACTIVOS:
+            liberar(anterior[0], anterior[1], anterior[2], excluir=reserva.pk)
+        if reserva.estado in ESTADOS_ACTIVOS:
+            marcar(
+                reserva.vehiculo_id,
+                campo_inicio.to_python(reserva.fecha_inicio),
+                campo_fin.to_python(reserva.fecha_fin),
+            )
+
+
+def descartar(reserva):
+    """Actualiza la ocupación tras eliminar `reserva`"""
+    if reserva.estado in ESTADOS_ACTIVOS:
+        liberar(reserva.vehiculo_id, reserva.fecha_inicio, reserva.fecha_fin, excluir=reserva.pk)
+
+
+def _bits_por_anio(vehiculo_id, anios):
+    filas = OcupacionVehiculo.objects.filter(vehiculo_id=vehiculo_id, anio__in=list(anios))
+    return {anio: _a_entero(dias) for anio, dias in filas.values_list('anio', 'dias')}
+
+
+def dias_ocupados(vehiculo_id, fecha_inicio, fecha_fin):
+    """Cantidad de días ocupados del vehículo dentro del rango"""
+    tramos = list(_tramos(fecha_inicio, fecha_fin))
+    bits = _bits_por_anio(vehiculo_id, (anio for anio, _, _ in tramos))
+    return sum(
+        (bits.get(anio, 0) & _mascara(primero, ultimo)).bit_count()
+        for anio, primero, ultimo in tramos
+    )
+
+
+def esta_libre(vehiculo_id, fecha_inicio, fecha_fin):
+    """Indica si el vehículo no tiene ningún día ocupado en el rango"""
+    return dias_ocupados(vehiculo_id, fecha_inicio, fecha_fin) == 0
+
+
+def proxima_fecha_libre(vehiculo_id, desde=None):
+    """
+    Primer día a partir de `desde` (hoy por defecto) sin reservas activas,
+    buscando hasta `MAX_ANIOS_BUSQUEDA` años; None si no hay ninguno.
+    """
+    desde = desde or date.today()
+    anios = range(desde.year, desde.year + MAX_ANIOS_BUSQUEDA)
+    bits = _bits_por_anio(vehiculo_id, anios)
+    for anio in anios:
+        primero = (desde - date(anio, 1, 1)).days if anio == desde.year else 0
+        libres = ~bits.get(anio, 0) & _mascara(primero, _dias_del_anio(anio) - 1)
+        if libres:
+            # El bit libre más bajo
+            dia = (libres & -libres).bit_length() - 1
+            return date(anio, 1, 1) + timedelta(days=dia)
+    return None
+
+
+def vehiculos_ocupados(fecha):
+    """Cantidad de vehículos con alguna reserva activa en `fecha`"""
+    return ResumenOcupacionDiaria.objects.filter(fecha=fecha).values_list('vehiculos', flat=True).first() or 0
+
+
+def _conteo(mapas):
+    """Vehículos ocupados por fecha según mapas de bits {(vehiculo_id, anio): bits}"""
+    conteo = Counter()
+    for (_vehiculo_id, anio), bits in mapas.items():
+        conteo.update(_fechas(anio, bits))
+    return conteo
+
+
+def _calcular(vehiculo_ids=None):
+    """Mapas de bits esperados según la tabla de reservas: {(vehiculo_id, anio): bits}"""
+    reservas = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS)
+    if vehiculo_ids is not None:
+        reservas = reservas.filter(vehiculo_id__in=vehiculo_ids)
+    esperado = defaultdict(int)
+    filas = reservas.values_list('vehiculo_id', 'fecha_inicio', 'fecha_fin')
+    for vehiculo_id, fecha_inicio, fecha_fin in filas.iterator(chunk_size=5000):
+        for anio, primero, ultimo in _tramos(fecha_inicio, fecha_fin):
+            esperado[(vehiculo_id, anio)] |= _mascara(primero, ultimo)
+    return esperado
+
+
+def reconstruir(vehiculo_ids=None):
+    """Regenera desde cero la ocupación (de todos o de los vehículos indicados)"""
+    esperado = _calcular(vehiculo_ids)
+    with transaction.atomic():
+        existentes = OcupacionVehiculo.objects.all()
+        if vehiculo_ids is not None:
+            existentes = existentes.filter(vehiculo_id__in=vehiculo_ids)
+            # Solo cambia la parte del conteo diario de esos vehículos
+            anteriores = _conteo({
+                (vehiculo_id, anio): _a_entero(dias)
+                for vehiculo_id, anio, dias in existentes.values_list('vehiculo_id', 'anio', 'dias')
+            })
+            diferencias = _conteo(esperado)
+            diferencias.subtract(anteriores)
+            por_delta = defaultdict(list)
+            for fecha, delta in diferencias.items():
+                if delta:
+                    por_delta[delta].append(fecha)
+            for delta, fechas in por_delta.items():
+                _contar(fechas, delta)
+        else:
+            ResumenOcupacionDiaria.objects.all().delete()
+            ResumenOcupacionDiaria.objects.bulk_create(
+                (ResumenOcupacionDiaria(fecha=fecha, vehiculos=vehiculos) for fecha, vehiculos in _conteo(esperado).items()),
+                batch_size=1000,
+            )
+        existentes.delete()
+        OcupacionVehiculo.objects.bulk_create(
+            (
+                OcupacionVehiculo(vehiculo_id=vehiculo_id, anio=anio, dias=_a_bytes(bits))
+                for (vehiculo_id, anio), bits in esperado.items()
+            ),
+            batch_size=1000,
+        )
+    return len(esperado)
+
+
+def verificar():
+    """
+    Compara la ocupación guardada con la tabla de reservas. Devuelve una
+    lista de (vehiculo_id, anio, días de más, días de menos).
+    """
+    esperado = _calcular()
+    guardado = {
+        (vehiculo_id, anio): _a_entero(dias)
+        for vehiculo_id, anio, dias in OcupacionVehiculo.objects.values_list('vehiculo_id', 'anio', 'dias').iterator()
+    }
+    diferencias = []
+    for clave in sorted(esperado.keys() | guardado.keys()):
+        esperados, guardados = esperado.get(clave, 0), guardado.get(clave, 0)
+        if esperados != guardados:
+            diferencias.append((
+                *clave,
+                (guardados & ~esperados).bit_count(),
+                (esperados & ~guardados).bit_count(),
+            ))
+    return diferencias
+
+
+def verificar_conteo():
+    """
+    Compara los vehículos ocupados por día con la tabla de reservas.
+    Devuelve una lista de (fecha, guardados, esperados).
+    """
+    esperado = _conteo(_calcular())
+    guardado = dict(ResumenOcupacionDiaria.objects.values_list('fecha', 'vehiculos'))
+    return [
+        (fecha, guardado.get(fecha, 0), esperado.get(fecha, 0))
+        for fecha in sorted(esperado.keys() | guardado.keys())
+        if guardado.get(fecha, 0) != esperado.get(fecha, 0)
+    ]
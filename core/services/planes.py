@@ -0,0 +1,127 @@
+"""
+Planes de ejecución de las consultas frecuentes.
+
+`CONSULTAS` reúne las consultas que más se repiten en las vistas, los
+formularios y los servicios, armadas igual que allí (mismos filtros y
+mismo orden de paginación). `explicar()` pide el plan de cada una con
+`QuerySet.explain()` y devuelve las tablas que se recorren completas en
+vez de buscarse por un índice:
+
+- PostgreSQL: nodos `Seq Scan` del plan en JSON.
+- SQLite: pasos `SCAN tabla` sin `USING INDEX` del EXPLAIN QUERY PLAN.
+
+Con pocas filas el planificador de PostgreSQL prefiere recorrer la tabla
+aunque haya índice, así que el resultado solo es significativo sobre una
+base con datos y estadísticas al día (ver el comando explicar_consultas).
+"""
+import json
+import re
+from datetime import date, timedelta
+
+from django.db import connection
+
+from core.models import Devolucion, Factura, Reserva, Vehiculo
+from core.services import disponibilidad, facturacion
+from core.services.disponibilidad import ESTADOS_ACTIVOS
+
+POR_PAGINA = 26  # paginate_by + 1, como KeysetPaginationMixin
+
+_SCAN_SQLITE = re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)(?: AS (\S+))?(?!.*\bUSING\b)')
+
+
+class Muestra:
+    """Valores reales de la base para los parámetros de las consultas"""
+
+    def __init__(self, hoy=None):
+        self.hoy = hoy or date.today()
+        fila = Reserva.objects.order_by('-pk').values('cliente_id', 'vehiculo_id').first() or {}
+        self.cliente_id = fila.get('cliente_id', 0)
+        self.vehiculo_id = fila.get('vehiculo_id', 0)
+
+
+def _reservas_del_cliente(muestra):
+    return Reserva.objects.filter(cliente_id=muestra.cliente_id)
+
+
+CONSULTAS = {
+    # Servicio de reservas y formularios: solapamiento y vehículo ocupado
+    'solapamiento': lambda m: Reserva.objects.filter(
+        vehiculo_id=m.vehiculo_id, estado__in=ESTADOS_ACTIVOS,
+        fecha_inicio__lte=m.hoy + timedelta(days=3), fecha_fin__gte=m.hoy,
+    )[:1],
+    'vehiculo_ocupado': lambda m: Reserva.objects.filter(
+        vehiculo_id=m.vehiculo_id, estado__in=ESTADOS_ACTIVOS, devolucion__isnull=True,
+    )[:1],
+    # Catálogo cacheado y catálogo del cliente (sin filtros y por fechas)
+    'catalogo': lambda m: Vehiculo.objects.filter(disponible=True).order_by('pk').values(
+        'id', 'marca', 'modelo', 'placa', 'costo_dia'
+    ),
+    'vehiculos_cliente': lambda m: Vehiculo.objects.filter(disponible=True).order_by(
+        '-disponible', 'marca', 'pk'
+    )[:POR_PAGINA],
+    'vehiculos_libres': lambda m: disponibilidad.vehiculos_libres(
+        Vehiculo.objects.filter(disponible=True), m.hoy, m.hoy + timedelta(days=3)
+    ).order_by('-disponible', 'marca', 'pk')[:POR_PAGINA],
+    # Listas del administrador
+    'reservas_admin': lambda m: Reserva.objects.select_related('vehiculo', 'cliente').order_by(
+        '-fecha_inicio', '-pk'
+    )[:POR_PAGINA],
+    'facturas_admin': lambda m: Factura.objects.select_related('reserva').order_by(
+        '-fecha_emision', '-pk'
+    )[:POR_PAGINA],
+    'devoluciones_admin': lambda m: Devolucion.objects.select_related('reserva').order_by(
+        '-fecha_devolucion', '-pk'
+    )[:POR_PAGINA],
+    # Panel del cliente
+    'reservas_cliente': lambda m: _reservas_del_cliente(m).select_related('vehiculo').order_by(
+        '-fecha_inicio', '-pk'
+    )[:POR_PAGINA],
+    'facturas_cliente': lambda m: Factura.objects.filter(reserva__in=_reservas_del_cliente(m)).select_related(
+        'reserva'
+    ).order_by('-fecha_emision', '-pk')[:POR_PAGINA],
+    'devoluciones_cliente': lambda m: Devolucion.objects.filter(
+        reserva__in=_reservas_del_cliente(m)
+    ).select_related('reserva').order_by('-fecha_devolucion', '-pk')[:POR_PAGINA],
+    # Filas que agrega resumen_cliente.calcular()
+    'resumen_cliente': lambda m: _reservas_del_cliente(m).values('estado', 'fecha_fin', 'factura__monto', 'devolucion__pk'),
+    # Procesos por lotes: atrasos y facturación
+    'atrasos': lambda m: Reserva.objects.filter(
+        pk__gt=0, estado='confirmada', fecha_fin__lt=m.hoy, devolucion__isnull=True
+    ).order_by('pk').values_list('pk', 'fecha_fin', 'vehiculo_id')[:POR_PAGINA],
+    'por_facturar': lambda m: facturacion.elegibles().filter(pk__gt=0).order_by('pk').values_list('pk')[:POR_PAGINA],
+}
+
+
+def _recorridos_postgresql(plan):
+    nodos = json.loads(plan) if isinstance(plan, str) else plan
+    pendientes = [nodo['Plan'] for nodo in nodos]
+    tablas = []
+    while pendientes:
+        nodo = pendientes.pop()
+        if nodo.get('Node Type') in ('Seq Scan', 'Parallel Seq Scan'):
+            tablas.append(nodo.get('Relation Name'))
+        pendientes.extend(nodo.get('Plans', []))
+    return tablas
+
+
+def _recorridos_sqlite(plan):
+    return [
+        coincidencia.group(1)
+        for coincidencia in (_SCAN_SQLITE.search(linea) for linea in plan.splitlines())
+        if coincidencia and not coincidencia.group(1).startswith('(')
+    ]
+
+
+def explicar(consultas=None, muestra=None):
+    """{nombre: (plan, tablas recorridas de forma secuencial)} de las consultas pedidas"""
+    muestra = muestra or Muestra()
+    resultado = {}
+    for nombre in consultas or CONSULTAS:
+        queryset = CONSULTAS[nombre](muestra)
+        if connection.vendor == 'postgresql':
+            plan = queryset.explain(format='json')
+            resultado[nombre] = (plan, _recorridos_postgresql(plan))
+        else:
+            plan = queryset.explain()
+            resultado[nombre] = (plan, _recorridos_sqlite(plan))
+    return resultado
@@ -0,0 +1,155 @@
+"""
+Transiciones de estado de las reservas.
+
+Cada transición (crear, confirmar, cancelar, devolver, eliminar) corre en
+una sola transacción: bloquea la reserva y su vehículo con
+`select_for_update`, vuelve a validar bajo el bloqueo lo que el formulario
+ya comprobó y escribe solo las columnas que cambian. Así dos peticiones
+simultáneas sobre el mismo vehículo no pueden dejar fechas solapadas,
+facturas duplicadas ni un `Vehiculo.disponible` que no corresponda a sus
+reservas.
+
+Las reservas existentes se bloquean antes que su vehículo (en la misma
+consulta), y una reserva nueva solo bloquea el vehículo, así que el orden
+de los bloqueos es siempre el mismo.
+"""
+from django.db import IntegrityError, transaction
+
+from core.models import Reserva, Vehiculo
+from core.services.disponibilidad import ESTADOS_ACTIVOS
+
+
+class TransicionInvalida(Exception):
+    """La reserva no admite la transición pedida en su estado actual"""
+
+
+def _bloquear(reserva_pk):
+    # Factura y devolución vienen en el mismo JOIN para no consultarlas
+    # después, pero sin bloquearlas: son el lado opcional del JOIN
+    return (
+        Reserva.objects.select_related('vehiculo', 'factura', 'devolucion')
+        .select_for_update(of=('self', 'vehiculo'))
+        .get(pk=reserva_pk)
+    )
+
+
+def _hay_solapamiento(reserva):
+    otras = Reserva.objects.filter(
+        vehiculo_id=reserva.vehiculo_id,
+        estado__in=ESTADOS_ACTIVOS,
+        fecha_inicio__lte=reserva.fecha_fin,
+        fecha_fin__gte=reserva.fecha_inicio,
+    )
+    if reserva.pk:
+        otras = otras.exclude(pk=reserva.pk)
+    return otras.exists()
+
+
+def _sincronizar_disponible(vehiculo, ocupado=None):
+    """
+    Deja `vehiculo.disponible` en falso mientras tenga reservas activas sin
+    devolver. Con `ocupado` conocido no consulta; solo escribe si cambia.
+    """
+    if ocupado is None:
+        ocupado = Reserva.objects.filter(
+            vehiculo_id=vehiculo.pk, estado__in=ESTADOS_ACTIVOS, devolucion__isnull=True
+        ).exists()
+    if vehiculo.disponible == ocupado:
+        vehiculo.disponible = not ocupado
+        vehiculo.save(update_fields=['disponible', 'updated_at'])
+
+
+def crear(reserva):
+    """
+    Guarda una reserva nueva (sin guardar todavía). Si queda activa ocupa
+    el vehículo y, si nace confirmada, emite su factura.
+    """
+    with transaction.atomic():
+        reserva.vehiculo = Vehiculo.objects.select_for_update().get(pk=reserva.vehiculo_id)
+        activa = reserva.estado in ESTADOS_ACTIVOS
+        if activa and _hay_solapamiento(reserva):
+            raise TransicionInvalida('El vehículo está reservado en las fechas seleccionadas.')
+        if not reserva.total:
+            reserva.total = reserva.calcular_total()
+        reserva.save(force_insert=True)
+        if activa:
+            _sincronizar_disponible(reserva.vehiculo, ocupado=True)
+        if reserva.estado == 'confirmada':
+            reserva.crear_factura_automatica()
+    return reserva
+
+
+def _activar(reserva, estado):
+    if reserva.estado == 'cancelada' and _hay_solapamiento(reserva):
+        raise TransicionInvalida('El vehículo ya está reservado en las fechas de esta reserva.')
+    reserva.estado = estado
+    reserva.save(update_fields=['estado', 'updated_at'])
+    _sincronizar_disponible(reserva.vehiculo, ocupado=True)
+    if estado == 'confirmada':
+        reserva.crear_factura_automatica()
+    return reserva
+
+
+def confirmar(reserva_pk):
+    """Confirma una reserva pendiente y emite su factura"""
+    with transaction.atomic():
+        reserva = _bloquear(reserva_pk)
+        if reserva.estado != 'pendiente':
+            raise TransicionInvalida('Solo se pueden confirmar reservas pendientes.')
+        return _activar(reserva, 'confirmada')
+
+
+def cancelar(reserva_pk):
+    """Cancela una reserva activa y libera el vehículo si no le quedan otras"""
+    with transaction.atomic():
+        reserva = _bloquear(reserva_pk)
+        if reserva.estado not in ESTADOS_ACTIVOS:
+            raise TransicionInvalida('La reserva ya está cancelada.')
+        reserva.estado = 'cancelada'
+        reserva.save(update_fields=['estado', 'updated_at'])
+        _sincronizar_disponible(reserva.vehiculo)
+    return reserva
+
+
+def cambiar_estado(reserva_pk, estado):
+    """Lleva la reserva a `estado` desde cualquier otro (aprobación del admin)"""
+    if estado == 'cancelada':
+        return cancelar(reserva_pk)
+    with transaction.atomic():
+        reserva = _bloquear(reserva_pk)
+        if reserva.estado == estado:
+            return reserva
+        return _activar(reserva, estado)
+
+
+def devolver(devolucion):
+    """
+    Registra la devolución (sin guardar todavía) de una reserva
+    confirmada: calcula la penalización, la suma a la factura y libera el
+    vehículo si no le quedan otras reservas activas.
+    """
+    with transaction.atomic():
+        reserva = _bloquear(devolucion.reserva_id)
+        if reserva.estado != 'confirmada':
+            raise TransicionInvalida('Solo se puede registrar la devolución de reservas confirmadas.')
+        if hasattr(reserva, 'devolucion'):
+            raise TransicionInvalida('Esta reserva ya tiene una devolución registrada.')
+        devolucion.reserva = reserva
+        devolucion.calcular_penalizacion()
+        try:
+            devolucion.save(force_insert=True)
+        except IntegrityError:
+            # Otra devolución de la misma reserva entró antes que el bloqueo
+            raise TransicionInvalida('Esta reserva ya tiene una devolución registrada.')
+        devolucion.actualizar_factura_con_penalizacion()
+        _sincronizar_disponible(reserva.vehiculo)
+    return devolucion
+
+
+def eliminar(reserva_pk):
+    """Elimina la reserva (con su factura y devolución) y libera el vehículo"""
+    with transaction.atomic():
+        reserva = _bloquear(reserva_pk)
+        vehiculo = reserva.vehiculo
+        reserva.delete()
+        _sincronizar_disponible(vehiculo)
@@ -0,0 +1,77 @@
+"""
+Resumen cacheado del panel de cliente.
+
+Reservas activas, facturas pendientes con su monto y devoluciones
+próximas de un cliente salen de una sola consulta agregada sobre sus
+reservas (factura y devolución son uno a uno, así que los JOIN no
+multiplican filas). El resultado se guarda en el cache de Django bajo una
+versión por cliente que las señales de `Reserva`, `Factura` y
+`Devolucion` incrementan cuando cambia una fila de ese cliente (ver
+`core/signals.py`); las escrituras por lotes la avanzan a mano.
+
+Una factura está pendiente mientras su reserva confirmada no tenga
+devolución: hasta entonces el alquiler sigue abierto y su monto puede
+crecer con la penalización.
+"""
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+
+from core.models import Reserva
+from core.services import versiones
+from core.services.disponibilidad import ESTADOS_ACTIVOS
+
+DIAS_PROXIMAS = 7
+DURACION_CACHE = 60 * 60 * 24
+
+
+def _clave_version(cliente_id):
+    return f'cliente:{cliente_id}:version'
+
+
+def calcular(cliente_id, hoy=None):
+    """Resumen del cliente a la fecha `hoy`, leído de la base de datos"""
+    hoy = hoy or date.today()
+    en_curso = Q(estado='confirmada', devolucion__isnull=True)
+    resumen = Reserva.objects.filter(cliente_id=cliente_id).aggregate(
+        activas=Count('pk', filter=Q(estado__in=ESTADOS_ACTIVOS, devolucion__isnull=True)),
+        facturas_pendientes=Count('factura', filter=en_curso),
+        monto_pendiente=Sum('factura__monto', filter=en_curso),
+        proximas_devoluciones=Count(
+            'pk', filter=en_curso & Q(fecha_fin__gte=hoy, fecha_fin__lte=hoy + timedelta(days=DIAS_PROXIMAS))
+        ),
+        devoluciones_atrasadas=Count('pk', filter=en_curso & Q(fecha_fin__lt=hoy)),
+        proxima_devolucion=Min('fecha_fin', filter=en_curso & Q(fecha_fin__gte=hoy)),
+    )
+    resumen['monto_pendiente'] = resumen['monto_pendiente'] or 0
+    return resumen
+
+
+def obtener(cliente_id, hoy=None):
+    """Resumen del cliente, desde el cache mientras no cambien sus filas"""
+    hoy = hoy or date.today()
+    clave = f'cliente:{cliente_id}:{versiones.obtener(_clave_version(cliente_id))}:resumen:{hoy.isoformat()}'
+    resumen = cache.get(clave)
+    if resumen is None:
+        resumen = calcular(cliente_id, hoy)
+        cache.set(clave, resumen, DURACION_CACHE)
+    return resumen
+
+
+def invalidar(*cliente_ids):
+    """
+    Avanza la versión de los clientes. Como en el catálogo, se repite al
+    confirmar la transacción por lo que otro proceso haya cacheado antes
+    del commit.
+    """
+    cliente_ids = {cliente_id for cliente_id in cliente_ids if cliente_id is not None}
+
+    def incrementar():
+        for cliente_id in cliente_ids:
+            versiones.incrementar(_clave_version(cliente_id))
+
+    incrementar()
+    if cliente_ids and transaction.get_connection().in_atomic_block:
+        transaction.on_commit(incrementar)
@@ -0,0 +1,23 @@
+"""
+Contadores de versión guardados en el cache de Django.
+
+Sirven para invalidar datos cacheados sin borrar claves: quien cachea algo
+lo guarda bajo la versión vigente y quien escribe solo incrementa el
+contador. Con un cache compartido (Redis, Memcached) las invalidaciones
+llegan a todos los procesos.
+"""
+from django.core.cache import cache
+
+
+def obtener(clave):
+    return cache.get(clave, 0)
+
+
+def incrementar(clave):
+    cache.add(clave, 0, timeout=None)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave expiró entre add() e incr()
+        cache.set(clave, 1, timeout=None)
+        return 1
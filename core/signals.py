@@ -0,0 +1,134 @@
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_save
+from django.dispatch import receiver
+from core.models import Vehiculo, Reserva, Factura, Devolucion
+from core.services import busqueda, catalogo, disponibilidad, indicadores, miniaturas, ocupacion, resumen_cliente
+
+
+# Mantener sincronizado el motor de disponibilidad
+@receiver(post_save, sender=Reserva)
+def reserva_guardada(sender, instance, **kwargs):
+    disponibilidad.registrar(instance)
+
+
+@receiver(post_delete, sender=Reserva)
+def reserva_eliminada(sender, instance, **kwargs):
+    disponibilidad.descartar(instance)
+
+
+# Mantener el calendario de ocupación diaria y los indicadores del panel
+def _leer_anterior(instance, atributo, campos, using):
+    """
+    Lee con una consulta por pk los `campos` guardados de una fila que se
+    va a guardar sin la foto que deja `from_db` en `atributo` (instancia
+    armada con pk explícito o leída con campos diferidos). Completa además
+    los campos diferidos, que este save() no cambia.
+    """
+    if getattr(instance, atributo, None) is not None or instance.pk is None:
+        return
+    fila = type(instance)._base_manager.using(using).filter(pk=instance.pk).values_list(*campos).first()
+    if fila is None:
+        # Todavía no existe: el save() la crea
+        return
+    for campo, valor in zip(campos, fila):
+        instance.__dict__.setdefault(campo, valor)
+    setattr(instance, atributo, fila if len(campos) > 1 else fila[0])
+
+
+@receiver(pre_save, sender=Reserva)
+def leer_reserva_anterior(sender, instance, using, **kwargs):
+    _leer_anterior(instance, '_ocupacion_original', ('vehiculo_id', 'fecha_inicio', 'fecha_fin', 'estado'), using)
+
+
+@receiver(post_save, sender=Reserva)
+def actualizar_ocupacion(sender, instance, created, **kwargs):
+    anterior = None if created else instance._ocupacion_original
+    ocupacion.registrar(instance, anterior)
+    indicadores.registrar_reserva(instance, anterior)
+    instance._ocupacion_original = instance.estado_ocupacion()
+
+
+@receiver(post_delete, sender=Reserva)
+def liberar_ocupacion(sender, instance, **kwargs):
+    ocupacion.descartar(instance)
+    indicadores.descartar_reserva(instance)
+
+
+@receiver(pre_save, sender=Factura)
+def leer_factura_anterior(sender, instance, using, **kwargs):
+    _leer_anterior(instance, '_resumen_original', ('fecha_emision', 'monto'), using)
+
+
+@receiver(post_save, sender=Factura)
+def factura_guardada(sender, instance, created, **kwargs):
+    anterior = None if created else instance._resumen_original
+    indicadores.registrar_factura(instance, anterior)
+    instance._resumen_original = instance.estado_resumen()
+
+
+@receiver(post_delete, sender=Factura)
+def factura_eliminada(sender, instance, **kwargs):
+    indicadores.descartar_factura(instance)
+
+
+@receiver(pre_save, sender=Devolucion)
+def leer_devolucion_anterior(sender, instance, using, **kwargs):
+    _leer_anterior(instance, '_resumen_original', ('reserva_id',), using)
+
+
+@receiver(post_save, sender=Devolucion)
+def devolucion_guardada(sender, instance, created, **kwargs):
+    anterior = None if created else instance._resumen_original
+    indicadores.registrar_devolucion(instance, anterior)
+    instance._resumen_original = instance.reserva_id
+
+
+@receiver(post_delete, sender=Devolucion)
+def devolucion_eliminada(sender, instance, **kwargs):
+    indicadores.descartar_devolucion(instance)
+
+
+# Invalidar el catálogo cacheado de vehículos disponibles
+@receiver(post_save, sender=Vehiculo)
+@receiver(post_delete, sender=Vehiculo)
+@receiver(post_save, sender=Reserva)
+@receiver(post_delete, sender=Reserva)
+def invalidar_catalogo(sender, **kwargs):
+    catalogo.invalidar()
+
+
+# Invalidar el resumen cacheado del panel del cliente dueño de la fila
+@receiver(post_save, sender=Reserva)
+@receiver(post_delete, sender=Reserva)
+def invalidar_resumen_reserva(sender, instance, **kwargs):
+    resumen_cliente.invalidar(instance.cliente_id, getattr(instance, '_cliente_original', None))
+    instance._cliente_original = instance.cliente_id
+
+
+@receiver(post_save, sender=Factura)
+@receiver(post_delete, sender=Factura)
+@receiver(post_save, sender=Devolucion)
+@receiver(post_delete, sender=Devolucion)
+def invalidar_resumen_reserva_relacionada(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Reserva):
+        # Borrado en cascada: la señal de la reserva ya invalidó
+        return
+    # Casi siempre la reserva ya está cargada (servicio de reservas, formularios)
+    if sender._meta.get_field('reserva').is_cached(instance):
+        cliente_id = instance.reserva.cliente_id
+    else:
+        cliente_id = Reserva.objects.filter(pk=instance.reserva_id).values_list('cliente_id', flat=True).first()
+    resumen_cliente.invalidar(cliente_id)
+
+
+# Generar las variantes redimensionadas de la imagen del vehículo
+@receiver(post_save, sender=Vehiculo)
+def programar_miniaturas(sender, instance, **kwargs):
+    miniaturas.programar(instance)
+
+
+# En SQLite, migrar puede reconstruir tablas y descartar los triggers FTS5
+@receiver(post_migrate)
+def reinstalar_busqueda(sender, using, **kwargs):
+    if sender.name == 'core':
+        busqueda.instalar_fts(connections[using])
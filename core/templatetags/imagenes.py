@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.services import miniaturas
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_vehiculo(vehiculo, sizes='100vw', clase='', ancho=640):
+    """
+    <picture> con las variantes WebP/JPEG de la imagen del vehículo en
+    srcset; si todavía no se generaron, <img> con la imagen original.
+    `ancho` elige la variante JPEG del atributo src.
+    """
+    alt = f'{vehiculo.marca} {vehiculo.modelo}'
+    anchos = miniaturas.vigentes(vehiculo)
+    if not anchos:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            vehiculo.imagen.url, alt, clase,
+        )
+
+    origen = vehiculo.imagen.name
+
+    def srcset(formato):
+        return format_html_join(', ', '{} {}w', ((miniaturas.url(origen, a, formato), a) for a in anchos))
+
+    principal = min(anchos, key=lambda a: abs(a - ancho))
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        srcset('WEBP'), sizes,
+        miniaturas.url(origen, principal, 'JPEG'), srcset('JPEG'), sizes, alt, clase,
+    )
@@ -1,3 +1,1315 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import random
+import tempfile
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from types import ModuleType
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import path, reverse
+from django.views.generic import ListView
+from prometheus_client import REGISTRY
+
+from core import consultas, replicas, signals, urls
+from core.forms import FacturaForm
+from core.middleware import PresupuestoConsultasMiddleware
+from core.mixins import KeysetPaginationMixin
+from core.models import (
+    CategoriaLicencia, Cliente, Devolucion, Factura, OcupacionVehiculo, Reserva, ReservaAtrasada,
+    ResumenOcupacionDiaria, SerieFactura, SubcategoriaLicencia, Vehiculo,
+)
+from core.services import atrasos, busqueda, disponibilidad, facturacion, importacion, indicadores, numeracion, ocupacion, planes, reservas, resumen_cliente, tarifas
+from core.views.cliente_panel_views import VERSIONES_ASYNC
+
+
+class ConsultasTestMixin:
+    """Verifica presupuesto de consultas y ausencia de N+1 en una petición"""
+
+    def assertPresupuestoConsultas(self, cliente, url, **kwargs):
+        with consultas.registrar() as registro:
+            respuesta = cliente.get(url, **kwargs)
+        self.assertEqual(respuesta.status_code, 200, url)
+        limite = consultas.presupuesto(respuesta.resolver_match.func)
+        self.assertIsNotNone(limite, f'{url} no declara presupuesto_consultas')
+        self.assertEqual(consultas.problemas(registro, limite), [], url)
+        return respuesta
+
+
+# Hasher rápido: los datos de prueba crean decenas de usuarios
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PresupuestoConsultasTests(ConsultasTestMixin, TestCase):
+    FILAS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        cls.usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cls.cliente = Cliente.objects.create(user=cls.usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        for i in range(cls.FILAS):
+            usuario = User.objects.create_user(f'c{i}@test.com', f'c{i}@test.com', 'clave')
+            otro = Cliente.objects.create(user=usuario, nombre=f'Cliente{i}', apellido='Prueba', licencia=licencia)
+            vehiculo = Vehiculo.objects.create(marca='Marca', modelo=f'M{i}', placa=f'PLA{i:03}', costo_dia=Decimal('100'))
+            reserva = Reserva.objects.create(
+                vehiculo=vehiculo,
+                cliente=cls.cliente if i % 2 else otro,
+                fecha_inicio=date(2030, 1, 1),
+                fecha_fin=date(2030, 1, 3),
+                total=Decimal('300'),
+                estado='confirmada',
+            )
+            reserva.crear_factura_automatica()
+            Devolucion.objects.create(reserva=reserva, fecha_devolucion=date(2030, 1, 3), estado_devolucion='entregado')
+        cls.reserva = Reserva.objects.filter(cliente=cls.cliente).first()
+
+    def test_vistas_admin(self):
+        self.client.force_login(self.admin)
+        rutas = [
+            reverse(nombre) for nombre in (
+                'panel_admin', 'cliente_list', 'vehiculo_list', 'reserva_list', 'factura_list',
+                'devolucion_list', 'categoria_licencia_list', 'subcategoria_licencia_list',
+            )
+        ] + [
+            reverse('cliente_detail', args=[self.cliente.pk]),
+            reverse('vehiculo_detail', args=[self.reserva.vehiculo_id]),
+            reverse('reserva_detail', args=[self.reserva.pk]),
+            reverse('factura_detail', args=[self.reserva.factura.pk]),
+            reverse('devolucion_detail', args=[self.reserva.devolucion.pk]),
+            reverse('subcategoria_licencia_detail', args=[self.cliente.licencia_id]),
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                self.assertPresupuestoConsultas(self.client, ruta)
+
+    def test_listas_con_filtros(self):
+        self.client.force_login(self.admin)
+        self.assertPresupuestoConsultas(self.client, reverse('reserva_list'), data={'cliente_nombre': 'Cliente', 'estado': 'confirmada'})
+        self.assertPresupuestoConsultas(self.client, reverse('cliente_list'), data={'nombre': 'Cliente', 'email': 'test'})
+        respuesta = self.assertPresupuestoConsultas(self.client, reverse('factura_list'))
+        # La segunda página cuesta lo mismo que la primera
+        siguiente = respuesta.context['page_obj'].url_siguiente
+        self.assertPresupuestoConsultas(self.client, reverse('factura_list') + siguiente)
+
+    def test_vistas_cliente(self):
+        self.client.force_login(self.usuario)
+        rutas = [
+            reverse(nombre) for nombre in (
+                'panel_cliente', 'cliente_vehiculos', 'cliente_nueva_reserva', 'cliente_mis_reservas',
+                'cliente_mis_facturas', 'cliente_mis_devoluciones', 'cliente_mi_perfil',
+            )
+        ] + [
+            reverse('cliente_reserva_detail', args=[self.reserva.pk]),
+            reverse('cliente_factura_detail', args=[self.reserva.factura.pk]),
+            reverse('cliente_devolucion_detail', args=[self.reserva.devolucion.pk]),
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                self.assertPresupuestoConsultas(self.client, ruta)
+
+    def test_formularios_de_factura_y_devolucion(self):
+        # Cada opción de reserva muestra su cliente
+        self.client.force_login(self.admin)
+        rutas = [
+            reverse('factura_create'), reverse('factura_update', args=[self.reserva.factura.pk]),
+            reverse('devolucion_create'), reverse('devolucion_update', args=[self.reserva.devolucion.pk]),
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                with consultas.registrar() as registro:
+                    respuesta = self.client.get(ruta)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(consultas.problemas(registro, None), [])
+
+    def test_catalogo_y_cotizacion_json_con_etag(self):
+        self.client.force_login(self.usuario)
+        url = reverse('cliente_catalogo_json')
+        respuesta = self.assertPresupuestoConsultas(self.client, url)
+        etag = respuesta['ETag']
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        self.assertEqual(
+            set(respuesta.json()['vehiculos'][0]), {'id', 'etiqueta', 'costo_dia'}
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        cotizacion = reverse('cliente_cotizacion_json')
+        parametros = {'vehiculo': self.reserva.vehiculo_id, 'fecha_inicio': '2030-02-01', 'fecha_fin': '2030-02-03'}
+        respuesta = self.client.get(cotizacion, parametros)
+        self.assertEqual((respuesta.json()['dias'], respuesta.json()['total']), (3, '300.00'))
+        self.assertEqual(self.client.get(cotizacion, dict(parametros, fecha_fin='2030-01-01')).status_code, 400)
+
+        # Un cambio de precio invalida el ETag
+        Vehiculo.objects.get(pk=self.reserva.vehiculo_id).save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detalle_condicional(self):
+        self.client.force_login(self.usuario)
+        url = reverse('cliente_reserva_detail', args=[self.reserva.pk])
+        etag = self.assertPresupuestoConsultas(self.client, url)['ETag']
+        with consultas.registrar() as registro:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        # Sesión, usuario, cliente y el agregado de versión; sin la consulta principal
+        self.assertEqual(len(registro), 4)
+
+        # Cambia la factura de la reserva: la página ya no es la misma
+        factura = self.reserva.factura
+        factura.monto += 1
+        factura.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('cliente_reserva_detail', args=[0])).status_code, 404)
+
+    def test_detecta_n_mas_1(self):
+        with consultas.registrar() as registro:
+            for reserva in Reserva.objects.all():
+                reserva.vehiculo.placa
+        repetidas = registro.repetidas()
+        self.assertEqual(len(repetidas), 1)
+        self.assertEqual(repetidas[0][1], self.FILAS)
+        self.assertTrue(consultas.problemas(registro, None)[0].startswith(f'posible N+1 ({self.FILAS} veces)'))
+
+    @override_settings(VIGILAR_CONSULTAS=True, CONSULTAS_ESTRICTO=True)
+    def test_estricto_lanza_al_exceder_el_presupuesto(self):
+        def vista(request):
+            list(Vehiculo.objects.all()[:1])
+            list(Cliente.objects.all()[:1])
+            return HttpResponse()
+
+        middleware = PresupuestoConsultasMiddleware(vista)
+        for presupuesto, excede in ((2, False), (1, True)):
+            vista.presupuesto_consultas = presupuesto
+            peticion = RequestFactory().get('/vista/')
+            middleware.process_view(peticion, vista, (), {})
+            if excede:
+                with self.assertRaisesMessage(consultas.PresupuestoExcedido, 'GET /vista/: 2 consultas, presupuesto 1'):
+                    middleware(peticion)
+            else:
+                self.assertEqual(middleware(peticion)['X-Consultas'], '2')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TransicionesReservaTests(TestCase):
+    # Sentencias por transición, incluidas las de las señales (ocupación,
+    # su conteo diario e indicadores) y los savepoints. Eliminar borra en
+    # cascada la factura y la devolución, cada una con sus propias señales.
+    SENTENCIAS = {'crear': 12, 'confirmar': 15, 'cancelar': 14, 'devolver': 12, 'eliminar': 27}
+
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cls.cliente = Cliente.objects.create(user=cls.usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        cls.vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa='PLA001', costo_dia=Decimal('100'))
+        # Deja creadas las filas de indicadores que tocan las transiciones
+        reserva = reservas.crear(cls._nueva(cls.vehiculo, 'confirmada', date(2030, 1, 20)))
+        reservas.devolver(Devolucion(reserva=reserva, fecha_devolucion=date(2030, 1, 22), estado_devolucion='entregado'))
+        reservas.crear(cls._nueva(cls.vehiculo, 'pendiente', date(2030, 1, 25)))
+        reservas.cancelar(reservas.crear(cls._nueva(cls.vehiculo, 'pendiente', date(2030, 1, 28))).pk)
+
+    @classmethod
+    def _nueva(cls, vehiculo, estado='pendiente', inicio=date(2030, 1, 1)):
+        return Reserva(
+            vehiculo=vehiculo, cliente=cls.cliente, fecha_inicio=inicio,
+            fecha_fin=inicio.replace(day=inicio.day + 2), total=0, estado=estado,
+        )
+
+    def assertSentencias(self, transicion, funcion, *args):
+        with consultas.registrar() as registro:
+            resultado = funcion(*args)
+        self.assertLessEqual(len(registro), self.SENTENCIAS[transicion], '\n'.join(registro.consultas))
+        return resultado
+
+    def test_ciclo_completo(self):
+        reserva = self.assertSentencias('crear', reservas.crear, self._nueva(self.vehiculo))
+        self.assertEqual(reserva.total, Decimal('300'))
+        self.vehiculo.refresh_from_db()
+        self.assertFalse(self.vehiculo.disponible)
+
+        self.assertSentencias('confirmar', reservas.confirmar, reserva.pk)
+        factura = Factura.objects.get(reserva=reserva)
+        self.assertEqual(factura.monto, Decimal('300'))
+
+        devolucion = Devolucion(reserva=reserva, fecha_devolucion=date(2030, 1, 3), estado_devolucion='danado')
+        self.assertSentencias('devolver', reservas.devolver, devolucion)
+        factura.refresh_from_db()
+        self.assertEqual(factura.monto, Decimal('360'))
+        # Todavía tiene la reserva pendiente del 25 de enero
+        self.vehiculo.refresh_from_db()
+        self.assertFalse(self.vehiculo.disponible)
+
+        pendiente = Reserva.objects.get(estado='pendiente', fecha_inicio=date(2030, 1, 25))
+        self.assertSentencias('cancelar', reservas.cancelar, pendiente.pk)
+        self.vehiculo.refresh_from_db()
+        self.assertTrue(self.vehiculo.disponible)
+
+        self.assertSentencias('eliminar', reservas.eliminar, reserva.pk)
+        self.assertFalse(Factura.objects.filter(pk=factura.pk).exists())
+        self.assertEqual(ocupacion.verificar(), [])
+        self.assertEqual(ocupacion.verificar_conteo(), [])
+        self.assertEqual(indicadores.reconciliar(), 0)
+
+    def test_guardar_sin_lo_leido_aplica_la_diferencia(self):
+        reserva = reservas.crear(self._nueva(self.vehiculo, 'confirmada', date(2030, 2, 1)))
+        devolucion = Devolucion.objects.get()
+        with mock.patch.object(indicadores, 'reconciliar') as reconciliar:
+            # Armada con pk explícito, sin pasar por from_db
+            Reserva(
+                pk=reserva.pk, vehiculo=self.vehiculo, cliente=self.cliente, fecha_inicio=date(2030, 2, 5),
+                fecha_fin=date(2030, 2, 6), total=0, estado='pendiente',
+            ).save()
+            # Leída con campos diferidos: una sola consulta para lo anterior
+            diferida = Reserva.objects.only('estado').get(pk=reserva.pk)
+            diferida.estado = 'confirmada'
+            with self.assertNumQueries(1):
+                signals.leer_reserva_anterior(Reserva, diferida, 'default')
+            diferida.save()
+
+            factura = Factura.objects.defer('monto').get(reserva=reserva)
+            factura.fecha_emision = date(2030, 3, 1)
+            factura.save()
+            Devolucion(
+                pk=devolucion.pk, reserva=reserva, fecha_devolucion=date(2030, 2, 6), estado_devolucion='entregado',
+            ).save()
+        reconciliar.assert_not_called()
+        self.assertEqual(ocupacion.verificar(), [])
+        self.assertEqual(ocupacion.verificar_conteo(), [])
+        self.assertEqual(indicadores.reconciliar(), 0)
+
+    def test_resumen_del_panel_cliente(self):
+        hoy = date(2030, 1, 24)
+        resumen = resumen_cliente.obtener(self.cliente.pk, hoy)
+        self.assertEqual((resumen['activas'], resumen['proximas_devoluciones']), (1, 0))
+        with consultas.registrar() as registro:
+            resumen_cliente.obtener(self.cliente.pk, hoy)
+        self.assertEqual(len(registro), 0)
+
+        pendiente = Reserva.objects.get(estado='pendiente')
+        reservas.confirmar(pendiente.pk)
+        resumen = resumen_cliente.obtener(self.cliente.pk, hoy)
+        self.assertEqual((resumen['facturas_pendientes'], resumen['proximas_devoluciones']), (1, 1))
+        self.assertEqual(resumen['monto_pendiente'], pendiente.total)
+        self.assertEqual(resumen['proxima_devolucion'], pendiente.fecha_fin)
+
+        reservas.devolver(Devolucion(reserva=pendiente, fecha_devolucion=pendiente.fecha_fin, estado_devolucion='entregado'))
+        self.assertEqual(resumen_cliente.obtener(self.cliente.pk, hoy), resumen_cliente.calcular(self.cliente.pk, hoy))
+        self.assertEqual(resumen_cliente.obtener(self.cliente.pk, hoy)['activas'], 0)
+
+    def test_transiciones_invalidas(self):
+        with self.assertRaises(reservas.TransicionInvalida):
+            reservas.crear(self._nueva(self.vehiculo, inicio=date(2030, 1, 26)))
+        cancelada = Reserva.objects.get(estado='cancelada')
+        with self.assertRaises(reservas.TransicionInvalida):
+            reservas.confirmar(cancelada.pk)
+        with self.assertRaises(reservas.TransicionInvalida):
+            reservas.devolver(Devolucion(reserva=cancelada, fecha_devolucion=date(2030, 1, 30), estado_devolucion='entregado'))
+        devuelta = Reserva.objects.get(devolucion__isnull=False)
+        with self.assertRaises(reservas.TransicionInvalida):
+            reservas.devolver(Devolucion(reserva=devuelta, fecha_devolucion=date(2030, 1, 30), estado_devolucion='entregado'))
+        self.assertEqual(Reserva.objects.count(), 3)
+
+    def test_cliente_cancela_su_reserva(self):
+        pendiente = Reserva.objects.get(estado='pendiente')
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(reverse('cliente_reserva_cancelar', args=[pendiente.pk]))
+        self.assertRedirects(respuesta, reverse('cliente_mis_reservas'), fetch_redirect_response=False)
+        pendiente.refresh_from_db()
+        self.assertEqual(pendiente.estado, 'cancelada')
+
+
+def _licencia():
+    """Subcategoría B1; los TransactionTestCase vacían lo que crean las migraciones"""
+    categoria, _ = CategoriaLicencia.objects.get_or_create(codigo='B', defaults={'descripcion': 'Automóviles'})
+    return SubcategoriaLicencia.objects.get_or_create(
+        codigo='B1', defaults={'descripcion': 'Automóviles particulares', 'categoria': categoria},
+    )[0]
+
+
+class ArbolIntervalosTests(TestCase):
+    def test_insertar_eliminar_y_solapa(self):
+        arbol = disponibilidad.ArbolIntervalos()
+        arbol.insertar(1, date(2030, 1, 10), date(2030, 1, 12))
+        arbol.insertar(2, date(2030, 1, 20), date(2030, 1, 25))
+        self.assertEqual(len(arbol), 2)
+        # Intervalos cerrados: compartir un día es solaparse
+        self.assertTrue(arbol.solapa(date(2030, 1, 12), date(2030, 1, 14)))
+        self.assertFalse(arbol.solapa(date(2030, 1, 13), date(2030, 1, 19)))
+        self.assertFalse(arbol.solapa(date(2030, 1, 10), date(2030, 1, 12), excluir=1))
+
+        # Reinsertar mueve el intervalo
+        arbol.insertar(1, date(2030, 1, 14), date(2030, 1, 15))
+        self.assertEqual(len(arbol), 2)
+        self.assertFalse(arbol.solapa(date(2030, 1, 10), date(2030, 1, 13)))
+        arbol.eliminar(2)
+        arbol.eliminar(99)
+        self.assertNotIn(2, arbol)
+        self.assertFalse(arbol.solapa(date(2030, 1, 16), date(2030, 2, 1)))
+
+    def test_coincide_con_la_busqueda_lineal(self):
+        azar = random.Random(7)
+        base = date(2030, 1, 1)
+        arbol, intervalos = disponibilidad.ArbolIntervalos(), {}
+        for paso in range(400):
+            pk = azar.randrange(60)
+            if azar.random() < 0.3:
+                arbol.eliminar(pk)
+                intervalos.pop(pk, None)
+            else:
+                inicio = base + timedelta(days=azar.randrange(300))
+                intervalos[pk] = (inicio, inicio + timedelta(days=azar.randrange(10)))
+                arbol.insertar(pk, *intervalos[pk])
+            inicio = base + timedelta(days=azar.randrange(300))
+            fin = inicio + timedelta(days=azar.randrange(15))
+            excluir = azar.choice([None, pk])
+            esperado = any(
+                i <= fin and f >= inicio and otro != excluir for otro, (i, f) in intervalos.items()
+            )
+            self.assertEqual(arbol.solapa(inicio, fin, excluir=excluir), esperado, paso)
+
+
+class DisponibilidadSincronizadaTests(TransactionTestCase):
+    """Árboles mantenidos por las señales, fuera de una transacción como en producción"""
+
+    def setUp(self):
+        # Los árboles solo se usan con un cache compartido entre procesos
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        cache_compartido = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio.name,
+        }})
+        cache_compartido.enable()
+        self.addCleanup(cache_compartido.disable)
+        disponibilidad.invalidar()
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        self.cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=_licencia())
+        self.vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa='ARB001', costo_dia=Decimal('100'))
+
+    def _conflicto(self, inicio, fin):
+        return disponibilidad.hay_conflicto(self.vehiculo.pk, inicio, fin)
+
+    def test_guardar_cancelar_y_eliminar(self):
+        self.assertTrue(disponibilidad.usa_arboles())
+        arbol = disponibilidad._arbol(self.vehiculo.pk)
+        reserva = Reserva.objects.create(
+            vehiculo=self.vehiculo, cliente=self.cliente, fecha_inicio=date(2030, 1, 10),
+            fecha_fin=date(2030, 1, 12), total=Decimal('300'), estado='pendiente',
+        )
+        # El árbol cargado se actualiza en el lugar, sin reconstruirse
+        self.assertIs(disponibilidad._arbol(self.vehiculo.pk), arbol)
+        self.assertIn(reserva.pk, arbol)
+        self.assertTrue(self._conflicto(date(2030, 1, 12), date(2030, 1, 14)))
+
+        reserva.fecha_inicio, reserva.fecha_fin = date(2030, 2, 1), date(2030, 2, 3)
+        reserva.save()
+        self.assertIs(disponibilidad._arbol(self.vehiculo.pk), arbol)
+        self.assertFalse(self._conflicto(date(2030, 1, 12), date(2030, 1, 14)))
+        self.assertTrue(self._conflicto(date(2030, 2, 3), date(2030, 2, 5)))
+
+        # El servicio escribe en una transacción: el árbol se rehace al confirmar
+        reservas.cancelar(reserva.pk)
+        self.assertFalse(self._conflicto(date(2030, 2, 1), date(2030, 2, 3)))
+
+        otra = reservas.crear(Reserva(
+            vehiculo=self.vehiculo, cliente=self.cliente, fecha_inicio=date(2030, 3, 1),
+            fecha_fin=date(2030, 3, 2), total=0, estado='pendiente',
+        ))
+        self.assertTrue(self._conflicto(date(2030, 3, 2), date(2030, 3, 2)))
+        reservas.eliminar(otra.pk)
+        self.assertFalse(self._conflicto(date(2030, 3, 2), date(2030, 3, 2)))
+        self.assertNotIn(otra.pk, disponibilidad._arbol(self.vehiculo.pk))
+
+    def test_cache_local_consulta_la_tabla(self):
+        Reserva.objects.create(
+            vehiculo=self.vehiculo, cliente=self.cliente, fecha_inicio=date(2030, 1, 10),
+            fecha_fin=date(2030, 1, 12), total=Decimal('300'), estado='pendiente',
+        )
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(disponibilidad.usa_arboles())
+            with consultas.registrar() as registro:
+                self.assertTrue(self._conflicto(date(2030, 1, 11), date(2030, 1, 11)))
+                self.assertFalse(self._conflicto(date(2030, 1, 13), date(2030, 1, 20)))
+            self.assertEqual(len(registro), 2)
+
+
+class CatalogoPorFechasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        cls.vehiculos = {}
+        for placa, estado, inicio, fin in (
+            ('PEN001', 'pendiente', date(2030, 1, 10), date(2030, 1, 12)),
+            ('CON001', 'confirmada', date(2030, 1, 13), date(2030, 1, 15)),
+            ('CAN001', 'cancelada', date(2030, 1, 10), date(2030, 1, 15)),
+            ('LIB001', None, None, None),
+        ):
+            vehiculo = cls.vehiculos[placa] = Vehiculo.objects.create(
+                marca='Marca', modelo='M', placa=placa, costo_dia=Decimal('100'),
+            )
+            if estado:
+                Reserva.objects.create(
+                    vehiculo=vehiculo, cliente=cliente, fecha_inicio=inicio, fecha_fin=fin, total=0, estado=estado,
+                )
+
+    def _libres(self, inicio, fin, **kwargs):
+        queryset = disponibilidad.vehiculos_libres(Vehiculo.objects.all(), inicio, fin, **kwargs)
+        return set(queryset.values_list('placa', flat=True))
+
+    def test_vehiculos_libres_en_los_bordes(self):
+        todos = set(self.vehiculos)
+        # Los días de inicio y fin de una reserva están ocupados
+        self.assertEqual(self._libres(date(2030, 1, 8), date(2030, 1, 10)), todos - {'PEN001'})
+        self.assertEqual(self._libres(date(2030, 1, 12), date(2030, 1, 12)), todos - {'PEN001'})
+        self.assertEqual(self._libres(date(2030, 1, 12), date(2030, 1, 13)), todos - {'PEN001', 'CON001'})
+        self.assertEqual(self._libres(date(2030, 1, 16), date(2030, 1, 20)), todos)
+        # Abarcar la reserva entera también es cruzarse
+        self.assertEqual(self._libres(date(2030, 1, 1), date(2030, 1, 31)), {'CAN001', 'LIB001'})
+        # Al editar una reserva no se cuenta a sí misma
+        reserva = Reserva.objects.get(vehiculo=self.vehiculos['PEN001'])
+        self.assertIn('PEN001', self._libres(date(2030, 1, 11), date(2030, 1, 11), excluir=reserva.pk))
+
+    def test_filtro_por_fechas_de_la_lista(self):
+        self.client.force_login(self.admin)
+        url = reverse('vehiculo_list')
+        respuesta = self.client.get(url, {'fecha_inicio': '2030-01-12', 'fecha_fin': '2030-01-13'})
+        placas = {vehiculo.placa for vehiculo in respuesta.context['object_list']}
+        self.assertEqual(placas, {'CAN001', 'LIB001'})
+
+        # Un rango invertido no filtra
+        respuesta = self.client.get(url, {'fecha_inicio': '2030-01-13', 'fecha_fin': '2030-01-12'})
+        self.assertEqual(len(respuesta.context['object_list']), 4)
+
+
+class VehiculosPorPrecio(KeysetPaginationMixin, ListView):
+    model = Vehiculo
+    paginate_by = 2
+    orden_paginacion = ('-costo_dia', 'pk')
+
+
+class PaginacionCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Precios repetidos: el pk desempata
+        for i, precio in enumerate((300, 100, 200, 300, 200)):
+            Vehiculo.objects.create(marca='Marca', modelo='M', placa=f'PAG{i:03}', costo_dia=Decimal(precio))
+        cls.orden = list(Vehiculo.objects.order_by('-costo_dia', 'pk').values_list('pk', flat=True))
+
+    def _pagina(self, consulta=''):
+        respuesta = VehiculosPorPrecio.as_view()(RequestFactory().get('/vehiculos/' + consulta))
+        pagina = respuesta.context_data['page_obj']
+        return [vehiculo.pk for vehiculo in pagina], pagina
+
+    def test_recorre_hacia_adelante_y_atras(self):
+        paginas, consulta = [], ''
+        while True:
+            filas, pagina = self._pagina(consulta)
+            paginas.append((filas, pagina))
+            if not pagina.has_next:
+                break
+            consulta = pagina.url_siguiente
+        self.assertEqual([pk for filas, _pagina in paginas for pk in filas], self.orden)
+        self.assertEqual([len(filas) for filas, _pagina in paginas], [2, 2, 1])
+        self.assertFalse(paginas[0][1].has_previous)
+
+        # Volver desde la última página reproduce las anteriores
+        filas, pagina = self._pagina(paginas[2][1].url_anterior)
+        self.assertEqual(filas, paginas[1][0])
+        self.assertTrue(pagina.has_next)
+        filas, pagina = self._pagina(pagina.url_anterior)
+        self.assertEqual(filas, paginas[0][0])
+        self.assertFalse(pagina.has_previous)
+
+    def test_conserva_los_filtros_en_los_enlaces(self):
+        _filas, pagina = self._pagina('?marca=Marca')
+        self.assertIn('marca=Marca', pagina.url_siguiente)
+        self.assertIn('despues=', pagina.url_siguiente)
+
+    def test_cursor_manipulado_vuelve_a_la_primera_pagina(self):
+        primera = self._pagina()[0]
+        otro_largo = urlsafe_b64encode(json.dumps([1]).encode()).decode()
+        no_json = urlsafe_b64encode(b'no es json').decode()
+        tipo_invalido = urlsafe_b64encode(json.dumps(['caro', 1]).encode()).decode()
+        for cursor in ('%%%', otro_largo, no_json, tipo_invalido):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self._pagina(f'?despues={cursor}')[0], primera)
+                self.assertEqual(self._pagina(f'?antes={cursor}')[0], primera)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Tablas FTS5 de SQLite')
+class BusquedaTextoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        for i, (marca, modelo) in enumerate((('Toyota', 'Corolla'), ('Toyotomi', 'Hilux'), ('Mitoyo', 'Aygo'), ('Mazda', '3'), ('Toyo', 'Yaris'))):
+            Vehiculo.objects.create(marca=marca, modelo=modelo, placa=f'BUS{i:03}', costo_dia=Decimal('100'))
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        Reserva.objects.create(
+            vehiculo=Vehiculo.objects.get(marca='Mazda'), cliente=cliente, fecha_inicio=date(2030, 1, 1),
+            fecha_fin=date(2030, 1, 2), total=0, estado='pendiente',
+        )
+
+    def _marcas(self, queryset, *criterios):
+        filtrado = busqueda.buscar(queryset, list(criterios))
+        return list(filtrado.order_by('-' + busqueda.CAMPO_RELEVANCIA, 'pk').values_list('marca', flat=True))
+
+    def test_usa_fts5_y_ordena_por_relevancia(self):
+        self.assertTrue(busqueda._fts_disponible('default'))
+        with consultas.registrar() as registro:
+            marcas = self._marcas(Vehiculo.objects.all(), ('toyo', ('marca',)))
+        self.assertIn('core_vehiculo_fts', registro.consultas[0])
+        # Exacta > prefijo > subcadena, sin distinguir mayúsculas
+        self.assertEqual(marcas, ['Toyo', 'Toyota', 'Toyotomi', 'Mitoyo'])
+        self.assertEqual(self._marcas(Vehiculo.objects.all(), ('TOYOT', ('marca',))), ['Toyota', 'Toyotomi'])
+
+    def test_varios_criterios_y_textos_cortos(self):
+        # Cada criterio tiene que cumplirse en alguno de sus campos
+        criterio = ('toyo', ('marca',)), ('hil', ('modelo',))
+        self.assertEqual(self._marcas(Vehiculo.objects.all(), *criterio), ['Toyotomi'])
+        # Con menos de tres letras el trigrama no sirve y se usa icontains
+        self.assertEqual(self._marcas(Vehiculo.objects.all(), ('ma', ('marca',))), ['Mazda'])
+        todos = Vehiculo.objects.all()
+        self.assertIs(busqueda.buscar(todos, [('  ', ('marca',))]), todos)
+
+    def test_sigue_los_cambios_y_las_relaciones(self):
+        Vehiculo.objects.filter(marca='Mitoyo').update(marca='Kia')
+        self.assertEqual(self._marcas(Vehiculo.objects.all(), ('toyo', ('marca',))), ['Toyo', 'Toyota', 'Toyotomi'])
+        Vehiculo.objects.filter(marca='Toyotomi').delete()
+        self.assertEqual(self._marcas(Vehiculo.objects.all(), ('toyo', ('marca',))), ['Toyo', 'Toyota'])
+        reservas_mazda = busqueda.buscar(Reserva.objects.all(), [('mazd', ('vehiculo__marca',))])
+        self.assertEqual(reservas_mazda.count(), 1)
+
+
+def _rango(inicio, fin):
+    return {inicio + timedelta(days=i) for i in range((fin - inicio).days + 1)}
+
+
+class OcupacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cls.cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        cls.vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa='OCU001', costo_dia=Decimal('100'))
+
+    def _reserva(self, inicio, fin, estado='pendiente'):
+        return Reserva.objects.create(
+            vehiculo=self.vehiculo, cliente=self.cliente, fecha_inicio=inicio, fecha_fin=fin, total=0, estado=estado,
+        )
+
+    def _dias(self):
+        """Días marcados en los mapas de bits del vehículo"""
+        dias = set()
+        for anio, valor in OcupacionVehiculo.objects.filter(vehiculo=self.vehiculo).values_list('anio', 'dias'):
+            bits = int.from_bytes(bytes(valor), 'little')
+            dias |= {date(anio, 1, 1) + timedelta(days=i) for i in range(bits.bit_length()) if bits >> i & 1}
+        return dias
+
+    def test_alta_cambio_de_estado_y_borrado(self):
+        reserva = self._reserva(date(2030, 3, 1), date(2030, 3, 3))
+        self.assertEqual(self._dias(), _rango(date(2030, 3, 1), date(2030, 3, 3)))
+
+        # Pendiente y confirmada ocupan lo mismo; cancelada no ocupa
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.estado = 'confirmada'
+        reserva.save()
+        self.assertEqual(self._dias(), _rango(date(2030, 3, 1), date(2030, 3, 3)))
+        reserva.estado = 'cancelada'
+        reserva.save()
+        self.assertEqual(self._dias(), set())
+        reserva.estado = 'pendiente'
+        reserva.save()
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2030, 3, 2)), 1)
+
+        reserva.delete()
+        self.assertEqual(self._dias(), set())
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2030, 3, 2)), 0)
+        self.assertEqual(ocupacion.verificar(), [])
+
+    def test_cambio_de_fechas_y_solapamientos(self):
+        reserva = self._reserva(date(2030, 5, 1), date(2030, 5, 5))
+        otra = self._reserva(date(2030, 5, 4), date(2030, 5, 8))
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.fecha_inicio, reserva.fecha_fin = date(2030, 6, 1), date(2030, 6, 2)
+        reserva.save()
+        # Los días compartidos siguen ocupados por la otra reserva
+        self.assertEqual(self._dias(), _rango(date(2030, 5, 4), date(2030, 5, 8)) | _rango(date(2030, 6, 1), date(2030, 6, 2)))
+        otra.delete()
+        self.assertEqual(self._dias(), _rango(date(2030, 6, 1), date(2030, 6, 2)))
+        self.assertEqual(ocupacion.verificar(), [])
+
+    def test_cruce_de_anio(self):
+        reserva = self._reserva(date(2030, 12, 30), date(2031, 1, 2))
+        self.assertEqual(
+            set(OcupacionVehiculo.objects.filter(vehiculo=self.vehiculo).values_list('anio', flat=True)), {2030, 2031},
+        )
+        self.assertEqual(self._dias(), _rango(date(2030, 12, 30), date(2031, 1, 2)))
+        # 2032 es bisiesto: el 31 de diciembre es el bit 365
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.fecha_inicio, reserva.fecha_fin = date(2032, 12, 31), date(2033, 1, 1)
+        reserva.save()
+        self.assertEqual(self._dias(), {date(2032, 12, 31), date(2033, 1, 1)})
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2032, 12, 31)), 1)
+        self.assertEqual(ocupacion.verificar(), [])
+
+    def test_conteo_diario_de_vehiculos_ocupados(self):
+        otro = Vehiculo.objects.create(marca='Marca', modelo='M', placa='OCU002', costo_dia=Decimal('100'))
+        self._reserva(date(2030, 12, 30), date(2031, 1, 2))
+        # Solapada con la anterior en el mismo vehículo: no cuenta dos veces
+        solapada = self._reserva(date(2030, 12, 31), date(2031, 1, 1), estado='confirmada')
+        Reserva.objects.create(
+            vehiculo=otro, cliente=self.cliente, fecha_inicio=date(2031, 1, 1), fecha_fin=date(2031, 1, 5), total=0,
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(ocupacion.vehiculos_ocupados(date(2031, 1, 1)), 2)
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2030, 12, 31)), 1)
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2031, 1, 5)), 1)
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2031, 1, 6)), 0)
+
+        solapada.delete()
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2030, 12, 31)), 1)
+        self.assertEqual(ocupacion.verificar_conteo(), [])
+
+        # Reconstruir un solo vehículo ajusta solo su parte del conteo
+        ocupacion.reconstruir([otro.pk])
+        self.assertEqual(ocupacion.vehiculos_ocupados(date(2031, 1, 1)), 2)
+        # Uno perdido se recupera con la reconstrucción completa
+        ResumenOcupacionDiaria.objects.filter(fecha=date(2031, 1, 1)).delete()
+        self.assertEqual(ocupacion.verificar_conteo(), [(date(2031, 1, 1), 0, 2)])
+        ocupacion.reconstruir()
+        self.assertEqual(ocupacion.verificar_conteo(), [])
+
+    def _ocupados_segun_reservas(self, inicio, fin):
+        """Días del rango con alguna reserva activa, contados desde la tabla de reservas"""
+        dias = set()
+        for desde, hasta in Reserva.objects.filter(
+            vehiculo=self.vehiculo, estado__in=disponibilidad.ESTADOS_ACTIVOS, fecha_inicio__lte=fin, fecha_fin__gte=inicio,
+        ).values_list('fecha_inicio', 'fecha_fin'):
+            dias |= _rango(max(desde, inicio), min(hasta, fin))
+        return len(dias)
+
+    def test_consultas_de_rango(self):
+        self._reserva(date(2030, 12, 28), date(2031, 1, 3))
+        self._reserva(date(2031, 1, 2), date(2031, 1, 5), estado='confirmada')
+        self._reserva(date(2030, 12, 1), date(2030, 12, 10), estado='cancelada')
+        rangos = {
+            'libre': (date(2030, 12, 1), date(2030, 12, 27)),
+            'en parte': (date(2030, 12, 20), date(2030, 12, 29)),
+            'completo': (date(2030, 12, 29), date(2031, 1, 4)),
+            'cruce de año en parte': (date(2030, 12, 31), date(2031, 1, 10)),
+        }
+        for nombre, (inicio, fin) in rangos.items():
+            ocupados = self._ocupados_segun_reservas(inicio, fin)
+            self.assertEqual(ocupacion.dias_ocupados(self.vehiculo.pk, inicio, fin), ocupados, nombre)
+            self.assertEqual(ocupacion.esta_libre(self.vehiculo.pk, inicio, fin), ocupados == 0, nombre)
+        self.assertEqual(ocupacion.dias_ocupados(self.vehiculo.pk, *rangos['completo']), 7)
+        self.assertEqual(ocupacion.dias_ocupados(self.vehiculo.pk, *rangos['en parte']), 2)
+
+    def test_proxima_fecha_libre(self):
+        self._reserva(date(2030, 12, 20), date(2030, 12, 31))
+        self._reserva(date(2031, 1, 1), date(2031, 1, 3), estado='confirmada')
+        self.assertEqual(ocupacion.proxima_fecha_libre(self.vehiculo.pk, date(2030, 12, 10)), date(2030, 12, 10))
+        # Ocupado hasta el 31 de diciembre y los primeros días del año siguiente
+        self.assertEqual(ocupacion.proxima_fecha_libre(self.vehiculo.pk, date(2030, 12, 20)), date(2031, 1, 4))
+        self.assertEqual(ocupacion.proxima_fecha_libre(self.vehiculo.pk, date(2031, 1, 2)), date(2031, 1, 4))
+        # Año bisiesto completo más el siguiente: 2032-12-31 es el bit 365
+        self._reserva(date(2032, 1, 1), date(2033, 12, 31))
+        self.assertEqual(ocupacion.proxima_fecha_libre(self.vehiculo.pk, date(2032, 6, 1)), date(2034, 1, 1))
+
+
+class ExportacionCSVTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        usuario = User.objects.create_user('@cliente@test.com', '@cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(
+            user=usuario, nombre='=HYPERLINK("http://x.test","ver")', apellido='-Ruiz', licencia=licencia,
+        )
+        vehiculo = Vehiculo.objects.create(marca='Mazda', modelo='+3', placa='CSV001', costo_dia=Decimal('100'))
+        cls.reserva = Reserva.objects.create(
+            vehiculo=vehiculo, cliente=cliente, fecha_inicio=date(2030, 1, 1), fecha_fin=date(2030, 1, 3),
+            total=Decimal('300'), estado='pendiente',
+        )
+
+    def test_encabezado_filas_y_formulas_neutralizadas(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('reserva_exportar'))
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(respuesta['Content-Disposition'], r'attachment; filename="reservas-\d{8}\.csv"')
+        texto = b''.join(respuesta.streaming_content).decode('utf-8')
+        self.assertTrue(texto.startswith('\ufeff'))
+        encabezado, *filas = csv.reader(StringIO(texto.removeprefix('\ufeff')))
+        self.assertEqual(encabezado[:5], ['Reserva', 'Estado', 'Inicio', 'Fin', 'Total'])
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0], [
+            str(self.reserva.pk), 'pendiente', '2030-01-01', '2030-01-03', '300.00',
+            '\'=HYPERLINK("http://x.test","ver")', "'-Ruiz", "'@cliente@test.com", 'CSV001', 'Mazda', "'+3", '',
+        ])
+
+    def test_respeta_los_filtros_de_la_lista(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('reserva_exportar'), {'estado': 'cancelada'})
+        texto = b''.join(respuesta.streaming_content).decode('utf-8')
+        self.assertEqual(len(list(csv.reader(StringIO(texto)))), 1)
+
+
+class ImportacionCSVTests(TestCase):
+    def test_vehiculos_crea_actualiza_e_informa_errores(self):
+        Vehiculo.objects.create(marca='Vieja', modelo='M', placa='IMP001', costo_dia=Decimal('50'))
+        archivo = StringIO(
+            'placa,marca,modelo,costo_dia,color,disponible\n'
+            'IMP001,Mazda,3,120.50,Rojo,no\n'
+            'IMP002,Kia,Rio,"99,9",,\n'
+            'IMP003,Kia,Rio,caro,,\n'
+            ',Kia,Rio,10,,\n'
+            'IMP004,Kia,Rio,10,,quizás\n'
+            'IMP005,Kia,Picanto,10.123,,\n'
+            'IMP006,Renault,Logan,80,,si\n'
+            'IMP006,Renault,Duster,85,,si\n'
+        )
+        # Lotes de 3 filas: las actualizaciones y los errores cruzan lotes
+        resultado = importacion.importar_vehiculos(archivo, tamano_lote=3)
+        self.assertEqual((resultado.filas, resultado.creados, resultado.actualizados), (8, 2, 1))
+        self.assertEqual([linea for linea, _mensaje in resultado.errores], [4, 5, 6, 7])
+        self.assertIn('costo_dia', resultado.errores[0][1])
+        self.assertIn('placa', resultado.errores[1][1])
+
+        actualizado = Vehiculo.objects.get(placa='IMP001')
+        self.assertEqual(
+            (actualizado.marca, actualizado.costo_dia, actualizado.color, actualizado.disponible),
+            ('Mazda', Decimal('120.50'), 'Rojo', False),
+        )
+        self.assertEqual(Vehiculo.objects.get(placa='IMP002').costo_dia, Decimal('99.9'))
+        self.assertTrue(Vehiculo.objects.get(placa='IMP002').disponible)
+        # La placa repetida queda con la última fila
+        self.assertEqual(Vehiculo.objects.get(placa='IMP006').modelo, 'Duster')
+
+    def test_clientes_crea_usuarios_y_actualiza(self):
+        usuario = User.objects.create_user('ana@test.com', 'ana@test.com', 'vieja')
+        Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=SubcategoriaLicencia.objects.get(codigo='A1'))
+        archivo = StringIO(
+            'email,nombre,apellido,licencia,telefono,password\n'
+            'ana@test.com,Ana María,Ruiz,b1,300,\n'
+            'beto@test.com,Beto,Paz,B2,,secreta\n'
+            'no-es-email,Carla,Rey,B1,,\n'
+            'dora@test.com,Dora,Gil,Z9,,\n'
+        )
+        resultado = importacion.importar_clientes(archivo)
+        self.assertEqual((resultado.filas, resultado.creados, resultado.actualizados), (4, 1, 1))
+        self.assertEqual([linea for linea, _mensaje in resultado.errores], [4, 5])
+        self.assertIn('Z9', resultado.errores[1][1])
+
+        ana = Cliente.objects.select_related('user', 'licencia').get(user__username='ana@test.com')
+        self.assertEqual((ana.nombre, ana.licencia.codigo, ana.telefono), ('Ana María', 'B1', '300'))
+        # Sin contraseña en la fila se conserva la anterior
+        self.assertTrue(ana.user.check_password('vieja'))
+        # La importada usa el hasher rebajado y pasa al preferido al iniciar sesión
+        beto = User.objects.get(username='beto@test.com')
+        self.assertTrue(beto.password.startswith('pbkdf2_importacion$20000$'))
+        self.assertTrue(beto.check_password('secreta'))
+        beto.refresh_from_db()
+        self.assertTrue(beto.password.startswith('pbkdf2_sha256$'))
+
+    def test_columnas_faltantes(self):
+        resultado = importacion.importar_vehiculos(StringIO('placa,marca\nIMP001,Kia\n'))
+        self.assertEqual(resultado.errores, [(1, 'Faltan columnas: costo_dia, modelo')])
+        self.assertFalse(Vehiculo.objects.exists())
+
+
+class NumeracionFacturasTests(TestCase):
+    def tearDown(self):
+        numeracion.descartar_bloques()
+
+    def test_numeros_consecutivos(self):
+        self.assertEqual(numeracion.siguiente(), 'FCT-00000001')
+        self.assertEqual(numeracion.reservar(3), ['FCT-00000002', 'FCT-00000003', 'FCT-00000004'])
+        self.assertEqual(numeracion.siguiente(), 'FCT-00000005')
+        # Una serie nueva se crea al primer uso
+        self.assertEqual(numeracion.reservar(2, serie='NC'), ['NC-00000001', 'NC-00000002'])
+
+    def test_reversion_no_deja_huecos(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            numeracion.siguiente()
+            raise RuntimeError
+        self.assertEqual(numeracion.siguiente(), 'FCT-00000001')
+
+    @override_settings(FACTURAS_BLOQUE=5)
+    def test_bloque_en_memoria(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(numeracion.siguiente(), 'FCT-00000001')
+        with consultas.registrar() as registro:
+            numeros = [numeracion.siguiente() for _ in range(4)]
+        self.assertEqual(numeros, [f'FCT-0000000{n}' for n in range(2, 6)])
+        self.assertEqual(len(registro), 0)
+        self.assertEqual(SerieFactura.objects.get(serie='FCT').ultimo, 5)
+
+
+class FacturaManualTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa='MAN001', costo_dia=Decimal('100'))
+        cls.reserva = Reserva.objects.create(
+            vehiculo=vehiculo, cliente=cliente, fecha_inicio=date(2030, 1, 1), fecha_fin=date(2030, 1, 3),
+            total=Decimal('300'), estado='confirmada',
+        )
+
+    def tearDown(self):
+        numeracion.descartar_bloques()
+
+    def _datos(self, numero=''):
+        return {'reserva': self.reserva.pk, 'numero': numero, 'monto': '300', 'fecha_emision': '2030-01-03'}
+
+    def test_numero_con_formato_de_serie_se_rechaza(self):
+        for numero in ('FCT-00000100', 'NC-00000001'):
+            forma = FacturaForm(self._datos(numero))
+            self.assertFalse(forma.is_valid(), numero)
+            self.assertIn('numero', forma.errors)
+        self.assertTrue(FacturaForm(self._datos('FCT-100')).is_valid())
+        self.assertTrue(FacturaForm(self._datos('A-2030-7')).is_valid())
+
+    def test_editar_conserva_el_numero_de_la_serie(self):
+        factura = self.reserva.crear_factura_automatica()
+        forma = FacturaForm({**self._datos(factura.numero), 'monto': '350'}, instance=factura)
+        self.assertTrue(forma.is_valid(), forma.errors)
+        forma = FacturaForm(self._datos('FCT-00000099'), instance=factura)
+        self.assertFalse(forma.is_valid())
+
+    def test_alta_toma_el_numero_de_la_serie(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.post(reverse('factura_create'), self._datos())
+        self.assertRedirects(respuesta, reverse('factura_list'))
+        self.assertEqual(Factura.objects.get().numero, 'FCT-00000001')
+
+    def test_alta_fallida_no_deja_hueco(self):
+        self.client.force_login(self.admin)
+        with mock.patch.object(Factura, 'save', side_effect=IntegrityError), self.assertRaises(IntegrityError):
+            self.client.post(reverse('factura_create'), self._datos())
+        self.assertEqual(numeracion.siguiente(), 'FCT-00000001')
+
+
+class FacturacionLotesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        for i in range(7):
+            vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa=f'PLA{i:03}', costo_dia=Decimal('100'))
+            Reserva.objects.create(
+                vehiculo=vehiculo, cliente=cliente, fecha_inicio=date(2030, 1, 1), fecha_fin=date(2030, 1, i + 1),
+                total=Decimal('100') * (i + 1), estado='confirmada' if i == 6 else 'pendiente',
+            )
+
+    def test_factura_por_lotes_y_se_puede_repetir(self):
+        lotes = []
+        resultado = facturacion.facturar(tamano_lote=3, progreso=lambda r: lotes.append(r.facturas))
+        self.assertEqual((resultado.confirmadas, resultado.facturas), (6, 7))
+        self.assertEqual(lotes, [3, 6, 7])
+        self.assertFalse(Reserva.objects.filter(estado='pendiente').exists())
+        self.assertEqual(
+            sorted(Factura.objects.values_list('numero', flat=True)),
+            [f'FCT-0000000{n}' for n in range(1, 8)],
+        )
+        self.assertEqual(indicadores.reconciliar(), 0)
+
+        resultado = facturacion.facturar()
+        self.assertEqual((resultado.lotes, resultado.facturas), (0, 0))
+
+
+class AtrasosTests(TestCase):
+    HOY = date(2030, 2, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        caro = Vehiculo.objects.create(marca='Marca', modelo='A', placa='ATR001', costo_dia=Decimal('100'))
+        barato = Vehiculo.objects.create(marca='Marca', modelo='B', placa='ATR002', costo_dia=Decimal('57.05'))
+
+        def reserva(vehiculo, fin, estado='confirmada'):
+            return Reserva.objects.create(
+                vehiculo=vehiculo, cliente=cliente, fecha_inicio=fin - timedelta(days=2), fecha_fin=fin,
+                total=Decimal('300'), estado=estado,
+            )
+
+        cls.tres_dias = reserva(caro, cls.HOY - timedelta(days=3))
+        cls.dos_dias = reserva(barato, cls.HOY - timedelta(days=2))
+        cls.un_dia = reserva(caro, cls.HOY - timedelta(days=1))
+        # Ninguna de estas está atrasada
+        cls.vence_hoy = reserva(caro, cls.HOY)
+        reserva(barato, cls.HOY - timedelta(days=5), estado='pendiente')
+        reserva(barato, cls.HOY - timedelta(days=5), estado='cancelada')
+        devuelta = reserva(barato, cls.HOY - timedelta(days=4))
+        Devolucion.objects.create(reserva=devuelta, fecha_devolucion=cls.HOY, estado_devolucion='atrasado')
+
+    def _atrasos(self):
+        return {
+            atraso.reserva_id: (atraso.dias_atraso, atraso.penalizacion_proyectada)
+            for atraso in ReservaAtrasada.objects.all()
+        }
+
+    def test_dias_y_penalizacion(self):
+        lotes = []
+        resultado = atrasos.escanear(self.HOY, tamano_lote=2, progreso=lambda r: lotes.append(r.atrasadas))
+        self.assertEqual(lotes, [2, 3])
+        self.assertEqual((resultado.atrasadas, resultado.descartadas), (3, 0))
+        esperado = {
+            self.tres_dias.pk: (3, Decimal('150.00')),
+            self.dos_dias.pk: (2, Decimal('57.05')),
+            self.un_dia.pk: (1, Decimal('50.00')),
+        }
+        self.assertEqual(self._atrasos(), esperado)
+        self.assertEqual(resultado.penalizacion, Decimal('257.05'))
+        # La misma regla que la devolución
+        for reserva in (self.tres_dias, self.dos_dias, self.un_dia):
+            dias, penalizacion = esperado[reserva.pk]
+            self.assertEqual(Devolucion.penalizacion_atraso(dias, reserva.vehiculo.costo_dia), penalizacion)
+
+    def test_quita_las_devueltas_y_actualiza_los_dias(self):
+        atrasos.escanear(self.HOY)
+        Devolucion.objects.create(reserva=self.tres_dias, fecha_devolucion=self.HOY, estado_devolucion='atrasado')
+        Reserva.objects.filter(pk=self.un_dia.pk).update(estado='cancelada')
+
+        resultado = atrasos.escanear(self.HOY + timedelta(days=1))
+        self.assertEqual((resultado.atrasadas, resultado.descartadas), (2, 2))
+        self.assertEqual(self._atrasos(), {
+            self.dos_dias.pk: (3, Decimal('85.58')),
+            self.vence_hoy.pk: (1, Decimal('50.00')),
+        })
+
+
+class TarifasTests(TestCase):
+    def test_lote_igual_a_metodos_del_modelo(self):
+        costos = {1: Decimal('333.33'), 2: Decimal('100.01'), 3: Decimal('57.05')}
+        casos = [
+            (1, date(2030, 1, 1), date(2030, 1, 3), date(2030, 1, 6), 'atrasado'),
+            (2, date(2030, 1, 1), date(2030, 1, 1), date(2030, 1, 1), 'danado'),
+            (3, date(2030, 1, 1), date(2030, 1, 10), date(2030, 1, 13), 'atrasado'),
+            (3, date(2030, 2, 1), date(2030, 2, 2), date(2030, 2, 1), 'atrasado'),
+            (1, date(2030, 1, 1), date(2030, 1, 4), date(2030, 1, 9), 'entregado'),
+        ]
+        tabla = tarifas.TablaTarifas(costos)
+        vehiculo_ids, inicios, fines, devoluciones, estados = zip(*casos)
+        totales = tarifas.totales(tabla, vehiculo_ids, inicios, fines)
+        penalizaciones = tarifas.penalizaciones(tabla, vehiculo_ids, totales, fines, devoluciones, estados)
+
+        for (vehiculo_id, inicio, fin, devuelta, estado), total, penalizacion in zip(
+            casos, tarifas.a_decimales(totales), tarifas.a_decimales(penalizaciones)
+        ):
+            reserva = Reserva(vehiculo=Vehiculo(pk=vehiculo_id, costo_dia=costos[vehiculo_id]),
+                              fecha_inicio=inicio, fecha_fin=fin)
+            reserva.total = reserva.calcular_total()
+            devolucion = Devolucion(reserva=reserva, fecha_devolucion=devuelta, estado_devolucion=estado)
+            self.assertEqual(total, reserva.total)
+            self.assertEqual(penalizacion, devolucion.calcular_penalizacion())
+        # 3 días a 333.33 con 3 de atraso; 20% de 100.01 sin redondear
+        self.assertEqual(tarifas.a_decimales(penalizaciones)[:2], [Decimal('499.995'), Decimal('20.002')])
+
+    def test_vehiculo_sin_tarifa(self):
+        tabla = tarifas.TablaTarifas({1: Decimal('100')})
+        with self.assertRaises(KeyError):
+            tarifas.totales(tabla, [1, 2], [date(2030, 1, 1)] * 2, [date(2030, 1, 2)] * 2)
+
+
+class PlanesConsultasTests(TestCase):
+    def test_detecta_recorridos_secuenciales(self):
+        sqlite = (
+            '6 0 0 SCAN core_reserva\n'
+            '8 0 0 SEARCH core_factura USING INDEX sqlite_autoindex_core_factura_2 (reserva_id=?)\n'
+            '9 0 0 SCAN core_vehiculo USING INDEX vehiculo_catalogo_idx\n'
+            '11 9 0 SCAN core_cliente AS U0\n'
+            '12 0 0 SCAN CONSTANT ROW'
+        )
+        self.assertEqual(planes._recorridos_sqlite(sqlite), ['core_reserva', 'core_cliente'])
+        postgresql = [{'Plan': {'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'core_factura'},
+            {'Node Type': 'Seq Scan', 'Relation Name': 'core_reserva'},
+        ]}}]
+        self.assertEqual(planes._recorridos_postgresql(postgresql), ['core_reserva'])
+
+    def test_explica_todas_las_consultas(self):
+        self.assertEqual(set(planes.explicar()), set(planes.CONSULTAS))
+
+
+class FlotaSinteticaTests(TestCase):
+    def test_genera_flota_y_mide_todas_las_vistas(self):
+        call_command('seed_fleet', vehiculos=6, clientes=4, reservas=60, stdout=StringIO())
+        self.assertEqual(Reserva.objects.count(), 60)
+        self.assertEqual(Factura.objects.count(), Reserva.objects.filter(estado='confirmada').count())
+        self.assertEqual(ocupacion.verificar(), [])
+        self.assertEqual(indicadores.reconciliar(), 0)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'vistas.json')
+            call_command('bench_vistas', repeticiones=1, salida=salida, stdout=StringIO())
+            with open(salida, encoding='utf-8') as archivo:
+                resultado = json.load(archivo)
+        self.assertEqual(len(resultado['vistas']), len([patron for patron in urls.urlpatterns if patron.name]))
+        self.assertEqual({medicion['estado'] for medicion in resultado['vistas'].values()} - {200, 302}, set())
+
+
+class MetricasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        Vehiculo.objects.create(marca='Marca', modelo='M', placa='MET001', costo_dia=Decimal('100'))
+
+    def _tiempos(self, respuesta):
+        return {
+            parte.split(';')[0]: parte for parte in respuesta['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing_e_histogramas(self):
+        def consultas_registradas():
+            return REGISTRY.get_sample_value('alquiler_sql_consultas_sum', {'vista': 'vehiculo_list'}) or 0
+
+        self.client.force_login(self.admin)
+        antes = consultas_registradas()
+        with consultas.registrar() as registro:
+            respuesta = self.client.get(reverse('vehiculo_list'))
+        tiempos = self._tiempos(respuesta)
+        self.assertEqual(set(tiempos), {'sql', 'plantilla', 'app', 'total'})
+        self.assertIn(f'desc="{len(registro)} consultas"', tiempos['sql'])
+        self.assertEqual(consultas_registradas() - antes, len(registro))
+        self.assertIn('alquiler_peticion_segundos_count{vista="vehiculo_list"}', self.client.get('/metrics').content.decode())
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_metrics_con_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code, 200)
+
+    async def test_server_timing_bajo_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        respuesta = await self.async_client.get(reverse('vehiculo_list'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('desc="0 consultas"', self._tiempos(respuesta)['sql'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragmentos'}})
+class FragmentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        usuario = User.objects.create_user('cliente@test.com', 'cliente@test.com', 'clave')
+        cls.cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+        for i in range(3):
+            vehiculo = Vehiculo.objects.create(marca='Marca', modelo=f'M{i}', placa=f'FRA{i:03}', costo_dia=Decimal('100'))
+            Reserva.objects.create(
+                vehiculo=vehiculo, cliente=cls.cliente, fecha_inicio=date(2030, 1, 1 + i),
+                fecha_fin=date(2030, 1, 3 + i), total=Decimal('300'), estado='pendiente',
+            )
+
+    def _renderizadas(self, url, plantilla, **kwargs):
+        respuesta = self.client.get(url, kwargs)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, [t.name for t in respuesta.templates].count(plantilla)
+
+    def test_filas_de_reservas(self):
+        self.client.force_login(self.admin)
+        url = reverse('reserva_list')
+        self.assertEqual(self._renderizadas(url, 'reserva/fila.html')[1], 3)
+        self.assertEqual(self._renderizadas(url, 'reserva/fila.html')[1], 0)
+
+        # Solo se vuelve a renderizar la fila que cambió
+        reserva = Reserva.objects.first()
+        reserva.estado = 'confirmada'
+        reserva.save()
+        respuesta, renderizadas = self._renderizadas(url, 'reserva/fila.html')
+        self.assertEqual(renderizadas, 1)
+        self.assertContains(respuesta, 'Confirmada')
+
+        # El nombre del cliente también versiona la fila
+        Cliente.objects.filter(pk=self.cliente.pk).update(nombre='Beatriz')
+        respuesta, renderizadas = self._renderizadas(url, 'reserva/fila.html')
+        self.assertEqual(renderizadas, 3)
+        self.assertContains(respuesta, 'Beatriz Ruiz', count=3)
+
+    def test_tarjetas_del_cliente_por_fechas(self):
+        self.client.force_login(self.cliente.user)
+        url = reverse('cliente_vehiculos')
+        plantilla = 'cliente_panel/tarjeta_vehiculo.html'
+        self.assertEqual(self._renderizadas(url, plantilla)[1], 3)
+        self.assertEqual(self._renderizadas(url, plantilla)[1], 0)
+
+        # Las tarjetas de una búsqueda por fechas llevan las fechas en el enlace
+        respuesta, renderizadas = self._renderizadas(url, plantilla, fecha_inicio='2031-05-01', fecha_fin='2031-05-04')
+        self.assertEqual(renderizadas, 3)
+        self.assertContains(respuesta, 'fecha_inicio=2031-05-01&fecha_fin=2031-05-04', count=3)
+        respuesta, renderizadas = self._renderizadas(url, plantilla, fecha_inicio='2031-06-01', fecha_fin='2031-06-04')
+        self.assertEqual(renderizadas, 3)
+        self.assertNotContains(respuesta, '2031-05-01')
+
+
+def _rutas_async():
+    """URLconf con las versiones asíncronas del panel del cliente"""
+    modulo = ModuleType('rutas_async')
+    modulo.urlpatterns = [
+        path(str(patron.pattern), VERSIONES_ASYNC[patron.callback.view_class].as_view(), name=patron.name)
+        if getattr(patron.callback, 'view_class', None) in VERSIONES_ASYNC else patron
+        for patron in urls.urlpatterns
+    ]
+    return modulo
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PanelClienteAsyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        licencia = SubcategoriaLicencia.objects.get(codigo='B1')
+        cls.admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        for correo in ('ana@test.com', 'otro@test.com'):
+            usuario = User.objects.create_user(correo, correo, 'clave')
+            cliente = Cliente.objects.create(user=usuario, nombre='Ana', apellido='Ruiz', licencia=licencia)
+            vehiculo = Vehiculo.objects.create(marca='Marca', modelo='M', placa=correo[:6].upper(), costo_dia=Decimal('100'))
+            reserva = Reserva.objects.create(
+                vehiculo=vehiculo, cliente=cliente, fecha_inicio=date(2030, 1, 1),
+                fecha_fin=date(2030, 1, 3), total=Decimal('300'), estado='confirmada',
+            )
+            reserva.crear_factura_automatica()
+            Devolucion.objects.create(reserva=reserva, fecha_devolucion=date(2030, 1, 3), estado_devolucion='entregado')
+        cls.cliente = Cliente.objects.select_related('user').get(user__username='ana@test.com')
+        cls.reserva = cls.cliente.reservas.get()
+        cls.ajena = Reserva.objects.exclude(cliente=cls.cliente).get()
+
+    def _rutas(self, reserva):
+        return [reverse(nombre) for nombre in (
+            'cliente_vehiculos', 'cliente_mis_reservas', 'cliente_mis_facturas', 'cliente_mis_devoluciones',
+        )] + [
+            reverse('cliente_reserva_detail', args=[reserva.pk]),
+            reverse('cliente_factura_detail', args=[reserva.factura.pk]),
+            reverse('cliente_devolucion_detail', args=[reserva.devolucion.pk]),
+        ]
+
+    def test_mismas_respuestas_que_las_vistas_sincronas(self):
+        self.client.force_login(self.cliente.user)
+        rutas = self._rutas(self.reserva)
+        sincronas = {ruta: self.client.get(ruta) for ruta in rutas}
+        with override_settings(ROOT_URLCONF=_rutas_async()):
+            for ruta in rutas:
+                with self.subTest(ruta=ruta):
+                    respuesta = self.client.get(ruta)
+                    self.assertEqual(respuesta.status_code, 200)
+                    self.assertEqual(respuesta.content, sincronas[ruta].content)
+                    self.assertEqual(respuesta.get('ETag'), sincronas[ruta].get('ETag'))
+                    if respuesta.has_header('ETag'):
+                        self.assertEqual(self.client.get(ruta, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    @override_settings(VIGILAR_CONSULTAS=True)
+    async def test_presupuesto_sin_adaptar_a_un_hilo(self):
+        await self.async_client.aforce_login(self.cliente.user)
+        ruta = reverse('cliente_mis_reservas')
+        sincrona = await self.async_client.get(ruta)
+        with override_settings(ROOT_URLCONF=_rutas_async()):
+            asincrona = await self.async_client.get(ruta)
+        # Las consultas de la vista asíncrona corren en otro hilo y también se cuentan
+        self.assertGreater(int(sincrona['X-Consultas']), 0)
+        self.assertEqual(asincrona['X-Consultas'], sincrona['X-Consultas'])
+
+    async def test_permisos(self):
+        with override_settings(ROOT_URLCONF=_rutas_async()):
+            url = reverse('cliente_mis_reservas')
+            respuesta = await self.async_client.get(url)
+            self.assertEqual(respuesta.status_code, 302)
+            self.assertTrue(respuesta['Location'].startswith(reverse('login')))
+
+            await self.async_client.aforce_login(self.admin)
+            self.assertEqual((await self.async_client.get(url))['Location'], reverse('panel_admin'))
+
+            await self.async_client.aforce_login(self.cliente.user)
+            ajenas = await sync_to_async(self._rutas)(self.ajena)
+            for ruta in ajenas[-3:]:
+                with self.subTest(ruta=ruta):
+                    self.assertEqual((await self.async_client.get(ruta)).status_code, 404)
+
+
+@skipUnless('replica' in settings.DATABASES, 'requiere --settings=alquiler.settings_test')
+@override_settings(REPLICAS_LECTURA=['replica'])
+class ReplicasTests(TransactionTestCase):
+    """La base `replica` de las pruebas espeja el primario: se mira qué conexión hizo cada lectura"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin@test.com', 'admin@test.com', 'clave')
+        self.client.force_login(admin)
+        self.categoria = CategoriaLicencia.objects.create(codigo='X', descripcion='Categoría')
+
+    def _bases(self, modelo, accion):
+        """Bases desde las que `accion` leyó la tabla de `modelo`"""
+        tabla = f'"{modelo._meta.db_table}"'
+        capturas = {alias: CaptureQueriesContext(connections[alias]) for alias in ('default', 'replica')}
+        with capturas['default'], capturas['replica']:
+            accion()
+        return {
+            alias for alias, captura in capturas.items()
+            if any(consulta['sql'].startswith('SELECT') and tabla in consulta['sql'] for consulta in captura)
+        }
+
+    def test_listas_y_detalles_leen_de_la_replica(self):
+        for ruta in (
+            reverse('categoria_licencia_list'),
+            reverse('categoria_licencia_detail', args=[self.categoria.pk]),
+        ):
+            self.assertEqual(self._bases(CategoriaLicencia, lambda: self.client.get(ruta)), {'replica'}, ruta)
+        # Los formularios leen del primario
+        ruta = reverse('categoria_licencia_update', args=[self.categoria.pk])
+        self.assertEqual(self._bases(CategoriaLicencia, lambda: self.client.get(ruta)), {'default'})
+
+    def test_exportacion_lee_de_la_replica_mientras_envia(self):
+        respuesta = self.client.get(reverse('reserva_exportar'))
+        # Las filas se leen recién al recorrer el contenido, ya fuera del middleware
+        self.assertEqual(self._bases(Reserva, lambda: b''.join(respuesta.streaming_content)), {'replica'})
+
+    def test_la_sesion_que_escribe_lee_del_primario_un_rato(self):
+        lista = reverse('categoria_licencia_list')
+        respuesta = self.client.post(reverse('categoria_licencia_create'), {'codigo': 'Z', 'descripcion': 'Recién creada'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self._bases(CategoriaLicencia, lambda: self.client.get(lista)), {'default'})
+
+        # Vencida la pausa, vuelve a la réplica
+        sesion = self.client.session
+        sesion[replicas.CLAVE_SESION] = 0
+        sesion.save()
+        self.assertEqual(self._bases(CategoriaLicencia, lambda: self.client.get(lista)), {'replica'})
+
+    def test_transacciones_y_escrituras_vuelven_al_primario(self):
+        categorias = CategoriaLicencia.objects.all()
+        # Sin petición en curso todo va al primario
+        self.assertEqual(categorias.db, 'default')
+
+        peticion, token = replicas.iniciar()
+        replicas.elegir(peticion)
+        try:
+            self.assertEqual(categorias.db, 'replica')
+            with transaction.atomic():
+                self.assertEqual(categorias.db, 'default')
+            leida = categorias.get(codigo='X')
+            self.assertEqual(leida._state.db, 'replica')
+            # Lo leído de la réplica se guarda en el primario
+            leida.descripcion = 'Cambiada'
+            leida.save()
+            self.assertEqual(leida._state.db, 'default')
+            self.assertEqual(categorias.db, 'default')
+        finally:
+            replicas.terminar(token)
@@ -16,15 +16,17 @@ from core.views.vehiculo_views import (
     VehiculoList, VehiculoDetail, VehiculoCreate, VehiculoUpdate, VehiculoDelete
 )
 from core.views.reserva_views import (
-    ReservaList, ReservaDetail, ReservaCreate, ReservaUpdate, ReservaDelete
+    ReservaList, ReservaExport, ReservaDetail, ReservaCreate, ReservaUpdate, ReservaDelete
 )
 from core.views.devolucion_views import (
-    DevolucionList, DevolucionDetail, DevolucionCreate, DevolucionUpdate, DevolucionDelete
+    DevolucionList, DevolucionExport, DevolucionDetail, DevolucionCreate, DevolucionUpdate, DevolucionDelete
 )
 from core.views.factura_views import (
-    FacturaList, FacturaDetail, FacturaCreate, FacturaUpdate, FacturaDelete
+    FacturaList, FacturaExport, FacturaDetail, FacturaCreate, FacturaUpdate, FacturaDelete
 )
+from core.views.importacion_views import ImportacionView
 from core.views.auth_views import LoginView, LogoutView, RegisterView
+from core.views.metricas_views import MetricasView
 from core.views.cliente_panel_views import (
     ClienteVehiculosListView,
     ClienteNuevaReservaView,
@@ -38,6 +40,9 @@ from core.views.cliente_panel_views import (
     ClienteReservaEditView,
     ClienteReservaCancelarView,
     ClienteDevolucionCreateView,
+    ClienteCatalogoJsonView,
+    ClienteCotizacionJsonView,
+    vista_lectura,
 )
 
 urlpatterns = [
@@ -47,18 +52,21 @@ urlpatterns = [
     # Paneles
     path('panel-cliente/', PanelClienteView.as_view(), name='panel_cliente'),
     path('panel-admin/', PanelAdminView.as_view(), name='panel_admin'),
+    path('panel-admin/importar/', ImportacionView.as_view(), name='importacion'),
 
     # Panel de Cliente - Vistas específicas
-    path('cliente/vehiculos/', ClienteVehiculosListView.as_view(), name='cliente_vehiculos'),
+    path('cliente/vehiculos/', vista_lectura(ClienteVehiculosListView).as_view(), name='cliente_vehiculos'),
     path('cliente/nueva-reserva/', ClienteNuevaReservaView.as_view(), name='cliente_nueva_reserva'),
-    path('cliente/mis-reservas/', ClienteMisReservasListView.as_view(), name='cliente_mis_reservas'),
-    path('cliente/reserva/<int:pk>/', ClienteReservaDetailView.as_view(), name='cliente_reserva_detail'),
+    path('cliente/api/catalogo/', ClienteCatalogoJsonView.as_view(), name='cliente_catalogo_json'),
+    path('cliente/api/cotizacion/', ClienteCotizacionJsonView.as_view(), name='cliente_cotizacion_json'),
+    path('cliente/mis-reservas/', vista_lectura(ClienteMisReservasListView).as_view(), name='cliente_mis_reservas'),
+    path('cliente/reserva/<int:pk>/', vista_lectura(ClienteReservaDetailView).as_view(), name='cliente_reserva_detail'),
     path('cliente/reserva/<int:pk>/editar/', ClienteReservaEditView.as_view(), name='cliente_reserva_edit'),
     path('cliente/reserva/<int:pk>/cancelar/', ClienteReservaCancelarView.as_view(), name='cliente_reserva_cancelar'),
-    path('cliente/mis-facturas/', ClienteMisFacturasListView.as_view(), name='cliente_mis_facturas'),
-    path('cliente/factura/<int:pk>/', ClienteFacturaDetailView.as_view(), name='cliente_factura_detail'),
-    path('cliente/mis-devoluciones/', ClienteMisDevolucionesListView.as_view(), name='cliente_mis_devoluciones'),
-    path('cliente/devolucion/<int:pk>/', ClienteDevolucionDetailView.as_view(), name='cliente_devolucion_detail'),
+    path('cliente/mis-facturas/', vista_lectura(ClienteMisFacturasListView).as_view(), name='cliente_mis_facturas'),
+    path('cliente/factura/<int:pk>/', vista_lectura(ClienteFacturaDetailView).as_view(), name='cliente_factura_detail'),
+    path('cliente/mis-devoluciones/', vista_lectura(ClienteMisDevolucionesListView).as_view(), name='cliente_mis_devoluciones'),
+    path('cliente/devolucion/<int:pk>/', vista_lectura(ClienteDevolucionDetailView).as_view(), name='cliente_devolucion_detail'),
     path('cliente/reserva/<int:reserva_pk>/devolucion/nueva/', ClienteDevolucionCreateView.as_view(), name='cliente_devolucion_create'),
     path('cliente/mi-perfil/', ClienteMiPerfilView.as_view(), name='cliente_mi_perfil'),
 
@@ -92,6 +100,7 @@ urlpatterns = [
 
     # Reserva
     path('reserva/', ReservaList.as_view(), name='reserva_list'),
+    path('reserva/exportar/', ReservaExport.as_view(), name='reserva_exportar'),
     path('reserva/<int:pk>/', ReservaDetail.as_view(), name='reserva_detail'),
     path('reserva/nuevo/', ReservaCreate.as_view(), name='reserva_create'),
     path('reserva/<int:pk>/editar/', ReservaUpdate.as_view(), name='reserva_update'),
@@ -99,6 +108,7 @@ urlpatterns = [
 
     # Devolución
     path('devolucion/', DevolucionList.as_view(), name='devolucion_list'),
+    path('devolucion/exportar/', DevolucionExport.as_view(), name='devolucion_exportar'),
     path('devolucion/<int:pk>/', DevolucionDetail.as_view(), name='devolucion_detail'),
     path('devolucion/nuevo/', DevolucionCreate.as_view(), name='devolucion_create'),
     path('devolucion/<int:pk>/editar/', DevolucionUpdate.as_view(), name='devolucion_update'),
@@ -106,6 +116,7 @@ urlpatterns = [
 
     # Factura
     path('factura/', FacturaList.as_view(), name='factura_list'),
+    path('factura/exportar/', FacturaExport.as_view(), name='factura_exportar'),
     path('factura/<int:pk>/', FacturaDetail.as_view(), name='factura_detail'),
     path('factura/nuevo/', FacturaCreate.as_view(), name='factura_create'),
     path('factura/<int:pk>/editar/', FacturaUpdate.as_view(), name='factura_update'),
@@ -115,4 +126,7 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('register/', RegisterView.as_view(), name='register'),
+
+    # Métricas para Prometheus (ver core/metricas.py)
+    path('metrics', MetricasView.as_view(), name='metricas'),
 ]
@@ -8,3 +8,4 @@ from .factura_views import *
 from .auth_views import *
 from .home_views import *
 from .panel_views import *
+from .importacion_views import *
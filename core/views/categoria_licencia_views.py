@@ -2,15 +2,18 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from core.models import CategoriaLicencia
 from core.forms import CategoriaLicenciaForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, KeysetPaginationMixin
 
-class CategoriaLicenciaList(AdminRequiredMixin, ListView):
+class CategoriaLicenciaList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = CategoriaLicencia
     template_name = 'categoria_licencia/list.html'
+    presupuesto_consultas = 4
+    orden_paginacion = ('codigo',)
 
 class CategoriaLicenciaDetail(AdminRequiredMixin, DetailView):
     model = CategoriaLicencia
     template_name = 'categoria_licencia/detail.html'
+    presupuesto_consultas = 4
 
 class CategoriaLicenciaCreate(AdminRequiredMixin, CreateView):
     model = CategoriaLicencia
@@ -1,18 +1,27 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import JsonResponse
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.db.models import Q
 from core.models import Cliente, Vehiculo, Reserva, Factura, Devolucion
-from core.forms import ClienteReservaForm, ClientePerfilForm, FiltroVehiculoForm, FiltroReservaForm, FiltroFacturaForm, FiltroDevolucionForm, ClienteDevolucionForm
+from core.forms import ClienteReservaForm, ClientePerfilForm, CotizacionForm, FiltroVehiculoForm, FiltroReservaForm, FiltroFacturaForm, FiltroDevolucionForm, ClienteDevolucionForm
+from core.mixins import KeysetPaginationMixin, LecturaAsyncMixin, RespuestaCondicionalMixin
+from core.services import busqueda, catalogo, disponibilidad, fragmentos, reservas, tarifas
 
 
-class ClienteVehiculosListView(LoginRequiredMixin, ListView):
+class ClienteVehiculosListView(LoginRequiredMixin, RespuestaCondicionalMixin, KeysetPaginationMixin, ListView):
     """Lista de vehículos disponibles para el cliente"""
     model = Vehiculo
     template_name = 'cliente_panel/vehiculos_list.html'
+    presupuesto_consultas = 5
     context_object_name = 'vehiculos'
+    orden_paginacion = ('-disponible', 'marca', 'pk')
     login_url = 'login'
 
     def get_queryset(self):
@@ -26,30 +35,54 @@ class ClienteVehiculosListView(LoginRequiredMixin, ListView):
             precio_min = forma.cleaned_data.get('precio_min')
             precio_max = forma.cleaned_data.get('precio_max')
             disponible = forma.cleaned_data.get('disponible')
+            fecha_inicio = forma.cleaned_data.get('fecha_inicio')
+            fecha_fin = forma.cleaned_data.get('fecha_fin')
             
-            if marca:
-                queryset = queryset.filter(marca__icontains=marca)
-            if modelo:
-                queryset = queryset.filter(modelo__icontains=modelo)
+            queryset = busqueda.buscar(queryset, [
+                (marca, ('marca',)),
+                (modelo, ('modelo',)),
+            ])
             if precio_min is not None:
                 queryset = queryset.filter(costo_dia__gte=precio_min)
             if precio_max is not None:
                 queryset = queryset.filter(costo_dia__lte=precio_max)
             if disponible is not None:
                 queryset = queryset.filter(disponible=disponible)
+            if fecha_inicio and fecha_fin:
+                queryset = disponibilidad.vehiculos_libres(queryset, fecha_inicio, fecha_fin)
         else:
             # Si no hay filtros, mostrar solo disponibles por defecto
             queryset = queryset.filter(disponible=True)
         
         return queryset
 
+    def get_claves_version(self):
+        # La búsqueda por fechas depende de las reservas, que avanzan la
+        # versión del catálogo al cambiar
+        return (catalogo.version(),)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         try:
             context['cliente'] = self.request.user.cliente
         except Cliente.DoesNotExist:
             context['cliente'] = None
-        context['form'] = FiltroVehiculoForm(self.request.GET)
+        forma = FiltroVehiculoForm(self.request.GET)
+        context['form'] = forma
+        # Modo búsqueda por fechas: los resultados están libres en ese rango
+        context['busqueda_fechas'] = bool(
+            forma.is_valid()
+            and forma.cleaned_data.get('fecha_inicio')
+            and forma.cleaned_data.get('fecha_fin')
+        )
+        # En la búsqueda por fechas la tarjeta lleva las fechas en el enlace de reservar
+        contexto = {'busqueda_fechas': context['busqueda_fechas']}
+        if context['busqueda_fechas']:
+            contexto.update(fecha_inicio=forma['fecha_inicio'].value(), fecha_fin=forma['fecha_fin'].value())
+        context['tarjetas'] = fragmentos.renderizar(
+            'cliente_panel/tarjeta_vehiculo.html', context['object_list'], 'vehiculo', fragmentos.version,
+            contexto=contexto, variante=fragmentos.huella(repr(sorted(contexto.items()))),
+        )
         return context
 
 
@@ -58,6 +91,7 @@ class ClienteNuevaReservaView(LoginRequiredMixin, CreateView):
     model = Reserva
     form_class = ClienteReservaForm
     template_name = 'cliente_panel/nueva_reserva.html'
+    presupuesto_consultas = 5
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -75,27 +109,45 @@ class ClienteNuevaReservaView(LoginRequiredMixin, CreateView):
                 initial['vehiculo'] = int(vehiculo_id)
             except (ValueError, TypeError):
                 pass
+        # Pre-cargar fechas si vienen de la búsqueda por disponibilidad
+        for campo in ('fecha_inicio', 'fecha_fin'):
+            if self.request.GET.get(campo):
+                initial[campo] = self.request.GET[campo]
         return initial
 
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # Sin fechas elegidas la lista es el catálogo completo: la página solo
+        # lleva el vehículo preseleccionado y el JavaScript trae el resto de
+        # ClienteCatalogoJsonView, que el navegador revalida con su ETag
+        self.catalogo_diferido = self.request.method == 'GET' and not form._rango_fechas()
+        if self.catalogo_diferido:
+            seleccionado = catalogo.buscar(form.initial.get('vehiculo'))
+            form.fields['vehiculo'].choices = [('', '---------')] + (
+                [(seleccionado['id'], seleccionado['etiqueta'])] if seleccionado else []
+            )
+        return form
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         try:
             context['cliente'] = self.request.user.cliente
         except Cliente.DoesNotExist:
             context['cliente'] = None
+        context['catalogo_diferido'] = getattr(self, 'catalogo_diferido', False)
         
         # Agregar vehículo seleccionado si existe
         vehiculo_id = self.request.GET.get('vehiculo')
+        context['vehiculo_seleccionado'] = None
         if vehiculo_id:
-            try:
-                context['vehiculo_seleccionado'] = Vehiculo.objects.get(pk=vehiculo_id, disponible=True)
-            except Vehiculo.DoesNotExist:
-                context['vehiculo_seleccionado'] = None
-        else:
-            context['vehiculo_seleccionado'] = None
-        
-        # Agregar lista de vehículos para el JavaScript
-        context['vehiculos'] = Vehiculo.objects.filter(disponible=True)
+            form = context['form']
+            if form._rango_fechas():
+                try:
+                    context['vehiculo_seleccionado'] = form.fields['vehiculo'].queryset.get(pk=vehiculo_id)
+                except (Vehiculo.DoesNotExist, ValueError):
+                    pass
+            else:
+                context['vehiculo_seleccionado'] = catalogo.buscar(vehiculo_id)
         
         return context
 
@@ -106,35 +158,14 @@ class ClienteNuevaReservaView(LoginRequiredMixin, CreateView):
             form.instance.cliente = cliente
             form.instance.estado = 'pendiente'
             
-            # Calcular total automáticamente si no se proporcionó
-            if not form.instance.total or form.instance.total == 0:
-                vehiculo = form.instance.vehiculo
-                fecha_inicio = form.instance.fecha_inicio
-                fecha_fin = form.instance.fecha_fin
-                if vehiculo and fecha_inicio and fecha_fin:
-                    dias = (fecha_fin - fecha_inicio).days + 1
-                    form.instance.total = vehiculo.costo_dia * dias
-            
-            # Guardar la reserva
-            reserva = form.save()
-            
-            # Actualizar disponibilidad del vehículo basado en reservas activas
-            vehiculo = reserva.vehiculo
-            reservas_activas = Reserva.objects.filter(
-                vehiculo=vehiculo,
-                estado__in=['pendiente', 'confirmada']
-            ).exclude(pk=reserva.pk).exists()
-            
-            if reservas_activas or reserva.estado in ['pendiente', 'confirmada']:
-                vehiculo.disponible = False
-                vehiculo.save()
-            
-            # Crear factura automáticamente si está confirmada
-            if reserva.estado == 'confirmada':
-                reserva.crear_factura_automatica()
-            
+            # Guardar y ocupar el vehículo en una transacción; el total se
+            # calcula si no se proporcionó
+            self.object = reservas.crear(form.instance)
             messages.success(self.request, 'Reserva creada exitosamente. Está pendiente de confirmación.')
-            return super().form_valid(form)
+            return redirect(self.get_success_url())
+        except reservas.TransicionInvalida as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
         except Cliente.DoesNotExist:
             messages.error(self.request, 'Error: No se encontró tu perfil de cliente.')
             return redirect('panel_cliente')
@@ -143,11 +174,78 @@ class ClienteNuevaReservaView(LoginRequiredMixin, CreateView):
         return reverse_lazy('cliente_vehiculos')
 
 
-class ClienteMisReservasListView(LoginRequiredMixin, ListView):
+class CatalogoJsonMixin(LoginRequiredMixin):
+    """
+    Respuestas JSON derivadas del catálogo, con un ETag fuerte por versión.
+    Si el cliente ya tiene la versión vigente se responde 304 sin consultar
+    la base de datos; `no-cache` obliga a revalidar en cada uso.
+    """
+    prefijo_etag = 'catalogo'
+    presupuesto_consultas = 3
+    login_url = 'login'
+
+    def get(self, request, *args, **kwargs):
+        etag = catalogo.etag(self.prefijo_etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.get_json(request)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_json(self, request):
+        raise NotImplementedError
+
+
+class ClienteCatalogoJsonView(CatalogoJsonMixin, View):
+    """Vehículos disponibles (id, etiqueta y costo diario) para la página de nueva reserva"""
+
+    def get_json(self, request):
+        return JsonResponse({
+            'version': catalogo.version(),
+            'vehiculos': [
+                {'id': vehiculo['id'], 'etiqueta': vehiculo['etiqueta'], 'costo_dia': vehiculo['costo_dia']}
+                for vehiculo in catalogo.disponibles()
+            ],
+        })
+
+
+class ClienteCotizacionJsonView(CatalogoJsonMixin, View):
+    """Total de alquilar un vehículo del catálogo entre dos fechas"""
+    prefijo_etag = 'cotizacion'
+
+    def get_json(self, request):
+        form = CotizacionForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errores': form.errors}, status=400)
+        datos = form.cleaned_data
+        # Con fechas elegidas el formulario ofrece también vehículos marcados
+        # como no disponibles pero libres en ese rango, que no están en el
+        # catálogo; su costo también invalida la versión al cambiar
+        vehiculo = catalogo.buscar(datos['vehiculo']) or (
+            Vehiculo.objects.filter(pk=datos['vehiculo']).values('id', 'costo_dia').first()
+        )
+        if vehiculo is None:
+            return JsonResponse({'errores': {'vehiculo': ['El vehículo no existe.']}}, status=404)
+        return JsonResponse({
+            'vehiculo': vehiculo['id'],
+            'fecha_inicio': datos['fecha_inicio'],
+            'fecha_fin': datos['fecha_fin'],
+            'dias': (datos['fecha_fin'] - datos['fecha_inicio']).days + 1,
+            'costo_dia': vehiculo['costo_dia'],
+            'total': tarifas.total(vehiculo['costo_dia'], datos['fecha_inicio'], datos['fecha_fin']),
+        })
+
+
+class ClienteMisReservasListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Lista de reservas del cliente autenticado"""
     model = Reserva
     template_name = 'cliente_panel/mis_reservas.html'
+    presupuesto_consultas = 5
     context_object_name = 'reservas'
+    orden_paginacion = ('-fecha_inicio', '-pk')
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -159,7 +257,7 @@ class ClienteMisReservasListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         try:
             cliente = self.request.user.cliente
-            queryset = Reserva.objects.filter(cliente=cliente).order_by('-fecha_inicio')
+            queryset = Reserva.objects.filter(cliente=cliente).select_related('vehiculo').order_by('-fecha_inicio')
             forma = FiltroReservaForm(self.request.GET)
             
             if forma.is_valid():
@@ -168,8 +266,7 @@ class ClienteMisReservasListView(LoginRequiredMixin, ListView):
                 fecha_inicio_desde = forma.cleaned_data.get('fecha_inicio_desde')
                 fecha_inicio_hasta = forma.cleaned_data.get('fecha_inicio_hasta')
                 
-                if marca_vehiculo:
-                    queryset = queryset.filter(vehiculo__marca__icontains=marca_vehiculo)
+                queryset = busqueda.buscar(queryset, [(marca_vehiculo, ('vehiculo__marca',))])
                 if estado:
                     queryset = queryset.filter(estado=estado)
                 if fecha_inicio_desde:
@@ -191,17 +288,19 @@ class ClienteMisReservasListView(LoginRequiredMixin, ListView):
         return context
 
 
-class ClienteReservaDetailView(LoginRequiredMixin, DetailView):
+class ClienteReservaDetailView(LoginRequiredMixin, RespuestaCondicionalMixin, DetailView):
     """Detalle de una reserva del cliente"""
     model = Reserva
     template_name = 'cliente_panel/reserva_detail.html'
+    presupuesto_consultas = 5
+    campos_version = ('updated_at', 'vehiculo__updated_at', 'factura__updated_at', 'devolucion__updated_at')
     context_object_name = 'reserva'
     login_url = 'login'
 
     def get_queryset(self):
         try:
             cliente = self.request.user.cliente
-            return Reserva.objects.filter(cliente=cliente)
+            return Reserva.objects.filter(cliente=cliente).select_related('vehiculo', 'factura', 'devolucion')
         except Cliente.DoesNotExist:
             return Reserva.objects.none()
 
@@ -214,11 +313,13 @@ class ClienteReservaDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
-class ClienteMisFacturasListView(LoginRequiredMixin, ListView):
+class ClienteMisFacturasListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Lista de facturas del cliente autenticado"""
     model = Factura
     template_name = 'cliente_panel/mis_facturas.html'
+    presupuesto_consultas = 5
     context_object_name = 'facturas'
+    orden_paginacion = ('-fecha_emision', '-pk')
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -232,7 +333,7 @@ class ClienteMisFacturasListView(LoginRequiredMixin, ListView):
             cliente = self.request.user.cliente
             # Obtener facturas de las reservas del cliente
             reservas_cliente = Reserva.objects.filter(cliente=cliente)
-            queryset = Factura.objects.filter(reserva__in=reservas_cliente).order_by('-fecha_emision')
+            queryset = Factura.objects.filter(reserva__in=reservas_cliente).select_related('reserva').order_by('-fecha_emision')
             forma = FiltroFacturaForm(self.request.GET)
             
             if forma.is_valid():
@@ -242,8 +343,7 @@ class ClienteMisFacturasListView(LoginRequiredMixin, ListView):
                 fecha_desde = forma.cleaned_data.get('fecha_desde')
                 fecha_hasta = forma.cleaned_data.get('fecha_hasta')
                 
-                if numero:
-                    queryset = queryset.filter(numero__icontains=numero)
+                queryset = busqueda.buscar(queryset, [(numero, ('numero',))])
                 if monto_min is not None:
                     queryset = queryset.filter(monto__gte=monto_min)
                 if monto_max is not None:
@@ -267,10 +367,12 @@ class ClienteMisFacturasListView(LoginRequiredMixin, ListView):
         return context
 
 
-class ClienteFacturaDetailView(LoginRequiredMixin, DetailView):
+class ClienteFacturaDetailView(LoginRequiredMixin, RespuestaCondicionalMixin, DetailView):
     """Detalle de una factura del cliente"""
     model = Factura
     template_name = 'cliente_panel/factura_detail.html'
+    presupuesto_consultas = 5
+    campos_version = ('updated_at', 'reserva__updated_at', 'reserva__vehiculo__updated_at')
     context_object_name = 'factura'
     login_url = 'login'
 
@@ -278,7 +380,7 @@ class ClienteFacturaDetailView(LoginRequiredMixin, DetailView):
         try:
             cliente = self.request.user.cliente
             reservas_cliente = Reserva.objects.filter(cliente=cliente)
-            return Factura.objects.filter(reserva__in=reservas_cliente)
+            return Factura.objects.filter(reserva__in=reservas_cliente).select_related('reserva__vehiculo')
         except Cliente.DoesNotExist:
             return Factura.objects.none()
 
@@ -291,11 +393,13 @@ class ClienteFacturaDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
-class ClienteMisDevolucionesListView(LoginRequiredMixin, ListView):
+class ClienteMisDevolucionesListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Lista de devoluciones del cliente autenticado"""
     model = Devolucion
     template_name = 'cliente_panel/mis_devoluciones.html'
+    presupuesto_consultas = 5
     context_object_name = 'devoluciones'
+    orden_paginacion = ('-fecha_devolucion', '-pk')
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -309,7 +413,7 @@ class ClienteMisDevolucionesListView(LoginRequiredMixin, ListView):
             cliente = self.request.user.cliente
             # Obtener devoluciones de las reservas del cliente
             reservas_cliente = Reserva.objects.filter(cliente=cliente)
-            queryset = Devolucion.objects.filter(reserva__in=reservas_cliente).order_by('-fecha_devolucion')
+            queryset = Devolucion.objects.filter(reserva__in=reservas_cliente).select_related('reserva').order_by('-fecha_devolucion')
             forma = FiltroDevolucionForm(self.request.GET)
             
             if forma.is_valid():
@@ -344,10 +448,12 @@ class ClienteMisDevolucionesListView(LoginRequiredMixin, ListView):
         return context
 
 
-class ClienteDevolucionDetailView(LoginRequiredMixin, DetailView):
+class ClienteDevolucionDetailView(LoginRequiredMixin, RespuestaCondicionalMixin, DetailView):
     """Detalle de una devolución del cliente"""
     model = Devolucion
     template_name = 'cliente_panel/devolucion_detail.html'
+    presupuesto_consultas = 5
+    campos_version = ('updated_at', 'reserva__updated_at', 'reserva__vehiculo__updated_at')
     context_object_name = 'devolucion'
     login_url = 'login'
 
@@ -355,7 +461,7 @@ class ClienteDevolucionDetailView(LoginRequiredMixin, DetailView):
         try:
             cliente = self.request.user.cliente
             reservas_cliente = Reserva.objects.filter(cliente=cliente)
-            return Devolucion.objects.filter(reserva__in=reservas_cliente)
+            return Devolucion.objects.filter(reserva__in=reservas_cliente).select_related('reserva__vehiculo')
         except Cliente.DoesNotExist:
             return Devolucion.objects.none()
 
@@ -373,6 +479,7 @@ class ClienteMiPerfilView(LoginRequiredMixin, UpdateView):
     model = Cliente
     form_class = ClientePerfilForm
     template_name = 'cliente_panel/mi_perfil.html'
+    presupuesto_consultas = 5
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -453,26 +560,14 @@ class ClienteReservaCancelarView(LoginRequiredMixin, DeleteView):
         except Cliente.DoesNotExist:
             return Reserva.objects.none()
     
-    def delete(self, request, *args, **kwargs):
-        reserva = self.get_object()
-        vehiculo = reserva.vehiculo
-        
+    def form_valid(self, form):
         # Cambiar estado a cancelada en lugar de eliminar
-        reserva.estado = 'cancelada'
-        reserva.save()
-        
-        # Verificar si hay otras reservas activas
-        reservas_activas = Reserva.objects.filter(
-            vehiculo=vehiculo,
-            estado__in=['pendiente', 'confirmada']
-        ).exclude(pk=reserva.pk).exists()
-        
-        # Si no hay otras reservas activas, marcar vehículo como disponible
-        if not reservas_activas:
-            vehiculo.disponible = True
-            vehiculo.save()
-        
-        messages.success(request, 'Reserva cancelada exitosamente.')
+        try:
+            reservas.cancelar(self.object.pk)
+        except reservas.TransicionInvalida as error:
+            messages.error(self.request, str(error))
+        else:
+            messages.success(self.request, 'Reserva cancelada exitosamente.')
         return redirect('cliente_mis_reservas')
 
 
@@ -540,19 +635,13 @@ class ClienteDevolucionCreateView(LoginRequiredMixin, CreateView):
         except Devolucion.DoesNotExist:
             pass
         
-        devolucion = form.save(commit=False)
-        devolucion.reserva = self.reserva
-        
-        # Calcular penalización automáticamente
-        penalizacion = devolucion.calcular_penalizacion()
-        devolucion.save()
-        
-        # Actualizar factura con penalización
-        devolucion.actualizar_factura_con_penalizacion()
-        
-        # Marcar vehículo como disponible nuevamente
-        devolucion.reserva.vehiculo.disponible = True
-        devolucion.reserva.vehiculo.save()
+        form.instance.reserva = self.reserva
+        # Penalización, factura y vehículo se actualizan en una transacción
+        try:
+            devolucion = reservas.devolver(form.instance)
+        except reservas.TransicionInvalida as error:
+            messages.error(self.request, str(error))
+            return redirect('cliente_mis_reservas')
         
         messages.success(self.request, f'Devolución registrada. Penalización: ${devolucion.penalizacion:,.2f}')
         
@@ -562,3 +651,67 @@ class ClienteDevolucionCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy('cliente_mis_devoluciones')
 
+
+
+class ClienteAsyncMixin(LecturaAsyncMixin):
+    """
+    Versión asíncrona de una vista de lectura del panel del cliente. El
+    usuario se resuelve con request.auser() y su cliente se lee una vez y
+    queda cacheado en request.user.cliente, que es lo que usan
+    get_queryset() y get_context_data() de la vista síncrona.
+    """
+    # Las listas mandan a los administradores a su panel, como sus get() síncronos
+    solo_clientes = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = user = await request.auser()
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        if self.solo_clientes and (user.is_staff or user.is_superuser):
+            return redirect('panel_admin')
+        User.cliente.related.set_cached_value(user, await Cliente.objects.filter(user=user).afirst())
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class ClienteVehiculosListAsyncView(ClienteAsyncMixin, ClienteVehiculosListView):
+    pass
+
+
+class ClienteMisReservasListAsyncView(ClienteAsyncMixin, ClienteMisReservasListView):
+    solo_clientes = True
+
+
+class ClienteReservaDetailAsyncView(ClienteAsyncMixin, ClienteReservaDetailView):
+    pass
+
+
+class ClienteMisFacturasListAsyncView(ClienteAsyncMixin, ClienteMisFacturasListView):
+    solo_clientes = True
+
+
+class ClienteFacturaDetailAsyncView(ClienteAsyncMixin, ClienteFacturaDetailView):
+    pass
+
+
+class ClienteMisDevolucionesListAsyncView(ClienteAsyncMixin, ClienteMisDevolucionesListView):
+    solo_clientes = True
+
+
+class ClienteDevolucionDetailAsyncView(ClienteAsyncMixin, ClienteDevolucionDetailView):
+    pass
+
+
+VERSIONES_ASYNC = {
+    ClienteVehiculosListView: ClienteVehiculosListAsyncView,
+    ClienteMisReservasListView: ClienteMisReservasListAsyncView,
+    ClienteReservaDetailView: ClienteReservaDetailAsyncView,
+    ClienteMisFacturasListView: ClienteMisFacturasListAsyncView,
+    ClienteFacturaDetailView: ClienteFacturaDetailAsyncView,
+    ClienteMisDevolucionesListView: ClienteMisDevolucionesListAsyncView,
+    ClienteDevolucionDetailView: ClienteDevolucionDetailAsyncView,
+}
+
+
+def vista_lectura(vista):
+    """La vista o, con PANEL_CLIENTE_ASYNC, su versión asíncrona"""
+    return VERSIONES_ASYNC[vista] if settings.PANEL_CLIENTE_ASYNC else vista
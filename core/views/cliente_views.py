@@ -3,14 +3,17 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.db.models import Q
 from core.models import Cliente
 from core.forms import ClienteForm, FiltroClienteForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, KeysetPaginationMixin
+from core.services import busqueda
 
-class ClienteList(AdminRequiredMixin, ListView):
+class ClienteList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Cliente
     template_name = 'cliente/list.html'
+    presupuesto_consultas = 5
+    orden_paginacion = ('pk',)
     
     def get_queryset(self):
-        queryset = Cliente.objects.all()
+        queryset = Cliente.objects.select_related('user', 'licencia')
         forma = FiltroClienteForm(self.request.GET)
         
         if forma.is_valid():
@@ -19,10 +22,10 @@ class ClienteList(AdminRequiredMixin, ListView):
             email = forma.cleaned_data.get('email')
             licencia = forma.cleaned_data.get('licencia')
             
-            if nombre:
-                queryset = queryset.filter(nombre__icontains=nombre)
-            if apellido:
-                queryset = queryset.filter(apellido__icontains=apellido)
+            queryset = busqueda.buscar(queryset, [
+                (nombre, ('nombre',)),
+                (apellido, ('apellido',)),
+            ])
             if email:
                 queryset = queryset.filter(user__email__icontains=email)
             if licencia:
@@ -37,7 +40,9 @@ class ClienteList(AdminRequiredMixin, ListView):
 
 class ClienteDetail(AdminRequiredMixin, DetailView):
     model = Cliente
+    queryset = Cliente.objects.select_related('user', 'licencia')
     template_name = 'cliente/detail.html'
+    presupuesto_consultas = 4
 
 class ClienteCreate(AdminRequiredMixin, CreateView):
     model = Cliente
@@ -1,17 +1,21 @@
+from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.db.models import Q
 from core.models import Devolucion
 from core.forms import DevolucionForm, FiltroDevolucionForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, ExportarCSVMixin, KeysetPaginationMixin
+from core.services import reservas
 
-class DevolucionList(AdminRequiredMixin, ListView):
+class DevolucionList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Devolucion
     template_name = 'devolucion/list.html'
+    presupuesto_consultas = 5
+    orden_paginacion = ('-fecha_devolucion', '-pk')
     
     def get_queryset(self):
-        queryset = Devolucion.objects.all()
+        queryset = Devolucion.objects.select_related('reserva')
         forma = FiltroDevolucionForm(self.request.GET)
         
         if forma.is_valid():
@@ -39,9 +43,29 @@ class DevolucionList(AdminRequiredMixin, ListView):
         context['form'] = FiltroDevolucionForm(self.request.GET)
         return context
 
+class DevolucionExport(ExportarCSVMixin, DevolucionList):
+    """Exporta a CSV las devoluciones filtradas con el mismo formulario de la lista"""
+    nombre_exportacion = 'devoluciones'
+    columnas_exportacion = (
+        ('id', 'Devolución'),
+        ('fecha_devolucion', 'Fecha devolución'),
+        ('estado_devolucion', 'Estado'),
+        ('penalizacion', 'Penalización'),
+        ('reserva_id', 'Reserva'),
+        ('reserva__fecha_inicio', 'Inicio reserva'),
+        ('reserva__fecha_fin', 'Fin reserva'),
+        ('reserva__cliente__nombre', 'Nombre cliente'),
+        ('reserva__cliente__apellido', 'Apellido cliente'),
+        ('reserva__vehiculo__placa', 'Placa'),
+        ('reserva__vehiculo__marca', 'Marca'),
+        ('reserva__vehiculo__modelo', 'Modelo'),
+    )
+
 class DevolucionDetail(AdminRequiredMixin, DetailView):
     model = Devolucion
+    queryset = Devolucion.objects.select_related('reserva__cliente')
     template_name = 'devolucion/detail.html'
+    presupuesto_consultas = 4
 
 class DevolucionCreate(AdminRequiredMixin, CreateView):
     model = Devolucion
@@ -50,21 +74,15 @@ class DevolucionCreate(AdminRequiredMixin, CreateView):
     success_url = reverse_lazy('devolucion_list')
     
     def form_valid(self, form):
-        devolucion = form.save(commit=False)
-        
-        # Calcular penalización automáticamente
-        devolucion.calcular_penalizacion()
-        devolucion.save()
-        
-        # Actualizar factura con penalización
-        devolucion.actualizar_factura_con_penalizacion()
-        
-        # Marcar vehículo como disponible nuevamente
-        devolucion.reserva.vehiculo.disponible = True
-        devolucion.reserva.vehiculo.save()
-        
-        messages.success(self.request, f'Devolución registrada. Penalización: ${devolucion.penalizacion:,.2f}')
-        return super().form_valid(form)
+        # Penalización, factura y vehículo se actualizan en una transacción
+        try:
+            self.object = reservas.devolver(form.instance)
+        except reservas.TransicionInvalida as error:
+            form.add_error('reserva', str(error))
+            return self.form_invalid(form)
+
+        messages.success(self.request, f'Devolución registrada. Penalización: ${self.object.penalizacion:,.2f}')
+        return HttpResponseRedirect(self.get_success_url())
 
 class DevolucionUpdate(AdminRequiredMixin, UpdateView):
     model = Devolucion
@@ -1,16 +1,20 @@
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.db import transaction
 from django.db.models import Q
 from core.models import Factura
 from core.forms import FacturaForm, FiltroFacturaForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, ExportarCSVMixin, KeysetPaginationMixin
+from core.services import busqueda, numeracion
 
-class FacturaList(AdminRequiredMixin, ListView):
+class FacturaList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Factura
     template_name = 'factura/list.html'
+    presupuesto_consultas = 5
+    orden_paginacion = ('-fecha_emision', '-pk')
     
     def get_queryset(self):
-        queryset = Factura.objects.all()
+        queryset = Factura.objects.select_related('reserva')
         forma = FiltroFacturaForm(self.request.GET)
         
         if forma.is_valid():
@@ -20,8 +24,7 @@ class FacturaList(AdminRequiredMixin, ListView):
             fecha_desde = forma.cleaned_data.get('fecha_desde')
             fecha_hasta = forma.cleaned_data.get('fecha_hasta')
             
-            if numero:
-                queryset = queryset.filter(numero__icontains=numero)
+            queryset = busqueda.buscar(queryset, [(numero, ('numero',))])
             if monto_min is not None:
                 queryset = queryset.filter(monto__gte=monto_min)
             if monto_max is not None:
@@ -38,9 +41,29 @@ class FacturaList(AdminRequiredMixin, ListView):
         context['form'] = FiltroFacturaForm(self.request.GET)
         return context
 
+class FacturaExport(ExportarCSVMixin, FacturaList):
+    """Exporta a CSV las facturas filtradas con el mismo formulario de la lista"""
+    nombre_exportacion = 'facturas'
+    columnas_exportacion = (
+        ('numero', 'Número'),
+        ('fecha_emision', 'Fecha emisión'),
+        ('monto', 'Monto'),
+        ('reserva_id', 'Reserva'),
+        ('reserva__fecha_inicio', 'Inicio reserva'),
+        ('reserva__fecha_fin', 'Fin reserva'),
+        ('reserva__cliente__nombre', 'Nombre cliente'),
+        ('reserva__cliente__apellido', 'Apellido cliente'),
+        ('reserva__cliente__user__email', 'Email cliente'),
+        ('reserva__vehiculo__placa', 'Placa'),
+        ('reserva__vehiculo__marca', 'Marca'),
+        ('reserva__vehiculo__modelo', 'Modelo'),
+    )
+
 class FacturaDetail(AdminRequiredMixin, DetailView):
     model = Factura
+    queryset = Factura.objects.select_related('reserva__cliente')
     template_name = 'factura/detail.html'
+    presupuesto_consultas = 4
 
 class FacturaCreate(AdminRequiredMixin, CreateView):
     model = Factura
@@ -48,6 +71,14 @@ class FacturaCreate(AdminRequiredMixin, CreateView):
     template_name = 'factura/form.html'
     success_url = reverse_lazy('factura_list')
 
+    def form_valid(self, form):
+        # Número y factura en la misma transacción: si el guardado falla,
+        # el contador vuelve atrás y la serie no queda con un hueco
+        with transaction.atomic():
+            if not form.instance.numero:
+                form.instance.numero = numeracion.siguiente()
+            return super().form_valid(form)
+
 class FacturaUpdate(AdminRequiredMixin, UpdateView):
     model = Factura
     form_class = FacturaForm
@@ -0,0 +1,32 @@
+from io import TextIOWrapper
+
+from django.views.generic import FormView
+from core.forms import ImportacionForm
+from core.mixins import AdminRequiredMixin
+from core.services import importacion
+
+
+class ImportacionView(AdminRequiredMixin, FormView):
+    """Carga masiva de vehículos o clientes desde un CSV"""
+    form_class = ImportacionForm
+    template_name = 'importacion/form.html'
+    # Errores que se muestran en pantalla; el resto solo se cuenta
+    max_errores = 200
+
+    def form_valid(self, form):
+        archivo = TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig', newline='')
+        if form.cleaned_data['tipo'] == 'vehiculos':
+            resultado = importacion.importar_vehiculos(archivo)
+        else:
+            resultado = importacion.importar_clientes(archivo)
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(initial={'tipo': form.cleaned_data['tipo']}),
+            resultado=resultado,
+            errores=resultado.errores[:self.max_errores],
+        ))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['columnas_vehiculos'] = importacion.COLUMNAS_VEHICULOS
+        context['columnas_clientes'] = importacion.COLUMNAS_CLIENTES
+        return context
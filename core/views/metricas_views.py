@@ -0,0 +1,21 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+
+from core import metricas
+
+
+class MetricasView(View):
+    """
+    Histogramas de las peticiones en formato Prometheus. Con
+    `METRICAS_TOKEN` configurado exige `Authorization: Bearer <token>`.
+    """
+
+    def get(self, request):
+        token = getattr(settings, 'METRICAS_TOKEN', '')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+        contenido, content_type = metricas.exportar()
+        return HttpResponse(contenido, content_type=content_type)
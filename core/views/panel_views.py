@@ -2,11 +2,13 @@ from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect
 from core.models import Cliente
+from core.services import atrasos, indicadores, resumen_cliente
 
 
 class PanelClienteView(LoginRequiredMixin, TemplateView):
     """Panel para clientes registrados"""
     template_name = 'panel_cliente.html'
+    presupuesto_consultas = 4
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -29,6 +31,8 @@ class PanelClienteView(LoginRequiredMixin, TemplateView):
             context['cliente'] = self.request.user.cliente
         except Cliente.DoesNotExist:
             context['cliente'] = None
+        # Contadores del cliente: una consulta con el cache frío, ninguna caliente
+        context['resumen'] = resumen_cliente.obtener(context['cliente'].pk) if context['cliente'] else None
         
         return context
 
@@ -36,6 +40,9 @@ class PanelClienteView(LoginRequiredMixin, TemplateView):
 class PanelAdminView(LoginRequiredMixin, TemplateView):
     """Panel de administración para staff/superuser"""
     template_name = 'panel_admin.html'
+    presupuesto_consultas = 10
+    # Reporte: lee de una réplica (ver core/replicas.py)
+    usar_replica = True
     login_url = 'login'
 
     def get(self, request, *args, **kwargs):
@@ -48,4 +55,6 @@ class PanelAdminView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user'] = self.request.user
+        context['indicadores'] = indicadores.obtener()
+        context['atrasos'] = atrasos.resumen()
         return context
@@ -1,17 +1,20 @@
+from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
-from django.db.models import Q
 from core.models import Reserva
 from core.forms import ReservaForm, FiltroReservaForm, ReservaAprobacionForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, ExportarCSVMixin, KeysetPaginationMixin
+from core.services import busqueda, fragmentos, reservas
 
-class ReservaList(AdminRequiredMixin, ListView):
+class ReservaList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = Reserva
     template_name = 'reserva/list.html'
+    presupuesto_consultas = 5
+    orden_paginacion = ('-fecha_inicio', '-pk')
     
     def get_queryset(self):
-        queryset = Reserva.objects.all()
+        queryset = Reserva.objects.select_related('cliente', 'vehiculo')
         forma = FiltroReservaForm(self.request.GET)
         
         if forma.is_valid():
@@ -21,13 +24,10 @@ class ReservaList(AdminRequiredMixin, ListView):
             fecha_inicio_desde = forma.cleaned_data.get('fecha_inicio_desde')
             fecha_inicio_hasta = forma.cleaned_data.get('fecha_inicio_hasta')
             
-            if cliente_nombre:
-                queryset = queryset.filter(
-                    Q(cliente__nombre__icontains=cliente_nombre) |
-                    Q(cliente__apellido__icontains=cliente_nombre)
-                )
-            if marca_vehiculo:
-                queryset = queryset.filter(vehiculo__marca__icontains=marca_vehiculo)
+            queryset = busqueda.buscar(queryset, [
+                (cliente_nombre, ('cliente__nombre', 'cliente__apellido')),
+                (marca_vehiculo, ('vehiculo__marca',)),
+            ])
             if estado:
                 queryset = queryset.filter(estado=estado)
             if fecha_inicio_desde:
@@ -40,11 +40,36 @@ class ReservaList(AdminRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = FiltroReservaForm(self.request.GET)
+        # El cliente no lleva updated_at: la fila cambia con el nombre que muestra
+        context['filas'] = fragmentos.renderizar(
+            'reserva/fila.html', context['object_list'], 'reserva',
+            lambda reserva: f'{fragmentos.version(reserva, reserva.vehiculo)}.{fragmentos.huella(str(reserva.cliente))}',
+        )
         return context
 
+class ReservaExport(ExportarCSVMixin, ReservaList):
+    """Exporta a CSV las reservas filtradas con el mismo formulario de la lista"""
+    nombre_exportacion = 'reservas'
+    columnas_exportacion = (
+        ('id', 'Reserva'),
+        ('estado', 'Estado'),
+        ('fecha_inicio', 'Inicio'),
+        ('fecha_fin', 'Fin'),
+        ('total', 'Total'),
+        ('cliente__nombre', 'Nombre cliente'),
+        ('cliente__apellido', 'Apellido cliente'),
+        ('cliente__user__email', 'Email cliente'),
+        ('vehiculo__placa', 'Placa'),
+        ('vehiculo__marca', 'Marca'),
+        ('vehiculo__modelo', 'Modelo'),
+        ('factura__numero', 'Factura'),
+    )
+
 class ReservaDetail(AdminRequiredMixin, DetailView):
     model = Reserva
+    queryset = Reserva.objects.select_related('cliente', 'vehiculo')
     template_name = 'reserva/detail.html'
+    presupuesto_consultas = 4
 
 class ReservaCreate(AdminRequiredMixin, CreateView):
     model = Reserva
@@ -53,20 +78,13 @@ class ReservaCreate(AdminRequiredMixin, CreateView):
     success_url = reverse_lazy('reserva_list')
     
     def form_valid(self, form):
-        # Guardar la reserva
-        reserva = form.save()
-        
-        # Actualizar disponibilidad del vehículo basado en reservas activas
-        vehiculo = reserva.vehiculo
-        if reserva.estado in ['pendiente', 'confirmada']:
-            vehiculo.disponible = False
-            vehiculo.save()
-            
-            # Crear factura automáticamente si está confirmada
-            if reserva.estado == 'confirmada':
-                reserva.crear_factura_automatica()
-        
-        return super().form_valid(form)
+        # Guardar la reserva, ocupar el vehículo y facturar en una transacción
+        try:
+            self.object = reservas.crear(form.instance)
+        except reservas.TransicionInvalida as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
 class ReservaUpdate(AdminRequiredMixin, UpdateView):
     model = Reserva
@@ -75,69 +93,27 @@ class ReservaUpdate(AdminRequiredMixin, UpdateView):
     success_url = reverse_lazy('reserva_list')
     
     def form_valid(self, form):
-        # Obtener estado anterior y nuevo
-        reserva = self.get_object()
-        estado_anterior = reserva.estado
-        
-        # Guardar la reserva con nuevo estado
-        reserva = form.save(commit=False)
-        vehiculo = reserva.vehiculo
-        
-        # Si cambió a confirmada desde pendiente
-        if estado_anterior == 'pendiente' and reserva.estado == 'confirmada':
-            vehiculo.disponible = False
-            vehiculo.save()
-            
-            # Crear factura automáticamente
-            reserva.save()
-            reserva.crear_factura_automatica()
-            messages.success(self.request, f'Reserva confirmada. Factura creada automáticamente.')
-        
-        # Si cambió a cancelada
-        elif reserva.estado == 'cancelada':
-            # Verificar si hay otras reservas activas
-            reservas_activas = Reserva.objects.filter(
-                vehiculo=vehiculo,
-                estado__in=['pendiente', 'confirmada']
-            ).exclude(pk=reserva.pk).exists()
-            
-            vehiculo.disponible = not reservas_activas
-            vehiculo.save()
-            reserva.save()
-            messages.success(self.request, 'Reserva cancelada.')
-        
-        else:
-            # Para otros cambios de estado
-            if reserva.estado in ['pendiente', 'confirmada']:
-                vehiculo.disponible = False
-                vehiculo.save()
-            
-            reserva.save()
-        
-        return super().form_valid(form)
+        estado_anterior = form.initial.get('estado')
+        estado = form.cleaned_data['estado']
+        try:
+            self.object = reservas.cambiar_estado(self.object.pk, estado)
+        except reservas.TransicionInvalida as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
+
+        if estado != estado_anterior:
+            if estado == 'confirmada':
+                messages.success(self.request, 'Reserva confirmada. Factura creada automáticamente.')
+            elif estado == 'cancelada':
+                messages.success(self.request, 'Reserva cancelada.')
+        return HttpResponseRedirect(self.get_success_url())
 
 class ReservaDelete(AdminRequiredMixin, DeleteView):
     model = Reserva
     template_name = 'reserva/confirm_delete.html'
     success_url = reverse_lazy('reserva_list')
     
-    def delete(self, request, *args, **kwargs):
-        # Obtener la reserva antes de eliminarla
-        reserva = self.get_object()
-        vehiculo = reserva.vehiculo
-        
-        # Eliminar la reserva
-        response = super().delete(request, *args, **kwargs)
-        
-        # Verificar si hay otras reservas activas para este vehículo
-        reservas_activas = Reserva.objects.filter(
-            vehiculo=vehiculo,
-            estado__in=['pendiente', 'confirmada']
-        ).exists()
-        
-        # Si no hay reservas activas, marcar como disponible
-        if not reservas_activas:
-            vehiculo.disponible = True
-            vehiculo.save()
-        
-        return response
+    def form_valid(self, form):
+        # Eliminar y liberar el vehículo en una transacción
+        reservas.eliminar(self.object.pk)
+        return HttpResponseRedirect(self.get_success_url())
@@ -2,15 +2,20 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from core.models import SubcategoriaLicencia
 from core.forms import SubcategoriaLicenciaForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, KeysetPaginationMixin
 
-class SubcategoriaLicenciaList(AdminRequiredMixin, ListView):
+class SubcategoriaLicenciaList(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     model = SubcategoriaLicencia
+    queryset = SubcategoriaLicencia.objects.select_related('categoria')
     template_name = 'subcategoria_licencia/list.html'
+    presupuesto_consultas = 4
+    orden_paginacion = ('codigo',)
 
 class SubcategoriaLicenciaDetail(AdminRequiredMixin, DetailView):
     model = SubcategoriaLicencia
+    queryset = SubcategoriaLicencia.objects.select_related('categoria')
     template_name = 'subcategoria_licencia/detail.html'
+    presupuesto_consultas = 4
 
 class SubcategoriaLicenciaCreate(AdminRequiredMixin, CreateView):
     model = SubcategoriaLicencia
@@ -3,11 +3,14 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.db.models import Q
 from core.models import Vehiculo
 from core.forms import VehiculoForm, FiltroVehiculoForm
-from core.mixins import AdminRequiredMixin
+from core.mixins import AdminRequiredMixin, KeysetPaginationMixin, RespuestaCondicionalMixin
+from core.services import busqueda, catalogo, disponibilidad, fragmentos
 
-class VehiculoList(AdminRequiredMixin, ListView):
+class VehiculoList(AdminRequiredMixin, RespuestaCondicionalMixin, KeysetPaginationMixin, ListView):
     model = Vehiculo
     template_name = 'vehiculo/list.html'
+    presupuesto_consultas = 5
+    orden_paginacion = ('pk',)
     
     def get_queryset(self):
         queryset = Vehiculo.objects.all()
@@ -19,28 +22,41 @@ class VehiculoList(AdminRequiredMixin, ListView):
             precio_min = forma.cleaned_data.get('precio_min')
             precio_max = forma.cleaned_data.get('precio_max')
             disponible = forma.cleaned_data.get('disponible')
+            fecha_inicio = forma.cleaned_data.get('fecha_inicio')
+            fecha_fin = forma.cleaned_data.get('fecha_fin')
             
-            if marca:
-                queryset = queryset.filter(marca__icontains=marca)
-            if modelo:
-                queryset = queryset.filter(modelo__icontains=modelo)
+            queryset = busqueda.buscar(queryset, [
+                (marca, ('marca',)),
+                (modelo, ('modelo',)),
+            ])
             if precio_min is not None:
                 queryset = queryset.filter(costo_dia__gte=precio_min)
             if precio_max is not None:
                 queryset = queryset.filter(costo_dia__lte=precio_max)
             if disponible is not None:
                 queryset = queryset.filter(disponible=disponible)
+            if fecha_inicio and fecha_fin:
+                queryset = disponibilidad.vehiculos_libres(queryset, fecha_inicio, fecha_fin)
         
         return queryset
     
+    def get_claves_version(self):
+        # La búsqueda por fechas depende de las reservas, que avanzan la
+        # versión del catálogo al cambiar
+        return (catalogo.version(),)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = FiltroVehiculoForm(self.request.GET)
+        context['tarjetas'] = fragmentos.renderizar(
+            'vehiculo/tarjeta.html', context['object_list'], 'vehiculo', fragmentos.version,
+        )
         return context
 
-class VehiculoDetail(AdminRequiredMixin, DetailView):
+class VehiculoDetail(AdminRequiredMixin, RespuestaCondicionalMixin, DetailView):
     model = Vehiculo
     template_name = 'vehiculo/detail.html'
+    presupuesto_consultas = 4
 
 class VehiculoCreate(AdminRequiredMixin, CreateView):
     model = Vehiculo